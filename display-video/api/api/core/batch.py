@@ -0,0 +1,106 @@
+"""
+Batch mutations (POST /v1/<collection>:batchCreate, :batchUpdate, :batchArchive).
+
+A batch runs in one store.transaction() in two phases. First every item is validated by the same code as the
+single-entity endpoint, which builds the entity to save without saving it. Then the valid items are saved and
+serving is recomputed once for everything written (core.serving.recompute_written) rather than once per item.
+Nothing is saved before all items are validated, so an atomic batch with an invalid item fails as a whole (400
+listing each item's errors) without a rollback.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from starlette import status
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from api.core.errors import ProblemError, http_problem
+from api.core.repository import PARENT_KEYS
+from api.core.serving import recompute_written
+
+BatchResult = Dict[str, Any]
+
+
+def _item_problem(exc: Exception) -> Dict[str, Any]:
+    if isinstance(exc, ProblemError):
+        return exc.payload()
+    return http_problem(exc)  # type: ignore[arg-type]
+
+
+def _flatten(results: List[BatchResult], field: str) -> List[Dict[str, str]]:
+    """Per-item problems as field errors of the whole request ("items.3.assetGroupId"), for an atomic failure."""
+    errors: List[Dict[str, str]] = []
+    for r in results:
+        prefix = f"{field}.{r['index']}"
+        item_errors = r["error"].get("errors")
+        if not item_errors:
+            errors.append({"field": prefix, "message": r["error"]["detail"]})
+        for e in item_errors or ():
+            errors.append({"field": f"{prefix}.{e['field']}", "message": e["message"]})
+    return errors
+
+
+def run_batch(
+    store: Any,
+    entity_type: str,
+    items: Sequence[Any],
+    prepare: Callable[[Any], Dict[str, Any]],
+    *,
+    atomic: bool,
+    key: str,
+    field: str = "items",
+    created: bool = False,
+    before_save: Optional[Callable[[Dict[str, Any]], None]] = None,
+    render: Callable[[Dict[str, Any]], Any] = lambda entity: entity,
+) -> Dict[str, List[BatchResult]]:
+    """
+    Validate and apply a batch. prepare(item) returns the entity to save (new, or a for_update() copy with the
+    item's changes) or raises ProblemError/HTTPException. Returns {"results": [...]} in item order, each
+    {"index", "status", key: render(entity)} or {"index", "status", "error": problem details}. With atomic, any
+    failed item raises ProblemError instead and nothing is saved.
+    """
+    parent_key = PARENT_KEYS.get(entity_type)
+    coll = store.collection(entity_type)
+    with store.transaction():
+        results: List[Optional[BatchResult]] = [None] * len(items)
+        failed: List[BatchResult] = []
+        prepared: List[tuple] = []
+        seen: Dict[str, int] = {}
+        for index, item in enumerate(items):
+            try:
+                entity = prepare(item)
+                if entity["id"] in seen:
+                    # Both items would start from the same stored copy and the later save would drop the earlier.
+                    raise ProblemError(
+                        status.HTTP_400_BAD_REQUEST,
+                        f"{entity['id']} is already changed by item {seen[entity['id']]} of this batch",
+                    )
+            except (ProblemError, StarletteHTTPException) as exc:
+                results[index] = {"index": index, "status": exc.status_code, "error": _item_problem(exc)}
+                failed.append(results[index])
+                continue
+            seen[entity["id"]] = index
+            prepared.append((index, entity))
+
+        if failed and atomic:
+            raise ProblemError(
+                status.HTTP_400_BAD_REQUEST,
+                f"{len(failed)} of {len(items)} items failed validation; nothing was applied",
+                _flatten(failed, field),
+                code="BATCH_FAILED",
+                type_="https://example.com/problems/batch-failed",
+            )
+
+        written = []
+        for _, entity in prepared:
+            previous = coll.get(entity["id"])
+            if before_save is not None:
+                before_save(entity)
+            store.save(entity_type, entity)
+            written.append((entity_type, entity["id"], previous.get(parent_key) if previous and parent_key else None))
+        recompute_written(store, written)
+
+        ok = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        for index, entity in prepared:
+            results[index] = {"index": index, "status": ok, key: render(coll[entity["id"]])}
+    return {"results": results}  # type: ignore[dict-item]
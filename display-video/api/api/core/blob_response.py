@@ -0,0 +1,109 @@
+"""
+HTTP serving of blob-store content: strong ETags from the content digest, If-None-Match -> 304,
+single byte-range requests -> 206, and long-lived caching (a blob's bytes never change for its digest).
+"""
+from __future__ import annotations
+
+import mmap
+import re
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette import status
+
+from api.core.blobs import CHUNK_SIZE, BlobStore
+from api.core.etags import etag_matches
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end).
+    Returns None when the header should be ignored (multi-range or malformed: serve the full body),
+    raises ValueError when it is well-formed but unsatisfiable (416).
+    """
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    first, last = m.group(1), m.group(2)
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or (last and int(last) < start):
+            raise ValueError(header)
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(header)
+        start, end = max(size - suffix, 0), size - 1
+    return start, end
+
+
+def _iter_mmap(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos <= end:
+            stop = min(pos + CHUNK_SIZE, end + 1)
+            yield mm[pos:stop]
+            pos = stop
+
+
+def _iter_stream(blob_store: BlobStore, digest: str, start: int, end: int) -> Iterator[bytes]:
+    with blob_store.open(digest) as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def blob_response(request: Request, blob_store: BlobStore, content: Dict[str, Any]) -> Response:
+    digest, size, media_type = content["digest"], content["size"], content["contentType"]
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range: Optional[Tuple[int, int]] = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header is not None and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            # Literal: Starlette renamed the constant (HTTP_416_RANGE_NOT_SATISFIABLE) and deprecated the old name,
+            # and the new one is missing from the older releases fastapi>=0.104 still allows.
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+
+    path = blob_store.local_path(digest)
+    if byte_range is None:
+        if path is not None and range_header is None:
+            # FileResponse lets the server use sendfile/pathsend for the full body. (It is skipped when a Range
+            # header was ignored, since newer Starlette versions would otherwise re-interpret that header.)
+            return FileResponse(path, media_type=media_type, headers=headers)
+        return StreamingResponse(
+            blob_store.iter_chunks(digest),
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(size)},
+        )
+
+    start, end = byte_range
+    body = _iter_mmap(path, start, end) if path is not None else _iter_stream(blob_store, digest, start, end)
+    return StreamingResponse(
+        body,
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)},
+    )
@@ -0,0 +1,255 @@
+"""
+Content blob storage for ad files. STORE.ad_content only keeps a small descriptor
+({"digest", "size", "contentType"}); the bytes live here, addressed by their SHA-256.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobWriter(ABC):
+    """Incremental writer; the digest is computed while bytes are written."""
+
+    @abstractmethod
+    def write(self, chunk: bytes) -> None: ...
+
+    @abstractmethod
+    def read_back(self, limit: int) -> bytes:
+        """Up to `limit` bytes of what was written so far, for sniffing/validation before commit."""
+
+    def sync(self) -> None:
+        """Make the bytes written so far durable ahead of commit(); a no-op for stores without fsync."""
+
+    def close(self) -> None:
+        """Done writing: sync and let go of any open file until commit() or abort() (for writers held in bulk)."""
+        self.sync()
+
+    @abstractmethod
+    def commit(self) -> str:
+        """Finish the blob and return its SHA-256 hex digest."""
+
+    @abstractmethod
+    def abort(self) -> None: ...
+
+    @property
+    @abstractmethod
+    def size(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def digest(self) -> str:
+        """SHA-256 hex digest of the bytes written so far."""
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def writer(self) -> BlobWriter: ...
+
+    @abstractmethod
+    def open(self, digest: str) -> BinaryIO: ...
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool: ...
+
+    @abstractmethod
+    def delete(self, digest: str) -> None: ...
+
+    def local_path(self, digest: str) -> Optional[str]:
+        """Filesystem path of the blob when it can be served directly from disk, else None."""
+        return None
+
+    def put_bytes(self, data: bytes) -> str:
+        w = self.writer()
+        try:
+            w.write(data)
+        except BaseException:
+            w.abort()
+            raise
+        return w.commit()
+
+    def iter_chunks(self, digest: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with self.open(digest) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+
+class _LocalBlobWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore") -> None:
+        self._store = store
+        self._tmp_path = os.path.join(store.tmp_dir, uuid.uuid4().hex)
+        self._fh = open(self._tmp_path, "wb")
+        self._hash = hashlib.sha256()
+        self._size = 0
+        self._synced = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self._fh.write(chunk)
+        self._size += len(chunk)
+        self._synced = False
+
+    def read_back(self, limit: int) -> bytes:
+        if not self._fh.closed:
+            self._fh.flush()
+        with open(self._tmp_path, "rb") as f:
+            return f.read(limit)
+
+    def sync(self) -> None:
+        if self._store.fsync and not self._synced:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._synced = True
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self.sync()
+            self._fh.close()
+
+    def commit(self) -> str:
+        self.sync()
+        self._fh.close()
+        digest = self._hash.hexdigest()
+        final = self._store.path_for(digest)
+        if os.path.exists(final):
+            # Same bytes already stored: content addressing makes the copy redundant.
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(self._tmp_path, final)
+        return digest
+
+    def abort(self) -> None:
+        self._fh.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Content-addressed files under root/<2 hex>/<sha256>. With fsync, blobs are on disk before they are referenced.
+    A temporary store deletes root when it is garbage collected or the process exits.
+    """
+
+    def __init__(self, root: str, fsync: bool = False, temporary: bool = False) -> None:
+        self.root = root
+        self.fsync = fsync
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        if temporary:
+            weakref.finalize(self, shutil.rmtree, root, True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def writer(self) -> BlobWriter:
+        return _LocalBlobWriter(self)
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path_for(digest), "rb")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def delete(self, digest: str) -> None:
+        try:
+            os.remove(self.path_for(digest))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, digest: str) -> Optional[str]:
+        return self.path_for(digest)
+
+
+async def spool_upload(blob_store: BlobStore, upload: UploadFile) -> BlobWriter:
+    """Stream an upload into a blob writer chunk by chunk (never holding the whole file). Caller commits or aborts."""
+    w = blob_store.writer()
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_in_threadpool(w.write, chunk)
+    except BaseException:
+        w.abort()
+        raise
+    return w
+
+
+async def spool_to_tempfile(upload: UploadFile, suffix: str = "") -> str:
+    """Copy an upload to a named temp file in chunks (for zipfile/random access); caller removes the file."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def copy_into(writer: BlobWriter, fh: BinaryIO) -> None:
+    while True:
+        chunk = fh.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        writer.write(chunk)
+
+
+def descriptor(digest: str, size: int, content_type: str) -> Dict[str, object]:
+    return {"digest": digest, "size": size, "contentType": content_type}
+
+
+def _default_root() -> Tuple[str, bool]:
+    """
+    Where blobs go without DV_BLOB_DIR, and whether the directory is temporary. Blobs live as long as the
+    reference counts in the store do: beside a persistent store's data (DV_DATA_DIR), next to the SQLite database
+    its workers share, and otherwise (the in-memory store, whose counts die with the process) in a directory of this
+    process's own, so that no other process can delete its content or leave content behind for it.
+    """
+    data_dir = os.environ.get("DV_DATA_DIR")
+    if data_dir:
+        return os.path.join(data_dir, "blobs"), False
+    if (os.environ.get("DV_STORE") or "memory").lower() == "sqlite":
+        return os.path.abspath(os.environ.get("DV_SQLITE_PATH") or "display-video.db") + "-blobs", False
+    return tempfile.mkdtemp(prefix="display-video-blobs-"), True
+
+
+def _open_blobs() -> LocalBlobStore:
+    # With DV_DATA_DIR the store is persistent (core.persistence), so blobs live beside it and are fsynced.
+    fsync = bool(os.environ.get("DV_DATA_DIR"))
+    if os.environ.get("DV_BLOB_DIR"):
+        return LocalBlobStore(os.environ["DV_BLOB_DIR"], fsync=fsync)
+    root, temporary = _default_root()
+    return LocalBlobStore(root, fsync=fsync, temporary=temporary)
+
+
+BLOBS: BlobStore = _open_blobs()
@@ -0,0 +1,202 @@
+"""
+Background bulk-upload jobs: POST /ads/bulk with async=true spools the zip, registers a BulkJob and returns its id;
+a small job pool runs the same parse/validate/create walk as the synchronous path while the job records progress.
+Finished jobs are kept for DV_BULK_JOB_TTL seconds (default 1 hour) and purged lazily on access.
+
+A job runs in the worker process that accepted it. With a store shared by several workers (Repository.shared),
+the registry also publishes job snapshots to the store's bulk_jobs table, at most every
+PUBLISH_INTERVAL_SECONDS while running and at every status change, so a poll served by another worker still
+finds the job.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from api.core.ids import new_id
+
+BULK_JOB_TTL_SECONDS = int(os.environ.get("DV_BULK_JOB_TTL") or 3600)
+BULK_JOB_WORKERS = max(1, int(os.environ.get("DV_BULK_JOB_WORKERS") or 2))
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class BulkJob:
+    """
+    Progress of one bulk upload. Mutated by the worker running it and read by pollers, so every access goes
+    through the job's lock; snapshot() returns a detached copy.
+    Statuses: QUEUED -> VALIDATING -> (CREATING) -> SUCCEEDED | FAILED.
+    """
+
+    def __init__(self, asset_group_id: str, mode: str, create: bool, job_id: Optional[str] = None) -> None:
+        now = _now()
+        self.id = job_id or new_id("bulkjob")
+        self.assetGroupId = asset_group_id
+        self.mode = mode
+        self.create = create
+        self.status = "QUEUED"
+        self.total: Optional[int] = None
+        self.validated = 0
+        self.created = 0
+        self.items: List[Dict[str, Any]] = []
+        self.globalErrors: List[Dict[str, str]] = []
+        self.createdAdIds: List[str] = []
+        self.error: Optional[str] = None
+        self.createdAt = now
+        self.updatedAt = now
+        self.finishedAt: Optional[datetime] = None
+        self._lock = threading.Lock()
+        # Set by BulkJobRegistry.register when snapshots are published to a shared store.
+        self.on_change: Optional[Callable[["BulkJob"], None]] = None
+        self._published_status: Optional[str] = None
+        self._published_at = 0.0
+
+    def _touch(self, **changes: Any) -> None:
+        with self._lock:
+            for k, v in changes.items():
+                setattr(self, k, v)
+            self.updatedAt = _now()
+        self._changed()
+
+    def _changed(self) -> None:
+        if self.on_change is None:
+            return
+        now = time.monotonic()
+        if self.status == self._published_status and now - self._published_at < PUBLISH_INTERVAL_SECONDS:
+            return
+        self._published_status, self._published_at = self.status, now
+        self.on_change(self)
+
+    def validating(self, done: int, total: int) -> None:
+        self._touch(status="VALIDATING", validated=done, total=total)
+
+    def validated_items(self, items: List[Dict[str, Any]], global_errors: List[Dict[str, str]]) -> None:
+        self._touch(
+            items=[{**i, "adId": None} for i in items],
+            globalErrors=list(global_errors),
+            total=len(items),
+            validated=len(items),
+        )
+
+    def creating(self) -> None:
+        self._touch(status="CREATING")
+
+    def created_ad(self, index: int, ad_id: str) -> None:
+        with self._lock:
+            self.items[index]["adId"] = ad_id
+            self.createdAdIds.append(ad_id)
+            self.created += 1
+            self.updatedAt = _now()
+        self._changed()
+
+    def succeed(self) -> None:
+        self._touch(status="SUCCEEDED", finishedAt=_now())
+
+    def fail(self, message: str) -> None:
+        self._touch(status="FAILED", error=message, finishedAt=_now())
+
+    def expires_at(self, ttl_seconds: int) -> Optional[datetime]:
+        return self.finishedAt + timedelta(seconds=ttl_seconds) if self.finishedAt else None
+
+    def snapshot(self, ttl_seconds: int = BULK_JOB_TTL_SECONDS) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "assetGroupId": self.assetGroupId,
+                "mode": self.mode,
+                "create": self.create,
+                "total": self.total,
+                "validated": self.validated,
+                "created": self.created,
+                "items": [dict(i) for i in self.items],
+                "globalErrors": list(self.globalErrors),
+                "createdAdIds": list(self.createdAdIds),
+                "error": self.error,
+                "createdAt": self.createdAt,
+                "updatedAt": self.updatedAt,
+                "finishedAt": self.finishedAt,
+                "expiresAt": self.expires_at(ttl_seconds),
+            }
+
+
+class BulkJobRegistry:
+    """Jobs by id plus the pool that runs them. Finished jobs past their TTL are dropped on the next access."""
+
+    def __init__(
+        self, ttl_seconds: int = BULK_JOB_TTL_SECONDS, workers: int = BULK_JOB_WORKERS, thread_name: str = "dv-bulk-job"
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._workers = workers
+        self._thread_name = thread_name
+        self._jobs: Dict[str, BulkJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Store shared with the other worker processes (share_via), else None.
+        self._shared: Optional[Any] = None
+
+    def share_via(self, store: Any) -> None:
+        """Publish job snapshots to `store` (whose bulk_jobs table every worker reads) from now on."""
+        self._shared = store
+
+    def _publish(self, job: BulkJob) -> None:
+        self._shared.set_item("bulk_jobs", job.id, job.snapshot(self.ttl_seconds))
+
+    def purge_expired(self) -> None:
+        now = _now()
+        with self._lock:
+            expired = [jid for jid, j in self._jobs.items() if j.finishedAt and j.expires_at(self.ttl_seconds) <= now]
+            for jid in expired:
+                del self._jobs[jid]
+        if self._shared is not None:
+            for jid in expired:
+                self._shared.pop_item("bulk_jobs", jid)
+
+    def register(self, job: BulkJob) -> BulkJob:
+        self.purge_expired()
+        with self._lock:
+            self._jobs[job.id] = job
+        if self._shared is not None:
+            job.on_change = self._publish
+            self._publish(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkJob]:
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job run by this process or, with a shared store, published by another one."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.snapshot(self.ttl_seconds)
+        if self._shared is None:
+            return None
+        published = self._shared.bulk_jobs.get(job_id)
+        if published is None or (published["expiresAt"] is not None and published["expiresAt"] <= _now()):
+            return None
+        return published
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix=self._thread_name)
+            return self._executor.submit(fn, *args)
+
+    def shutdown(self) -> None:
+        """Stop the pool; queued jobs are cancelled (their submitters' done-callbacks clean up)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+BULK_JOBS = BulkJobRegistry()
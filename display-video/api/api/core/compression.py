@@ -0,0 +1,197 @@
+"""
+Response compression (Content-Encoding br / gzip) negotiated from Accept-Encoding.
+
+JSON, NDJSON, CSV and text bodies are compressed once they reach DV_COMPRESS_MIN_BYTES; smaller bodies cost more to
+encode than they save. Streamed responses are compressed chunk by chunk and flushed after each chunk, so a client
+still sees every chunk as soon as it is sent. Left alone: event streams (text/event-stream), bodies that already
+have a Content-Encoding, ranged content (Accept-Ranges: blobs are served as stored so byte ranges stay valid),
+HEAD requests and bodiless statuses. An encoded body's ETag gets the encoding appended (core.etags.encoded_etag), and
+every response that could have been encoded, as well as 304s, carries Vary: Accept-Encoding.
+
+DV_COMPRESSION lists the encodings the server offers, most preferred first ("br,gzip"; "off" disables). br needs
+the optional brotli package and is skipped without it.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from api.core.etags import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+COMPRESSION = os.environ.get("DV_COMPRESSION", "br,gzip").lower()
+MIN_BYTES = int(os.environ.get("DV_COMPRESS_MIN_BYTES") or 1024)
+
+# Dynamic responses favour speed: these levels compress JSON about as well as the maximum at a fraction of the cost.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+_COMPRESSIBLE = {
+    "application/json",
+    "application/problem+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+_BODILESS = {204, 206, 304}
+
+
+def configured_encodings(setting: str = COMPRESSION) -> Tuple[str, ...]:
+    if setting.strip() in ("", "off", "none", "0", "false"):
+        return ()
+    names = [n.strip() for n in setting.split(",") if n.strip()]
+    return tuple(n for n in names if n == "gzip" or (n == "br" and brotli is not None))
+
+
+def negotiate(accept_encoding: str, offered: Sequence[str]) -> Optional[str]:
+    """
+    The encoding to use for a request's Accept-Encoding: the offered one with the highest q-value, the server's
+    order breaking ties. None when the client accepts none of them.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for name in offered:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE
+        or media_type.endswith("+json")
+        or media_type.endswith("+xml")
+    )
+
+
+class _Encoder:
+    """Incremental compressor with the same interface for gzip and brotli."""
+
+    def __init__(self, encoding: str) -> None:
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress `data` and flush it, so the output so far can be decoded without the rest of the stream."""
+        if self._br is not None:
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush()
+
+
+class CompressionMiddleware:
+    """Compresses eligible responses with the best encoding the client accepts (see the module docstring)."""
+
+    def __init__(self, app: Any, minimum_size: int = MIN_BYTES, encodings: Optional[Sequence[str]] = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = tuple(encodings) if encodings is not None else configured_encodings()
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.encodings or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+
+        start: Optional[Dict[str, Any]] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Dict[str, Any]) -> None:
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304 and "accept-ranges" not in headers:
+                    # Stands in for a 200 that would have varied (not_modified answers before a body exists).
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    message["status"] in _BODILESS
+                    or "content-encoding" in headers
+                    or "accept-ranges" in headers
+                    or "no-transform" in headers.get("cache-control", "")
+                    or not compressible(headers.get("content-type", ""))
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                # First body message: the headers are still held back.
+                headers = MutableHeaders(raw=start["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    await send(start)
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+            if more_body:
+                data = encoder.chunk(body) if body else b""
+                if data:
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,71 @@
+"""
+Ad content bookkeeping on top of the blob store: each unique digest is stored once and reference-counted
+by the ads pointing at it, and validation/metadata results are remembered per digest so re-uploading
+known bytes skips both.
+
+Reference counts and metadata are read-modify-write, so every change runs in store.transaction(). That also
+serializes commit+attach against release+delete, so a blob is never deleted between an upload finding it already
+stored and taking its reference (across server processes too, with the SQLite store).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from api.core.blobs import BlobStore, BlobWriter, descriptor
+
+
+def metadata_key(input_type: str, content_type: str, filename: str) -> str:
+    """Validation depends on the input type, declared content type and extension, not just the bytes."""
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return f"{input_type}|{content_type}|{ext}"
+
+
+def known_metadata(store: Any, digest: str, key: str) -> Optional[Dict[str, Any]]:
+    """Metadata of an earlier upload of the same digest that passed validation under the same key."""
+    hit = store.blob_metadata.get(digest, {}).get(key)
+    return dict(hit) if hit is not None else None
+
+
+def remember_metadata(store: Any, digest: str, key: str, metadata: Dict[str, Any]) -> None:
+    with store.transaction():
+        store.set_item("blob_metadata", digest, {**store.blob_metadata.get(digest, {}), key: dict(metadata)})
+
+
+def _attach(store: Any, ad_id: str, digest: str, size: int, content_type: str) -> None:
+    store.set_item("blob_refs", digest, store.blob_refs.get(digest, 0) + 1)
+    store.set_item("ad_content", ad_id, descriptor(digest, size, content_type))
+
+
+def attach_upload(store: Any, blob_store: BlobStore, ad_id: str, writer: BlobWriter, content_type: str) -> str:
+    """Commit a spooled upload (a no-op copy if the digest is already stored) and reference it from the ad."""
+    writer.sync()  # the slow part of a durable commit, kept outside the write section
+    with store.transaction():
+        digest = writer.commit()
+        _attach(store, ad_id, digest, writer.size, content_type)
+    return digest
+
+
+def attach_bytes(store: Any, blob_store: BlobStore, ad_id: str, data: bytes, content_type: str) -> str:
+    with store.transaction():
+        digest = blob_store.put_bytes(data)
+        _attach(store, ad_id, digest, len(data), content_type)
+    return digest
+
+
+def release(store: Any, blob_store: BlobStore, ad_id: str) -> None:
+    """Drop the ad's content reference; the blob (and its remembered metadata) go when nothing references it."""
+    with store.transaction():
+        content = store.pop_item("ad_content", ad_id)
+        if content is None:
+            return
+        digest = content["digest"]
+        refs = store.blob_refs.get(digest, 0) - 1
+        if refs > 0:
+            store.set_item("blob_refs", digest, refs)
+            return
+        store.pop_item("blob_refs", digest)
+        store.pop_item("blob_metadata", digest)
+        if store.journal is not None:
+            # Never delete bytes that a durable log record could still reference after a crash.
+            store.journal.wait_durable(store.journal.appended)
+        blob_store.delete(digest)
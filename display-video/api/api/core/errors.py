@@ -33,6 +33,53 @@ def problem_details(
     return payload
 
 
+class ProblemError(Exception):
+    """
+    A failure with field-level errors, rendered as problem details. Raised by validation shared between the
+    single-entity endpoints and the batch endpoints (core.batch), where it becomes one item's error.
+    """
+
+    def __init__(
+        self,
+        status_code: int,
+        detail: str,
+        errors: Optional[List[Dict[str, str]]] = None,
+        *,
+        title: str = "Validation Error",
+        code: str = "VALIDATION_ERROR",
+        type_: str = "https://example.com/problems/validation",
+    ) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.errors = errors
+        self.title = title
+        self.code = code
+        self.type_ = type_
+
+    def payload(self, instance: Optional[str] = None) -> Dict[str, Any]:
+        return problem_details(
+            status_code=self.status_code,
+            title=self.title,
+            detail=self.detail,
+            code=self.code,
+            type_=self.type_,
+            instance=instance,
+            errors=self.errors or None,
+        )
+
+
+def http_problem(exc: StarletteHTTPException, instance: Optional[str] = None) -> Dict[str, Any]:
+    return problem_details(
+        status_code=exc.status_code,
+        title="HTTP Error",
+        detail=exc.detail if isinstance(exc.detail, str) else "HTTP error",
+        code="HTTP_ERROR",
+        type_="https://example.com/problems/http",
+        instance=instance,
+    )
+
+
 def install_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(RequestValidationError)
     async def request_validation_handler(request: Request, exc: RequestValidationError):
@@ -54,16 +101,14 @@ def install_exception_handlers(app: FastAPI) -> None:
         )
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=pd, media_type="application/problem+json")
 
+    @app.exception_handler(ProblemError)
+    async def problem_error_handler(request: Request, exc: ProblemError):
+        pd = exc.payload(instance=str(request.url.path))
+        return JSONResponse(status_code=exc.status_code, content=pd, media_type="application/problem+json")
+
     @app.exception_handler(StarletteHTTPException)
     async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-        pd = problem_details(
-            status_code=exc.status_code,
-            title="HTTP Error",
-            detail=exc.detail if isinstance(exc.detail, str) else "HTTP error",
-            code="HTTP_ERROR",
-            type_="https://example.com/problems/http",
-            instance=str(request.url.path),
-        )
+        pd = http_problem(exc, instance=str(request.url.path))
         return JSONResponse(status_code=exc.status_code, content=pd, media_type="application/problem+json")
 
     @app.exception_handler(Exception)
@@ -0,0 +1,102 @@
+"""
+ETags: conditional GETs (If-None-Match -> 304) and optimistic concurrency for writes (If-Match on PATCH).
+
+An entity's representation changes exactly when a user edit bumps its updatedAt or the serving recompute changes
+its servingStatus/servingReasons, so the ETag hashes those fields. It is stable across restarts and identical in
+every server process, unlike the store's in-memory version counters.
+
+A list (or tree) response depends on every entity of the types it shows, so its ETag hashes the request URL with
+those types' collection versions (Repository.collection_version). Handlers read them before the data: a write
+racing with the request can only make the ETag older than the body, which costs one extra full response later,
+never a wrong 304.
+
+A strong ETag names exact bytes, so when core.compression encodes a body it appends the content coding to the tag
+("<hash>-gzip", encoded_etag). Comparisons drop that suffix again: any encoding of the current state matches.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Optional
+
+# Quoted-tag endings encoded_etag adds (one per encoding core.compression offers).
+_ENCODING_SUFFIXES = ('-gzip"', '-br"')
+
+from fastapi import HTTPException, Request, Response
+from starlette import status
+
+
+def entity_etag(entity: Dict[str, Any]) -> str:
+    raw = "|".join(
+        (
+            str(entity.get("id")),
+            str(entity.get("updatedAt")),
+            str(entity.get("servingStatus")),
+            ",".join(entity.get("servingReasons") or ()),
+        )
+    )
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=12).hexdigest() + '"'
+
+
+def set_etag(response: Response, entity: Dict[str, Any]) -> None:
+    response.headers["ETag"] = entity_etag(entity)
+
+
+def collection_etag(store: Any, request: Request, *entity_types: str) -> str:
+    versions = ",".join(store.collection_version(t) for t in entity_types)
+    raw = f"{request.url.path}?{request.url.query}|{versions}"
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=12).hexdigest() + '"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of a body encoded with `encoding` whose unencoded form is tagged `etag`."""
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+
+def _without_encoding(tag: str) -> str:
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def _matching_tag(header: str, etag: str) -> Optional[str]:
+    """The If-None-Match candidate that names `etag` (in any encoding), or None."""
+    for candidate in (c.strip() for c in header.split(",")):
+        # Weak comparison per RFC 9110 for If-None-Match.
+        if candidate == "*" or _without_encoding(candidate.removeprefix("W/")) == etag:
+            return candidate
+    return None
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    return _matching_tag(header, etag) is not None
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 for the request if its If-None-Match already names `etag` (the client's copy is current), else None."""
+    header = request.headers.get("if-none-match")
+    tag = _matching_tag(header, etag) if header is not None else None
+    if tag is None:
+        return None
+    # The 304 carries the tag of the copy the client holds, which names its encoding like the 200 did.
+    held = etag if tag == "*" else tag.removeprefix("W/")
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": held})
+
+
+def check_if_match(request: Request, entity: Dict[str, Any]) -> None:
+    """
+    Reject the write with 412 if the client sent If-Match and none of its tags is the entity's current ETag
+    (someone else changed it since the client read it). Call inside store.transaction(), on the entity as
+    read there. Without If-Match the write is unconditional (last writer wins).
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return
+    tags = [t.strip() for t in header.split(",")]
+    # If-Match uses strong comparison: weak tags (W/"...") never match.
+    if "*" in tags or entity_etag(entity) in {_without_encoding(t) for t in tags}:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Resource was modified since it was read (If-Match does not match the current ETag)",
+    )
@@ -0,0 +1,471 @@
+"""
+Columnar delivery facts behind POST /v1/reports/query (core.report_engine).
+
+A fact is one (day, campaignId, assetGroupId, adId) with impressions, clicks and spend (in cents). Facts are held
+per day ("partitions"), each a set of NumPy columns, so a date range selects whole partitions and the date is never
+stored per row. The id columns are dictionary-encoded: an IdDictionary maps each id string to a small int code once,
+and the columns hold the codes, which is what group-bys count over.
+
+Columns are kept in the dtypes np.bincount works in (intp indices, float64 weights; integer metrics are exact in
+float64 up to 2**53), so a query never spends a pass over the rows converting them.
+
+Appends copy into spare capacity at the end of a partition's columns and then publish the new row count, growing
+(and swapping in) larger arrays when full, so queries read consistent views without taking the lock.
+The store is per process, like the in-memory entity store.
+
+With a directory (DV_FACTS_DIR, by default $DV_DATA_DIR/facts) the facts live on disk instead, laid out as
+
+    dictionaries/<column>.txt     the ids of a dictionary, one per line in code order (appended, flushed before use)
+    days/YYYY-MM-DD/<column>.bin  one day's column as raw little-endian values (DISK_DTYPES), appended in place
+    days/YYYY-MM-DD/rollups.npz   that day's rollup sums and the number of fact rows they include
+    rollups.npz                   the rollups' parent maps
+
+A query memory-maps the column files of the days in its range only, so a 7-day report touches 7 partitions and the
+rest of the year stays on disk (the OS caches what is read often). Ids are stored as int32 codes to halve the files;
+sync() (called after every ingest) fsyncs what was appended and saves the rollups of the days it touched. Opening
+the directory trims a column left longer than the others by an interrupted append, and folds fact rows that a saved
+rollup does not include yet into it, so a crash between an append and sync() loses nothing that reached the files.
+One process writes a directory at a time.
+
+Every append also updates the rollups: per-day metric sums by campaign, by asset group and by ad, one dense vector
+per metric indexed by code. A rollup also maps its codes to their parents' (an ad's asset group and campaign), so
+the ad rollup answers any query that groups or filters on ids alone; a day of it is a few thousand rows instead of
+every fact (see report_engine.plan).
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import zipfile
+from datetime import date, timedelta
+from typing import IO, Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+ID_COLUMNS: Tuple[str, ...] = ("campaign", "asset_group", "ad")
+METRIC_COLUMNS: Tuple[str, ...] = ("impressions", "clicks", "spend")  # spend in cents
+DTYPES: Dict[str, np.dtype] = {
+    **{name: np.dtype(np.intp) for name in ID_COLUMNS},
+    **{name: np.dtype(np.float64) for name in METRIC_COLUMNS},
+}
+COLUMNS: Tuple[str, ...] = ID_COLUMNS + METRIC_COLUMNS
+# Column files; codes are widened to intp only where a query combines them into group keys.
+DISK_DTYPES: Dict[str, np.dtype] = {
+    **{name: np.dtype("<i4") for name in ID_COLUMNS},
+    **{name: np.dtype("<f8") for name in METRIC_COLUMNS},
+}
+
+_EPOCH = date(1970, 1, 1)
+_MIN_CAPACITY = 1024
+# Rows folded into the rollups at a time when catching up on open.
+_CATCH_UP_ROWS = 1 << 20
+
+
+def _default_directory() -> Optional[str]:
+    data_dir = os.environ.get("DV_DATA_DIR")
+    return os.path.join(data_dir, "facts") if data_dir else None
+
+
+FACTS_DIR = os.environ.get("DV_FACTS_DIR") or _default_directory()
+
+
+def day_number(value: date) -> int:
+    """Days since 1970-01-01: the partition key."""
+    return (value - _EPOCH).days
+
+
+def day_date(day: int) -> date:
+    return _EPOCH + timedelta(days=day)
+
+
+class IdDictionary:
+    """
+    id string <-> int code, in first-seen order. Codes are never reused, so encoded columns stay valid. With a
+    path, the ids are loaded from it and new ones appended to it.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        if path is not None:
+            self._load(path)
+
+    def _load(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8", newline="\n") as f:
+                text = f.read()
+        except FileNotFoundError:
+            text = ""
+        lines = text.split("\n")
+        if lines[-1]:
+            # An id cut short by a crash: no fact can reference it, so drop it.
+            with open(path, "r+b") as f:
+                f.truncate(len(text.encode("utf-8")) - len(lines[-1].encode("utf-8")))
+        self.values = lines[:-1]
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._file = open(path, "a", encoding="utf-8", newline="\n")
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        """The code of `value`, or -1 if it was never encoded (matches no row)."""
+        return self._codes.get(value, -1)
+
+    def encode(self, values: Iterable[str]) -> np.ndarray:
+        codes = self._codes
+        out = []
+        for value in values:
+            c = codes.get(value)
+            if c is None:
+                with self._lock:
+                    c = codes.get(value)
+                    if c is None:
+                        if self._file is not None:
+                            # On file before any fact can use the code.
+                            self._file.write(value + "\n")
+                            self._file.flush()
+                        # values first: a reader never sees a code it cannot decode
+                        self.values.append(value)
+                        c = codes[value] = len(self.values) - 1
+            out.append(c)
+        return np.asarray(out, dtype=np.intp)
+
+    def sync(self) -> None:
+        if self._file is not None:
+            with self._lock:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Partition:
+    """One day's facts: a column per name in COLUMNS, valid up to `size`."""
+
+    def __init__(self) -> None:
+        self._columns: Dict[str, np.ndarray] = {name: np.empty(_MIN_CAPACITY, DTYPES[name]) for name in COLUMNS}
+        self.size = 0
+
+    def append(self, columns: Mapping[str, np.ndarray]) -> None:
+        """Called with the store's write lock held."""
+        n = len(columns[COLUMNS[0]])
+        size = self.size
+        current = self._columns
+        capacity = len(current[COLUMNS[0]])
+        if size + n > capacity:
+            capacity = max(capacity * 2, size + n)
+            grown = {}
+            for name in COLUMNS:
+                grown[name] = np.empty(capacity, DTYPES[name])
+                grown[name][:size] = current[name][:size]
+            current = grown
+        for name in COLUMNS:
+            current[name][size:size + n] = columns[name]
+        self._columns = current
+        self.size = size + n
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the rows appended so far."""
+        # Size first: columns swapped in after it was read hold at least that many rows.
+        size = self.size
+        columns = self._columns
+        return {name: columns[name][:size] for name in COLUMNS}
+
+
+class DiskPartition:
+    """One day's facts in a directory: a file per column, memory-mapped for reads (the Partition interface)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        lengths = {}
+        for name in COLUMNS:
+            try:
+                lengths[name] = os.path.getsize(self._file(name)) // DISK_DTYPES[name].itemsize
+            except FileNotFoundError:
+                lengths[name] = 0
+        self.size = min(lengths.values())
+        for name, length in lengths.items():
+            if length > self.size:
+                # An append interrupted between columns: drop the rows the other columns never got.
+                os.truncate(self._file(name), self.size * DISK_DTYPES[name].itemsize)
+        self._maps: Tuple[int, Dict[str, np.ndarray]] = (0, {})
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def append(self, columns: Mapping[str, np.ndarray]) -> None:
+        """Called with the store's write lock held."""
+        for name in COLUMNS:
+            with open(self._file(name), "ab") as f:
+                np.asarray(columns[name]).astype(DISK_DTYPES[name], copy=False).tofile(f)
+        self.size += len(columns[COLUMNS[0]])
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the rows appended so far, mapped from the files."""
+        size = self.size
+        mapped, maps = self._maps
+        if mapped < size:
+            # The files grew since they were mapped; the old maps stay valid for whoever still holds them.
+            maps = {
+                name: np.memmap(self._file(name), DISK_DTYPES[name], mode="r", shape=(size,)).view(np.ndarray)
+                for name in COLUMNS
+            }
+            self._maps = (size, maps)
+        return {name: maps[name][:size] for name in COLUMNS}
+
+    def sync(self) -> None:
+        for name in COLUMNS:
+            fd = os.open(self._file(name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+class Rollup:
+    """Per-day metric sums by one id column, plus that column's code -> parent code maps."""
+
+    def __init__(self, column: str, parents: Tuple[str, ...] = ()) -> None:
+        self.column = column
+        self.parents = parents
+        # False once an appended fact gave a code another parent than before: the parent maps are then unreliable.
+        self.consistent = True
+        self._days: Dict[int, Dict[str, np.ndarray]] = {}
+        self._parents: Dict[str, np.ndarray] = {p: np.empty(0, DTYPES[p]) for p in parents}
+
+    def columns(self) -> FrozenSet[str]:
+        """The id columns this rollup can group and filter on."""
+        return frozenset((self.column, *self.parents)) if self.consistent else frozenset((self.column,))
+
+    def add(self, day: int, columns: Mapping[str, np.ndarray]) -> None:
+        """Called with the store's write lock held, with a non-empty batch."""
+        codes = np.asarray(columns[self.column])
+        n = int(codes.max()) + 1
+        # Parents before sums: a code with published sums always has its parents set.
+        for parent in self.parents:
+            mapping = self._parents[parent]
+            if len(mapping) < n:
+                grown = np.full(max(n, 2 * len(mapping)), -1, mapping.dtype)
+                grown[:len(mapping)] = mapping
+                mapping = grown
+            values = np.asarray(columns[parent])
+            known = mapping[codes]
+            if np.any((known >= 0) & (known != values)):
+                self.consistent = False
+            new = known < 0
+            mapping[codes[new]] = values[new]
+            self._parents[parent] = mapping
+        current = self._days.get(day)
+        size = max(n, len(current[METRIC_COLUMNS[0]])) if current else n
+        sums = {}
+        for name in METRIC_COLUMNS:
+            sums[name] = np.bincount(codes, weights=columns[name], minlength=size)
+            if current:
+                sums[name][:len(current[name])] += current[name]
+        self._days[day] = sums  # swapped in whole, so readers see all metrics of one state
+
+    def partitions(self, start_day: int, end_day: int) -> List[Tuple[int, Dict[str, np.ndarray]]]:
+        """Like FactStore.partitions, with one row per code (all-zero for codes absent that day)."""
+        days = sorted(d for d in list(self._days) if start_day <= d <= end_day)
+        sums = [(d, self._days[d]) for d in days]
+        parents = dict(self._parents)  # after the sums: at least as long as any of them
+        out = []
+        for day, day_sums in sums:
+            n = len(day_sums[METRIC_COLUMNS[0]])
+            columns = {self.column: np.arange(n, dtype=DTYPES[self.column])}
+            for parent, mapping in parents.items():
+                # -1 only for codes whose rows are still being appended; their sums are zero.
+                columns[parent] = np.maximum(mapping[:n], 0)
+            columns.update(day_sums)
+            out.append((day, columns))
+        return out
+
+    # -- saved state (FactStore with a directory) --
+
+    def day_sums(self, day: int) -> np.ndarray:
+        """A day's sums as one (metric, code) array."""
+        sums = self._days[day]
+        return np.stack([sums[name] for name in METRIC_COLUMNS])
+
+    def restore_day(self, day: int, sums: np.ndarray) -> None:
+        self._days[day] = {name: np.array(sums[i], dtype=np.float64) for i, name in enumerate(METRIC_COLUMNS)}
+
+    def parent_state(self) -> Dict[str, np.ndarray]:
+        return {
+            **{f"{self.column}.{parent}": mapping for parent, mapping in self._parents.items()},
+            f"{self.column}.consistent": np.array(self.consistent),
+        }
+
+    def restore_parents(self, state: Mapping[str, np.ndarray]) -> None:
+        for parent in self.parents:
+            saved = state.get(f"{self.column}.{parent}")
+            if saved is not None:
+                self._parents[parent] = saved.astype(DTYPES[parent])
+        consistent = state.get(f"{self.column}.consistent")
+        if consistent is not None:
+            self.consistent = bool(consistent)
+
+
+def _rollups() -> Dict[str, Rollup]:
+    """Coarsest first."""
+    return {
+        "campaign": Rollup("campaign"),
+        "asset_group": Rollup("asset_group", ("campaign",)),
+        "ad": Rollup("ad", ("asset_group", "campaign")),
+    }
+
+
+def _load_arrays(path: str) -> Optional[Dict[str, np.ndarray]]:
+    """The arrays of an .npz file, or None if it is missing or unreadable (then rebuilt from the facts)."""
+    try:
+        with np.load(path) as saved:
+            return {name: saved[name] for name in saved.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _save_arrays(path: str, arrays: Mapping[str, np.ndarray]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class FactStore:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._watchers: List[Callable[[Optional[int]], None]] = []
+        self._open()
+
+    def _open(self) -> None:
+        directory = self.directory
+        if directory is not None:
+            os.makedirs(os.path.join(directory, "dictionaries"), exist_ok=True)
+            os.makedirs(os.path.join(directory, "days"), exist_ok=True)
+        self.dictionaries: Dict[str, IdDictionary] = {
+            name: IdDictionary(os.path.join(directory, "dictionaries", f"{name}.txt") if directory else None)
+            for name in ID_COLUMNS
+        }
+        self.rollups: Dict[str, Rollup] = _rollups()
+        self._partitions: Dict[int, Any] = {}
+        self._dirty: Set[int] = set()  # days appended to since the last sync()
+        if directory is not None:
+            self._load()
+
+    def _day_path(self, day: int) -> str:
+        return os.path.join(self.directory, "days", day_date(day).isoformat())
+
+    def _load(self) -> None:
+        parents = _load_arrays(os.path.join(self.directory, "rollups.npz")) or {}
+        for rollup in self.rollups.values():
+            rollup.restore_parents(parents)
+        for name in sorted(os.listdir(os.path.join(self.directory, "days"))):
+            try:
+                day = day_number(date.fromisoformat(name))
+            except ValueError:
+                continue
+            partition = DiskPartition(self._day_path(day))
+            if not partition.size:
+                continue
+            self._partitions[day] = partition
+            saved = _load_arrays(os.path.join(partition.path, "rollups.npz"))
+            covered = 0
+            if saved is not None and int(saved["rows"]) <= partition.size:
+                covered = int(saved["rows"])
+                for rollup in self.rollups.values():
+                    rollup.restore_day(day, saved[rollup.column])
+            if covered < partition.size:
+                # Rows appended after the rollups were last saved.
+                columns = partition.snapshot()
+                for start in range(covered, partition.size, _CATCH_UP_ROWS):
+                    chunk = {name: values[start:start + _CATCH_UP_ROWS] for name, values in columns.items()}
+                    for rollup in self.rollups.values():
+                        rollup.add(day, chunk)
+                self._dirty.add(day)
+
+    def watch(self, callback: Callable[[Optional[int]], None]) -> None:
+        """Call `callback(day)` after every append to that day is visible to queries, `callback(None)` after clear()."""
+        self._watchers.append(callback)
+
+    def encode(self, column: str, ids: Iterable[str]) -> np.ndarray:
+        return self.dictionaries[column].encode(ids)
+
+    def append(self, day: int, columns: Mapping[str, np.ndarray]) -> None:
+        """Append rows to a day: encoded id columns and metric columns of equal length, keyed by COLUMNS."""
+        lengths = {len(columns[name]) for name in COLUMNS}
+        if len(lengths) != 1:
+            raise ValueError(f"fact columns differ in length: {sorted(lengths)}")
+        if not lengths.pop():
+            return
+        with self._lock:
+            partition = self._partitions.get(day)
+            if partition is None:
+                partition = Partition() if self.directory is None else DiskPartition(self._day_path(day))
+                partition.append(columns)
+                self._partitions[day] = partition
+            else:
+                partition.append(columns)
+            for rollup in self.rollups.values():
+                rollup.add(day, columns)
+            if self.directory is not None:
+                self._dirty.add(day)
+            for callback in self._watchers:
+                callback(day)
+
+    def sync(self) -> None:
+        """Make the facts appended so far durable and save the rollups of the days they went to (no-op in memory)."""
+        if self.directory is None:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for dictionary in self.dictionaries.values():
+                dictionary.sync()
+            for day in sorted(dirty):
+                partition = self._partitions[day]
+                partition.sync()  # the facts before the rollups that claim to include them
+                _save_arrays(os.path.join(partition.path, "rollups.npz"), {
+                    "rows": np.array(partition.size),
+                    **{rollup.column: rollup.day_sums(day) for rollup in self.rollups.values()},
+                })
+            if dirty:
+                state: Dict[str, np.ndarray] = {}
+                for rollup in self.rollups.values():
+                    state.update(rollup.parent_state())
+                _save_arrays(os.path.join(self.directory, "rollups.npz"), state)
+
+    def partitions(self, start_day: int, end_day: int) -> List[Tuple[int, Dict[str, np.ndarray]]]:
+        """(day, columns) of the non-empty days in [start_day, end_day], in day order."""
+        days = sorted(d for d in list(self._partitions) if start_day <= d <= end_day)
+        return [(d, self._partitions[d].snapshot()) for d in days]
+
+    def row_count(self) -> int:
+        return sum(p.size for p in list(self._partitions.values()))
+
+    def clear(self) -> None:
+        """Drop every fact (deleting the files too)."""
+        with self._lock:
+            for dictionary in self.dictionaries.values():
+                dictionary.close()
+            if self.directory is not None:
+                for name in ("dictionaries", "days", "rollups.npz"):
+                    path = os.path.join(self.directory, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+            self._open()
+            for callback in self._watchers:
+                callback(None)
+
+
+FACTS = FactStore(FACTS_DIR)
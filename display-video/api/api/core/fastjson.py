@@ -0,0 +1,157 @@
+"""
+Opt-in fast JSON path for list/get endpoints (DV_FAST_RESPONSES=1), also used for every response with a field mask
+(`fields=`, core.fields), whose subset of fields the response models could not validate.
+
+Instead of building a Pydantic model per row and letting FastAPI validate and re-serialize it, each entity is
+serialized once into a JSON fragment and reused until the entity (or its serving status) changes. List responses
+are then just the cached fragments joined together. The fragments are an LRU bounded by the bytes it holds
+(DV_FRAGMENT_CACHE_BYTES, 0 turns it off), so a store larger than that is partly re-serialized on every full scan.
+The bytes match what the response_model path emits (same field order, defaults and UTC "Z" timestamps).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import AbstractSet, Any, Callable, Dict, Iterable, Optional, Tuple, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+import orjson
+from pydantic_core import PydanticUndefined
+
+from api.core.fields import apply_mask
+
+FAST_RESPONSES = os.environ.get("DV_FAST_RESPONSES", "").lower() in ("1", "true", "yes")
+FRAGMENT_CACHE_BYTES = int(os.environ.get("DV_FRAGMENT_CACHE_BYTES") or 64 * 1024 * 1024)
+
+# Per-entry bookkeeping (key, stamp, OrderedDict node) counted against the bound on top of the fragment.
+_ENTRY_OVERHEAD = 256
+
+
+def fast_responses_enabled() -> bool:
+    return FAST_RESPONSES
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z)
+
+
+_DEFAULTS: Dict[Type[BaseModel], Tuple[Tuple[str, Any, Optional[Callable[[], Any]]], ...]] = {}
+
+
+def _model_defaults(model: Type[BaseModel]) -> Tuple[Tuple[str, Any, Optional[Callable[[], Any]]], ...]:
+    cached = _DEFAULTS.get(model)
+    if cached is None:
+        cached = tuple(
+            (name, None if f.default is PydanticUndefined else f.default, f.default_factory)
+            for name, f in model.model_fields.items()
+        )
+        _DEFAULTS[model] = cached
+    return cached
+
+
+def project(model: Type[BaseModel], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Order/fill `data` like `model` would (fields in declaration order, model defaults for missing keys)."""
+    out: Dict[str, Any] = {}
+    for name, default, factory in _model_defaults(model):
+        if name in data:
+            out[name] = data[name]
+        else:
+            out[name] = factory() if factory is not None else default
+    return out
+
+
+def _stamp(entity: Dict[str, Any]) -> Tuple[Any, ...]:
+    # Every change to a rendering moves one of these: edits bump updatedAt, the serving recompute sets the rest.
+    # Checking the entity being rendered (not the store's current version) means a request still holding the copy
+    # from before a concurrent write can never cache it as the current one.
+    return entity.get("updatedAt"), entity.get("servingStatus"), entity.get("servingReasons")
+
+
+Stamp = Tuple[Any, ...]
+
+
+class FragmentCache:
+    """(entity type, id) -> (stamp of the rendered entity, serialized JSON). Stale entries are replaced on next render."""
+
+    def __init__(self, max_bytes: int = FRAGMENT_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Stamp, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    def get(
+        self,
+        entity_type: str,
+        entity: Dict[str, Any],
+        model: Type[BaseModel],
+        build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ) -> bytes:
+        key = (entity_type, entity["id"])
+        stamp = _stamp(entity)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] == stamp:
+                self._entries.move_to_end(key)
+                return hit[1]
+        frag = dumps(project(model, build(entity) if build else entity))
+        self._put(key, stamp, frag)
+        return frag
+
+    def _put(self, key: Tuple[str, str], stamp: Stamp, frag: bytes) -> None:
+        size = len(frag) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1]) + _ENTRY_OVERHEAD
+            self._entries[key] = (stamp, frag)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self._bytes -= len(dropped) + _ENTRY_OVERHEAD
+
+
+FRAGMENTS = FragmentCache()
+
+
+def render(
+    entity_type: str,
+    entity: Dict[str, Any],
+    model: Type[BaseModel],
+    build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    mask: Optional[AbstractSet[str]] = None,
+) -> bytes:
+    """One entity's JSON: its cached fragment, or with a mask just those fields (small, so not cached)."""
+    if mask is None:
+        return FRAGMENTS.get(entity_type, entity, model, build)
+    return dumps(apply_mask(project(model, build(entity) if build else entity), mask))
+
+
+def entity_response(
+    entity_type: str,
+    entity: Dict[str, Any],
+    model: Type[BaseModel],
+    build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    mask: Optional[AbstractSet[str]] = None,
+) -> Response:
+    return Response(content=render(entity_type, entity, model, build, mask), media_type="application/json", headers=headers)
+
+
+def list_response(
+    entity_type: str,
+    entities: Iterable[Dict[str, Any]],
+    model: Type[BaseModel],
+    build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    envelope: Optional[str] = None,
+    next_page_token: Optional[str] = None,
+    mask: Optional[AbstractSet[str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    body = b"[" + b",".join(render(entity_type, e, model, build, mask) for e in entities) + b"]"
+    if envelope is not None:
+        body = b'{"' + envelope.encode("ascii") + b'":' + body + b',"nextPageToken":' + dumps(next_page_token) + b"}"
+    return Response(content=body, media_type="application/json", headers=headers)
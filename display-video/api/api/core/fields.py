@@ -0,0 +1,39 @@
+"""
+Field masks (sparse fieldsets): `fields=name,servingStatus` keeps only those top-level fields of each entity in a
+response. "id" is always kept. Clients that show a few columns then skip large fields they never read.
+"""
+from __future__ import annotations
+
+from typing import AbstractSet, Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+from starlette import status
+
+from api.core.errors import ProblemError
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (id is always included), e.g. name,servingStatus"
+
+
+def parse_fields(raw: Optional[str], *models: Type[BaseModel]) -> Optional[AbstractSet[str]]:
+    """
+    The field names in a comma-separated mask, checked against the response models' fields (a field of any of
+    them is accepted, e.g. adType in a tree whose other levels lack it). None when no mask was sent.
+    """
+    if raw is None or not raw.strip():
+        return None
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    allowed = set().union(*(model.model_fields for model in models))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ProblemError(
+            status.HTTP_400_BAD_REQUEST,
+            "fields lists unknown fields",
+            [{"field": "fields", "message": f"Unknown field '{name}'."} for name in unknown],
+        )
+    return frozenset(names) | {"id"}
+
+
+def apply_mask(data: Dict[str, Any], mask: Optional[AbstractSet[str]]) -> Dict[str, Any]:
+    if mask is None:
+        return data
+    return {k: v for k, v in data.items() if k in mask}
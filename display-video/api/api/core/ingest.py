@@ -0,0 +1,429 @@
+"""
+Delivery-event ingestion into the report facts (core.facts): POST /v1/reports/events:ingest, and for files
+
+    cd api && python -m api.core.ingest events.ndjson [more.csv.gz ...] [--format ndjson|csv]
+
+An event is one ad's delivery on one day: {"date": "2025-01-31", "adId": "...", "impressions": 1200, "clicks": 3,
+"spend": 4500}, with spend in cents and absent metrics counting as 0. Bodies are NDJSON (one object per line) or
+CSV (a header line naming those fields, in any order; other fields are ignored). The asset group and campaign of a
+fact come from the ad in STORE, so an event for an unknown ad is rejected, like one with a bad date or a metric that
+is not a non-negative integer up to MAX_METRIC (2**53, as far as the float64 fact columns hold integers exactly; in
+NDJSON it must be a JSON number, not a string or a boolean). Rejected events are counted and the first MAX_ERRORS
+reported with their line numbers; the others are kept.
+
+Lines are buffered until BATCH_EVENTS are complete and then handled together: NDJSON is decoded with one
+orjson.loads over the batch (falling back to line by line only if that fails), CSV with one csv.reader pass, and
+each field becomes a column with list comprehensions and a NumPy conversion. Dates and ad ids are resolved once per
+distinct value, and the valid rows are appended to the fact store one day at a time. The HTTP handler reads the
+next chunk of the body only after a full batch is appended, so a client cannot send faster than the store takes
+events, and INGEST_CONCURRENCY requests ingest at a time (the rest wait without reading their bodies).
+
+Every ingest ends with FactStore.sync(), so with a facts directory what it accepted is on disk when it returns (the
+CLI writes there too, resolving ads from the store recovered from DV_DATA_DIR; stop the server first, one process
+writes a directory). Without one, facts live in the serving process, and with several workers each ingest lands in
+the worker that received it.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import os
+import sys
+import time
+from datetime import date
+from operator import itemgetter
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+from starlette import status
+
+from api.core.errors import ProblemError
+from api.core.facts import METRIC_COLUMNS, FactStore, day_number
+from api.core.repository import Repository
+
+# Complete lines parsed and appended together.
+BATCH_EVENTS = 50_000
+# Requests ingesting at once.
+INGEST_CONCURRENCY = max(1, int(os.environ.get("DV_INGEST_CONCURRENCY") or 2))
+MAX_ERRORS = 100
+MAX_METRIC = 2 ** 53
+READ_BYTES = 1 << 20
+
+# Event field -> fact metric column
+METRIC_FIELDS: Dict[str, str] = {"impressions": "impressions", "clicks": "clicks", "spend": "spend"}
+assert set(METRIC_FIELDS.values()) == set(METRIC_COLUMNS)
+
+CONTENT_TYPES: Dict[str, str] = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+_NO_DAY = np.iinfo(np.int64).min
+_JSON_NUMBERS = frozenset((int, float))
+_DATE, _AD_ID = itemgetter("date"), itemgetter("adId")
+
+
+def ingest_format(content_type: Optional[str]) -> str:
+    """ndjson or csv from a Content-Type header; 415 for anything else."""
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    fmt = CONTENT_TYPES.get(media_type)
+    if fmt is None:
+        raise ProblemError(
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            "Send delivery events as NDJSON (application/x-ndjson) or CSV (text/csv)",
+            [{"field": "Content-Type", "message": f"Supported: {', '.join(CONTENT_TYPES)}."}],
+            title="Unsupported Media Type",
+            code="UNSUPPORTED_MEDIA_TYPE",
+            type_="https://example.com/problems/unsupported-media-type",
+        )
+    return fmt
+
+
+def _number(value: Any) -> float:
+    """A CSV metric field as float (NaN when it is not a number, 0 when empty), for the per-value fallback."""
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    if isinstance(value, str):
+        if not value.strip():
+            return 0.0
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return float("nan")
+
+
+def _json_number(value: Any) -> float:
+    """An NDJSON metric value as float; NaN for anything but a JSON number (booleans and numeric strings too)."""
+    if type(value) not in _JSON_NUMBERS:
+        return float("nan")
+    try:
+        return float(value)
+    except OverflowError:
+        return float("inf")
+
+
+def _hashable(values: Sequence[Any]) -> Sequence[Any]:
+    """`values`, with None for any list or object (which JSON allows where an id or a date belongs)."""
+    try:
+        set(values)
+        return values
+    except TypeError:
+        return [v if isinstance(v, (str, bytes)) else None for v in values]
+
+
+def _uniform_fields(data: bytes, lines: int, width: int) -> bool:
+    """Whether each of the newline-joined lines in `data` has exactly `width` comma-separated fields."""
+    buf = np.frombuffer(data, np.uint8)
+    commas = np.flatnonzero(buf == ord(","))
+    per_line = width - 1
+    if len(commas) != per_line * lines:
+        return False
+    ends = np.flatnonzero(buf == ord("\n"))
+    # With the total right, each line has its share iff line k's first comma is after newline k - 1 and line
+    # k - 1's last comma before it.
+    return bool(np.all(commas[per_line::per_line] > ends) and np.all(commas[per_line - 1:-1:per_line] < ends))
+
+
+def _metric_column(values: List[Any], number: Callable[[Any], float] = _number) -> np.ndarray:
+    """`values` as a float64 column: one NumPy conversion when that gives one, else `number` per value."""
+    try:
+        column = np.array(values, dtype=np.float64)
+        if column.ndim == 1:
+            return column
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return np.array([number(v) for v in values], dtype=np.float64)
+
+
+def _json_metric_column(values: List[Any]) -> np.ndarray:
+    # NumPy would also take True as 1 and "5" as 5; only numbers go through the one-conversion path.
+    if set(map(type, values)) <= _JSON_NUMBERS:
+        return _metric_column(values, _json_number)
+    return np.array([_json_number(v) for v in values], dtype=np.float64)
+
+
+class EventIngest:
+    """One ingest (a request body or a set of files): write() chunks, flush() when it says so, then close()."""
+
+    def __init__(self, facts: FactStore, store: Repository, fmt: str, batch_events: int = BATCH_EVENTS) -> None:
+        self.facts = facts
+        self.store = store
+        self.fmt = fmt
+        self.batch_events = batch_events
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._lines: List[bytes] = []  # complete lines not handled yet
+        self._tail = b""  # the incomplete last line
+        self._line = 0  # line number of self._lines[0], minus one
+        self._header: Optional[List[str]] = None
+        self._days: Dict[Any, int] = {}
+        # ad id (str, or bytes from CSV) -> row of _ad_codes: its (ad, asset group, campaign) codes, -1s if not an ad
+        self._ad_slots: Dict[Any, int] = {}
+        self._ad_codes = np.empty((0, 3), np.intp)
+
+    def write(self, chunk: bytes) -> bool:
+        """Buffer a piece of the body; True once BATCH_EVENTS lines are complete and flush() should run."""
+        lines = (self._tail + chunk).split(b"\n") if self._tail else chunk.split(b"\n")
+        self._tail = lines.pop()
+        self._lines += lines
+        return len(self._lines) >= self.batch_events
+
+    def flush(self) -> None:
+        """Parse the complete lines buffered so far and append their valid events to the fact store."""
+        lines, self._lines = self._lines, []
+        first = self._line + 1
+        self._line += len(lines)
+        if self.fmt == "csv" and self._header is None:
+            if not lines:
+                return
+            self._header = self._csv_header(lines[0])
+            lines, first = lines[1:], first + 1
+        if not lines:
+            return
+        if self.fmt == "csv":
+            parsed = self._parse_csv(lines, first)
+        else:
+            parsed = self._parse_ndjson(lines, first)
+        if parsed is not None:
+            self._append(*parsed)
+
+    def close(self) -> Dict[str, Any]:
+        """Handle what is left (a last line without a newline too) and return the outcome."""
+        if self._tail:
+            self._lines.append(self._tail)
+            self._tail = b""
+        self.flush()
+        self.facts.sync()
+        if self.fmt == "csv" and self._header is None:
+            raise ProblemError(
+                status.HTTP_400_BAD_REQUEST, "CSV body is empty", [{"field": "body", "message": "Expected a header line."}]
+            )
+        return {"accepted": self.accepted, "rejected": self.rejected, "errors": self.errors}
+
+    def _error(self, line: int, field: str, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "field": field, "message": message})
+
+    # -- parsing: each returns (dates, ad ids, metric columns, line numbers) of the rows to append --
+
+    def _csv_header(self, line: bytes) -> List[str]:
+        header = [name.strip() for name in next(csv.reader([line.decode("utf-8-sig", "replace")]), [])]
+        missing = [name for name in ("date", "adId") if name not in header]
+        if missing:
+            raise ProblemError(
+                status.HTTP_400_BAD_REQUEST,
+                "CSV header lacks required columns",
+                [{"field": "header", "message": f"Missing: {', '.join(missing)}."}],
+            )
+        return header
+
+    def _parse_csv(self, lines: List[bytes], first: int):
+        header = self._header
+        width = len(header)
+        data = b"\n".join(lines)
+        if b'"' not in data and _uniform_fields(data, len(lines), width):
+            # No quoting and every line has all its fields: one split, then each column is a slice (of bytes).
+            if b"\r" in data:
+                data = data.replace(b"\r", b"")
+            fields = data.replace(b"\n", b",").split(b",")
+            columns = {name: fields[i::width] for i, name in enumerate(header)}
+            return self._csv_columns(columns, len(lines), np.arange(first, first + len(lines)))
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8", "replace"))))
+        numbers: Optional[np.ndarray] = None
+        if len(rows) != len(lines) or any(len(row) != width for row in rows):
+            # Blank or malformed lines: keep the well-formed rows and their line numbers.
+            kept, kept_numbers = [], []
+            for offset, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                row = next(csv.reader([line.rstrip(b"\r").decode("utf-8", "replace")]), [])
+                if len(row) != width:
+                    self._error(first + offset, "event", f"Expected {width} fields.")
+                    continue
+                kept.append(row)
+                kept_numbers.append(first + offset)
+            if not kept:
+                return None
+            rows, numbers = kept, np.array(kept_numbers)
+        if numbers is None:
+            numbers = np.arange(first, first + len(rows))
+        return self._csv_columns(dict(zip(header, map(list, zip(*rows)))), len(rows), numbers)
+
+    def _csv_columns(self, columns: Dict[str, List[Any]], n: int, numbers: np.ndarray):
+        metrics = {
+            column: _metric_column(columns[name]) if name in columns else np.zeros(n)
+            for name, column in METRIC_FIELDS.items()
+        }
+        return columns["date"], columns["adId"], metrics, numbers
+
+    def _parse_ndjson(self, lines: List[bytes], first: int):
+        numbers: Optional[np.ndarray] = None
+        try:
+            events = orjson.loads(b"[" + b",".join(lines) + b"]")
+            # Also what checks that every event is an object with a date and an adId.
+            dates, ad_ids = list(map(_DATE, events)), list(map(_AD_ID, events))
+        except (orjson.JSONDecodeError, TypeError, KeyError):
+            events, kept_numbers = [], []
+            for offset, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                try:
+                    event = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    self._error(first + offset, "event", "Invalid JSON.")
+                    continue
+                if type(event) is not dict:
+                    self._error(first + offset, "event", "Expected a JSON object.")
+                    continue
+                events.append(event)
+                kept_numbers.append(first + offset)
+            if not events:
+                return None
+            numbers = np.array(kept_numbers)
+            dates, ad_ids = [e.get("date") for e in events], [e.get("adId") for e in events]
+        metrics = {}
+        for name, column in METRIC_FIELDS.items():
+            try:
+                values = list(map(itemgetter(name), events))
+            except KeyError:
+                values = [e.get(name, 0) for e in events]
+            metrics[column] = _json_metric_column(values)
+        if numbers is None:
+            numbers = np.arange(first, first + len(events))
+        return dates, ad_ids, metrics, numbers
+
+    # -- validation and append --
+
+    def _resolve_days(self, dates: Sequence[Any]) -> np.ndarray:
+        cache = self._days
+        try:
+            return np.fromiter(map(cache.__getitem__, dates), np.int64, len(dates))
+        except (KeyError, TypeError):
+            dates = _hashable(dates)
+        for value in set(dates) - cache.keys():
+            try:
+                text = value.decode() if isinstance(value, bytes) else value
+                cache[value] = day_number(date.fromisoformat(text))
+            except (TypeError, ValueError):
+                cache[value] = _NO_DAY
+        return np.fromiter(map(cache.__getitem__, dates), np.int64, len(dates))
+
+    def _resolve_ads(self, ad_ids: Sequence[Any]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """(valid mask, id column -> codes) for the rows' ad ids."""
+        slots = self._ad_slots
+        try:
+            index = np.fromiter(map(slots.__getitem__, ad_ids), np.intp, len(ad_ids))
+        except (KeyError, TypeError):
+            ad_ids = _hashable(ad_ids)
+            self._add_ads(set(ad_ids) - slots.keys())
+            index = np.fromiter(map(slots.__getitem__, ad_ids), np.intp, len(ad_ids))
+        codes = self._ad_codes[index]
+        return codes[:, 0] >= 0, {"ad": codes[:, 0], "asset_group": codes[:, 1], "campaign": codes[:, 2]}
+
+    def _add_ads(self, values: Iterable[Any]) -> None:
+        """Look new ad ids up in STORE and give each a row of (ad, asset group, campaign) codes, -1s if unknown."""
+        ads, groups = self.store.ads, self.store.asset_groups
+        rows = []
+        for value in values:
+            ad_id = value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+            ad = ads.get(ad_id) if isinstance(ad_id, str) and ad_id else None
+            group = groups.get(ad["assetGroupId"]) if ad is not None else None
+            self._ad_slots[value] = len(self._ad_slots)
+            if group is None:
+                rows.append((-1, -1, -1))
+            else:
+                rows.append((
+                    int(self.facts.encode("ad", [ad_id])[0]),
+                    int(self.facts.encode("asset_group", [group["id"]])[0]),
+                    int(self.facts.encode("campaign", [group["campaignId"]])[0]),
+                ))
+        self._ad_codes = np.concatenate([self._ad_codes, np.array(rows, dtype=np.intp).reshape(-1, 3)])
+
+    def _append(self, dates: Sequence[Any], ad_ids: Sequence[Any], metrics: Mapping[str, np.ndarray], numbers: np.ndarray) -> None:
+        days = self._resolve_days(dates)
+        ad_ok, codes = self._resolve_ads(ad_ids)
+        date_ok = days != _NO_DAY
+        metric_ok = {c: (v >= 0) & (v <= MAX_METRIC) & (v == np.floor(v)) for c, v in metrics.items()}
+        valid = date_ok & ad_ok
+        for ok in metric_ok.values():
+            valid &= ok
+        if not valid.all():
+            for i in np.flatnonzero(~valid):
+                if not date_ok[i]:
+                    self._error(int(numbers[i]), "date", "Expected YYYY-MM-DD.")
+                elif not ad_ok[i]:
+                    self._error(int(numbers[i]), "adId", "Ad not found." if ad_ids[i] else "adId is required.")
+                else:
+                    field = next(name for name, c in METRIC_FIELDS.items() if not metric_ok[c][i])
+                    self._error(int(numbers[i]), field, "Expected a non-negative integer up to 2**53.")
+            keep = np.flatnonzero(valid)
+            if not len(keep):
+                return
+            days = days[keep]
+            codes = {c: v[keep] for c, v in codes.items()}
+            metrics = {c: v[keep] for c, v in metrics.items()}
+        columns = {**codes, **metrics}
+        if days[0] == days[-1] and (days == days[0]).all():
+            self.facts.append(int(days[0]), columns)
+        else:
+            order = np.argsort(days, kind="stable")
+            days = days[order]
+            columns = {c: v[order] for c, v in columns.items()}
+            starts = np.flatnonzero(np.diff(days)) + 1
+            for lo, hi in zip([0, *starts], [*starts, len(days)]):
+                self.facts.append(int(days[lo]), {c: v[lo:hi] for c, v in columns.items()})
+        self.accepted += len(days)
+
+
+def ingest_file(ingest: EventIngest, stream: BinaryIO) -> None:
+    while True:
+        chunk = stream.read(READ_BYTES)
+        if not chunk:
+            return
+        if ingest.write(chunk):
+            ingest.flush()
+
+
+def _file_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.lower().endswith(".csv") else "ndjson"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from api.core.facts import FACTS
+    from api.core.persistence import DATA_DIR, recover
+    from api.core.store import STORE, MemoryStore
+
+    parser = argparse.ArgumentParser(description="Load delivery-event files (NDJSON or CSV, optionally .gz) into the report facts.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", choices=("ndjson", "csv"), help="default: from each file's extension")
+    args = parser.parse_args(argv)
+    if DATA_DIR and isinstance(STORE, MemoryStore):
+        recover(STORE, DATA_DIR)  # the ads the events name; this process only reads the store
+
+    for path in args.paths:
+        ingest = EventIngest(FACTS, STORE, args.format or _file_format(path))
+        start = time.perf_counter()
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as stream:
+            ingest_file(ingest, stream)
+        try:
+            result = ingest.close()
+        except ProblemError as exc:
+            sys.exit(f"{path}: {exc.detail}")
+        elapsed = time.perf_counter() - start
+        rate = (result["accepted"] + result["rejected"]) / elapsed if elapsed else 0.0
+        print(f"{path}: {result['accepted']:,} accepted, {result['rejected']:,} rejected in {elapsed:.2f}s ({rate:,.0f} events/s)")
+        for error in result["errors"]:
+            print(f"  line {error['line']}: {error['field']}: {error['message']}")
+
+
+if __name__ == "__main__":
+    main()
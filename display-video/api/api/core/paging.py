@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query
+from starlette import status
+
+from api.core.fields import FIELDS_DESCRIPTION
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+@dataclass
+class ListQuery:
+    """Pagination + server-side filters shared by every list endpoint."""
+
+    pageSize: Optional[int] = None
+    pageToken: Optional[str] = None
+    filters: Dict[str, Any] = field(default_factory=dict)
+    # Raw field mask (core.fields.parse_fields); shapes the rows, not which rows, so it is not part of page tokens.
+    fields: Optional[str] = None
+
+    @property
+    def paginated(self) -> bool:
+        # Without pageSize/pageToken the endpoints keep returning the whole (filtered) collection as an array.
+        return self.pageSize is not None or self.pageToken is not None
+
+
+def list_query(
+    pageSize: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    pageToken: Optional[str] = Query(None),
+    servingStatus: Optional[str] = Query(None),
+    archived: Optional[bool] = Query(None),
+    namePrefix: Optional[str] = Query(None, min_length=1),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+) -> ListQuery:
+    filters: Dict[str, Any] = {}
+    if servingStatus is not None:
+        filters["servingStatus"] = servingStatus
+    if archived is not None:
+        filters["archived"] = archived
+    if namePrefix is not None:
+        filters["namePrefix"] = namePrefix
+    return ListQuery(pageSize=pageSize, pageToken=pageToken, filters=filters, fields=fields)
+
+
+def _fingerprint(entity_type: str, parent_id: Optional[str], filters: Dict[str, Any]) -> str:
+    raw = f"{entity_type}|{parent_id}|{sorted(filters.items())}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_page_token(seq: int, fingerprint: str) -> str:
+    return base64.urlsafe_b64encode(f"1:{seq}:{fingerprint}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: str, fingerprint: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        version, seq, fp = raw.split(":")
+        if version != "1" or fp != fingerprint:
+            raise ValueError(raw)
+        return int(seq)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="pageToken is invalid or does not match the request filters")
+
+
+def select(
+    store: Any,
+    entity_type: str,
+    query: ListQuery,
+    parent_id: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Walk the store's creation-ordered index from the page token's position, keeping entities that match
+    the filters (evaluated by the store, so a database backend can use its indexes). The token carries the
+    next sequence number, so resuming costs a seek rather than a re-scan of earlier pages.
+    Returns (entities, nextPageToken).
+    """
+    fp = _fingerprint(entity_type, parent_id, query.filters)
+    start = decode_page_token(query.pageToken, fp) if query.pageToken else 0
+    limit = (query.pageSize or DEFAULT_PAGE_SIZE) if query.paginated else None
+
+    out: List[Dict[str, Any]] = []
+    for seq, entity in store.scan(entity_type, parent_id=parent_id, start_seq=start, filters=query.filters):
+        if limit is not None and len(out) == limit:
+            return out, encode_page_token(seq, fp)
+        out.append(entity)
+    return out, None
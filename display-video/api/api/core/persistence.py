@@ -0,0 +1,344 @@
+"""
+Durable MemoryStore (DV_DATA_DIR): a write-ahead log of store mutations plus periodic snapshots.
+
+Every write to the store (entity save/serving change, ad content and blob bookkeeping) appends one record holding
+the full new state of what changed. A single writer thread group-commits them: whatever accumulated while the
+previous fsync ran goes out in the next write+fsync, so concurrent requests share fsyncs instead of paying one
+each. Mutating HTTP requests are only answered once their records are durable (DurableWritesMiddleware).
+
+Layout of the data directory:
+    wal-<gen>.log       records appended while generation <gen> was current
+    snapshot-<gen>.pkl  store state taken after wal-<gen> was opened; it covers every wal-<g> with g < gen
+
+When the current segment passes DV_WAL_CHECKPOINT_BYTES the writer starts a new segment and a background thread
+writes the next snapshot, then drops the segments and snapshots it supersedes. The snapshot is "fuzzy" (taken
+while writes continue), which is fine because records are full states: replaying the newer segments over it
+converges on the same store. Recovery loads the newest snapshot and replays the segments from its generation
+on; a torn record at the end of the last segment (crash mid-append) is truncated away.
+
+Files are pickles written and read only by this server; do not point DV_DATA_DIR at untrusted data.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import pickle
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.environ.get("DV_DATA_DIR") or None
+# Bounds how much log a restart replays on top of loading the latest snapshot.
+CHECKPOINT_BYTES = int(os.environ.get("DV_WAL_CHECKPOINT_BYTES") or 16 * 1024 * 1024)
+
+SNAPSHOT_FORMAT = 1
+_FRAME = struct.Struct(">II")  # payload length, crc32(payload)
+_PROTOCOL = pickle.HIGHEST_PROTOCOL
+_FILE_RE = re.compile(r"^(wal|snapshot)-(\d{12})\.(log|pkl)$")
+
+
+def _segment_path(data_dir: str, gen: int) -> str:
+    return os.path.join(data_dir, f"wal-{gen:012d}.log")
+
+
+def _snapshot_path(data_dir: str, gen: int) -> str:
+    return os.path.join(data_dir, f"snapshot-{gen:012d}.pkl")
+
+
+def _generations(data_dir: str, kind: str) -> List[int]:
+    gens = []
+    for name in os.listdir(data_dir):
+        m = _FILE_RE.match(name)
+        if m and m.group(1) == kind:
+            gens.append(int(m.group(2)))
+    return sorted(gens)
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_snapshot(data_dir: str, gen: int, state: Dict[str, Any]) -> str:
+    path = _snapshot_path(data_dir, gen)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({"format": SNAPSHOT_FORMAT, "generation": gen, "state": state}, f, protocol=_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(data_dir)
+    return path
+
+
+def apply_record(store: Any, op: Tuple[Any, ...]) -> None:
+    kind = op[0]
+    if kind == "put":
+        store.save(op[1], op[2])
+    elif kind == "set":
+        getattr(store, op[1])[op[2]] = op[3]
+    elif kind == "del":
+        getattr(store, op[1]).pop(op[2], None)
+    else:
+        raise ValueError(f"Unknown journal record {kind!r}")
+
+
+def _replay_segment(store: Any, path: str, is_last: bool) -> int:
+    """Apply every record in one segment; returns the record count. Truncates a torn tail on the last segment."""
+    count = 0
+    with open(path, "rb") as f:
+        data = f.read()
+    pos, end = 0, len(data)
+    while pos < end:
+        if pos + _FRAME.size > end:
+            break
+        length, crc = _FRAME.unpack_from(data, pos)
+        start = pos + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        apply_record(store, pickle.loads(payload))
+        count += 1
+        pos = start + length
+    if pos < end:
+        if not is_last:
+            raise RuntimeError(f"Corrupt write-ahead log record in {path} at offset {pos}")
+        logger.warning("Truncating torn tail of %s at offset %d (%d bytes)", path, pos, end - pos)
+        with open(path, "r+b") as f:
+            f.truncate(pos)
+            os.fsync(f.fileno())
+    return count
+
+
+class RecoveryStats:
+    def __init__(self) -> None:
+        self.snapshot_generation: Optional[int] = None
+        self.snapshot_entities = 0
+        self.segments_replayed = 0
+        self.records_replayed = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"snapshot={self.snapshot_generation} entities={self.snapshot_entities} "
+            f"segments={self.segments_replayed} records={self.records_replayed} seconds={self.seconds:.3f}"
+        )
+
+
+def recover(store: Any, data_dir: str) -> Tuple[int, RecoveryStats]:
+    """Load the newest snapshot and replay the log after it into `store`. Returns (last generation seen, stats)."""
+    stats = RecoveryStats()
+    t0 = time.perf_counter()
+    # Loading builds hundreds of thousands of small containers; cyclic GC passes over them are pure overhead.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        snapshots = _generations(data_dir, "snapshot")
+        base = 0
+        if snapshots:
+            base = snapshots[-1]
+            with open(_snapshot_path(data_dir, base), "rb") as f:
+                snap = pickle.load(f)
+            if snap.get("format") != SNAPSHOT_FORMAT:
+                raise RuntimeError(f"Unsupported snapshot format {snap.get('format')!r}")
+            store.load_state(snap["state"])
+            stats.snapshot_generation = base
+            stats.snapshot_entities = sum(len(v) for v in snap["state"]["entities"].values())
+        segments = [g for g in _generations(data_dir, "wal") if g >= base]
+        for i, gen in enumerate(segments):
+            stats.records_replayed += _replay_segment(store, _segment_path(data_dir, gen), i == len(segments) - 1)
+            stats.segments_replayed += 1
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    stats.seconds = time.perf_counter() - t0
+    return max([base] + segments), stats
+
+
+class Journal:
+    """Append-only, group-committed log of store records. append() never blocks on I/O; wait_durable() does."""
+
+    def __init__(
+        self,
+        data_dir: str,
+        generation: int,
+        snapshot_state: Callable[[], Dict[str, Any]],
+        checkpoint_bytes: int = CHECKPOINT_BYTES,
+    ) -> None:
+        self.data_dir = data_dir
+        self._snapshot_state = snapshot_state
+        self._checkpoint_bytes = checkpoint_bytes
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._appended = 0  # sequence number of the last appended record
+        self._durable = 0  # sequence number of the last record known to be on disk
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._gen = generation
+        self._fh = open(_segment_path(data_dir, generation), "ab")
+        self._segment_bytes = self._fh.tell()
+        _fsync_dir(data_dir)
+        self._checkpoint_thread: Optional[threading.Thread] = None
+        self._checkpoint_requested = False
+        self.commits = 0  # fsyncs issued, for observing how well appends are grouped
+        self._writer = threading.Thread(target=self._run, name="dv-wal", daemon=True)
+        self._writer.start()
+
+    @property
+    def appended(self) -> int:
+        return self._appended
+
+    def append(self, op: Tuple[Any, ...]) -> int:
+        # Serialize under the lock: records must hold the state as of their position in the log.
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            payload = pickle.dumps(op, protocol=_PROTOCOL)
+            self._pending.append(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._appended += 1
+            self._cond.notify_all()
+            return self._appended
+
+    def wait_durable(self, seq: int) -> None:
+        with self._cond:
+            while self._durable < seq and self._error is None:
+                self._cond.wait()
+            if self._error is not None and self._durable < seq:
+                raise RuntimeError("Write-ahead log failed") from self._error
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed and not self._checkpoint_requested:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+                upto = self._appended
+                requested, self._checkpoint_requested = self._checkpoint_requested, False
+            try:
+                if batch:
+                    data = b"".join(batch)
+                    self._fh.write(data)
+                    self._fh.flush()
+                    os.fsync(self._fh.fileno())
+                    self._segment_bytes += len(data)
+                if (requested or self._segment_bytes >= self._checkpoint_bytes) and self._checkpoint_thread is None:
+                    self._start_checkpoint()
+            except BaseException as e:  # pragma: no cover - disk failure
+                logger.exception("Write-ahead log write failed")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            if batch:
+                with self._cond:
+                    self._durable = upto
+                    self.commits += 1
+                    self._cond.notify_all()
+
+    def _rotate(self) -> int:
+        """Start the next segment (writer thread, or after it has stopped); returns the new generation."""
+        self._fh.close()
+        self._gen += 1
+        self._fh = open(_segment_path(self.data_dir, self._gen), "ab")
+        self._segment_bytes = 0
+        _fsync_dir(self.data_dir)
+        return self._gen
+
+    def _start_checkpoint(self) -> None:
+        gen = self._rotate()
+        self._checkpoint_thread = threading.Thread(target=self._checkpoint, args=(gen,), name="dv-snapshot", daemon=True)
+        self._checkpoint_thread.start()
+
+    def _checkpoint(self, gen: int) -> None:
+        try:
+            t0 = time.perf_counter()
+            write_snapshot(self.data_dir, gen, self._snapshot_state())
+            for old in _generations(self.data_dir, "wal"):
+                if old < gen:
+                    os.remove(_segment_path(self.data_dir, old))
+            for old in _generations(self.data_dir, "snapshot"):
+                if old < gen:
+                    os.remove(_snapshot_path(self.data_dir, old))
+            logger.info("Wrote snapshot %d in %.3fs", gen, time.perf_counter() - t0)
+        except Exception:  # pragma: no cover - disk failure; the log still has everything
+            logger.exception("Snapshot %d failed", gen)
+        finally:
+            self._checkpoint_thread = None
+
+    def checkpoint_soon(self) -> None:
+        """Ask the writer to start a snapshot in the background (e.g. after replaying a long log at startup)."""
+        with self._cond:
+            self._checkpoint_requested = True
+            self._cond.notify_all()
+
+    def close(self, checkpoint: bool = True) -> None:
+        """Flush and stop the writer; by default also snapshot so the next start replays nothing."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        pending = self._checkpoint_thread
+        if pending is not None:
+            pending.join()
+        if checkpoint and self._error is None and self._segment_bytes > 0:
+            self._checkpoint(self._rotate())
+        self._fh.close()
+        if self._error is None and self._segment_bytes == 0:
+            # Nothing was logged to it (an idle run, or the segment the snapshot above rotated to): the next start
+            # opens a new one, so leaving it would add an empty file per restart.
+            os.remove(_segment_path(self.data_dir, self._gen))
+            _fsync_dir(self.data_dir)
+
+
+def open_persistence(store: Any, data_dir: str) -> RecoveryStats:
+    """Recover `store` from data_dir and start journaling its writes."""
+    os.makedirs(data_dir, exist_ok=True)
+    last_gen, stats = recover(store, data_dir)
+    logger.info("Recovered store from %s: %r", data_dir, stats)
+    store.journal = Journal(data_dir, last_gen + 1, store.dump_state)
+    if stats.records_replayed:
+        store.journal.checkpoint_soon()
+    return stats
+
+
+def close_persistence(store: Any) -> None:
+    journal, store.journal = store.journal, None
+    if journal is not None:
+        journal.close()
+
+
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class DurableWritesMiddleware:
+    """Holds back the response to a mutating request until the log records written so far are on disk."""
+
+    def __init__(self, app: Any, store: Any) -> None:
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_when_durable(message: Dict[str, Any]) -> None:
+            journal = self.store.journal
+            if message["type"] == "http.response.start" and journal is not None:
+                await run_in_threadpool(journal.wait_durable, journal.appended)
+            await send(message)
+
+        await self.app(scope, receive, send_when_durable)
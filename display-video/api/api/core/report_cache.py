@@ -0,0 +1,151 @@
+"""
+Cache of POST /v1/reports/query responses: the reporting page re-issues the same queries on every filter toggle.
+
+Entries are the serialized JSON bodies, keyed on the normalized query (query_key): dates as day numbers, metrics and
+dimensions without repeats (their order shapes the response, so it is kept), filters sorted with each value turned
+into a sorted set of ids. Spellings of a query that the engine answers identically share an entry, and a hit is a
+dict lookup plus returning the bytes, skipping the engine and response validation alike.
+
+The cache is an LRU bounded by the bytes it holds (DV_REPORT_CACHE_BYTES, 0 turns it off), and entries also expire
+after DV_REPORT_CACHE_TTL seconds. Invalidation is by date range: FactStore calls invalidate(day) after every append
+(core.facts.FactStore.watch), which drops the entries whose range includes that day, and invalidate(None) on
+clear(). A query that was running while a day in its range took an append is answered but not stored, since it may
+have read the day from before the append.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from api.core.facts import FACTS, FactStore
+from api.core.fastjson import dumps, project
+from api.core.report_engine import date_range, run_report
+from api.models.report import ReportQuery, ReportResponse
+
+REPORT_CACHE_BYTES = int(os.environ.get("DV_REPORT_CACHE_BYTES") or 64 * 1024 * 1024)
+REPORT_CACHE_TTL = float(os.environ.get("DV_REPORT_CACHE_TTL") or 300)
+
+# Per-entry bookkeeping (key, OrderedDict node, tuple) counted against the bound on top of the body.
+_ENTRY_OVERHEAD = 512
+
+QueryKey = Tuple[Any, ...]
+
+
+def query_key(q: ReportQuery) -> Optional[QueryKey]:
+    """The normalized query, starting with its first and last day; None for one the engine is going to reject."""
+    if not q.metrics:
+        return None
+    filters = []
+    for key, want in q.filters.items():
+        values = [want] if isinstance(want, str) else want
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            return None
+        filters.append((key, tuple(sorted(set(values)))))
+    start, end = date_range(q)
+    return (
+        start, end, q.timeGrain, tuple(dict.fromkeys(q.metrics)), tuple(dict.fromkeys(q.dimensions)),
+        tuple(sorted(filters)), q.limit, q.offset,
+    )
+
+
+class ReportCache:
+    def __init__(self, max_bytes: int = REPORT_CACHE_BYTES, ttl: float = REPORT_CACHE_TTL) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[QueryKey, Tuple[bytes, float]]" = OrderedDict()  # body, expiry (monotonic)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # Moves on every invalidation; _touched has the generation that last invalidated each day.
+        self.generation = 0
+        self._touched: Dict[int, int] = {}
+        self._cleared = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: QueryKey) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: QueryKey, body: bytes, generation: int) -> None:
+        """Store `body`, computed from facts read after `generation` was current, unless its range changed since."""
+        size = len(body) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        start, end = key[0], key[1]
+        with self._lock:
+            if generation < self._cleared:
+                return
+            if generation != self.generation and any(
+                g > generation and start <= day <= end for day, g in self._touched.items()
+            ):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: QueryKey) -> None:
+        body, _ = self._entries.pop(key)
+        self._bytes -= len(body) + _ENTRY_OVERHEAD
+
+    def invalidate(self, day: Optional[int]) -> None:
+        """Drop the entries whose date range includes `day` (every entry if None)."""
+        with self._lock:
+            self.generation += 1
+            if day is None:
+                self._cleared = self.generation
+                self._touched.clear()
+                stale = list(self._entries)
+            else:
+                self._touched[day] = self.generation
+                stale = [key for key in self._entries if key[0] <= day <= key[1]]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def cached_report(cache: ReportCache, facts: FactStore, q: ReportQuery) -> Tuple[bytes, bool]:
+    """The response body for `q` (as the ReportResponse model would serialize it) and whether it came from `cache`."""
+    key = query_key(q) if cache.max_bytes > 0 else None
+    if key is not None:
+        body = cache.get(key)
+        if body is not None:
+            return body, True
+    generation = cache.generation
+    body = dumps(project(ReportResponse, run_report(facts, q)))
+    if key is not None:
+        cache.put(key, body, generation)
+    return body, False
+
+
+REPORT_CACHE = ReportCache()
+FACTS.watch(REPORT_CACHE.invalidate)
@@ -0,0 +1,336 @@
+"""
+Report queries over the columnar facts (core.facts): filter, group by any subset of the dimensions, bucket dates by
+timeGrain, total.
+
+Each day partition in the date range is reduced on its own: the grouped id columns are combined into one int64
+key (mixed radix over the dictionary sizes), rows failing the id filters are dropped with a vectorized mask, and
+the metrics are summed per key with np.bincount, dense when the key space is small next to the partition, else
+over np.unique's inverse. The partition results, one row per group present, are then merged the same way. A
+partition is a single day, so its date bucket is a constant and never multiplies the key space. Groups whose
+requested metrics are all zero are left out (that spares a counting pass over the rows).
+
+plan picks the source: the coarsest rollup (core.facts.Rollup) holding every column the query groups or filters
+on, else the raw facts. Either way the partitions go through the same reduction, so the answer is the same; the
+response's debug.source says which one served it (rollup:campaign, rollup:asset_group, rollup:ad or facts).
+
+Rows are ordered by date bucket, then by the first requested metric, largest first (ties by id codes), and paged
+with offset/limit. DATE in the dimensions buckets by timeGrain (by day when timeGrain is NONE); timeSeries, when
+timeGrain is set, has the totals of every bucket in the range, including empty ones.
+
+aggregate stops short of the rows: its Aggregate keeps the groups as arrays and turns any slice of them into rows,
+so run_report builds just the page it returns and an export (core.report_jobs) reads every row a chunk at a time.
+"""
+from __future__ import annotations
+
+import os
+from datetime import date
+from math import prod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette import status
+
+from api.core.errors import ProblemError
+from api.core.facts import FactStore, Rollup, day_date, day_number
+from api.models.report import ReportExportQuery, ReportQuery
+
+# Dimension -> fact id column, and the key it has in rows and filters
+DIMENSION_COLUMNS: Dict[str, str] = {"CAMPAIGN_ID": "campaign", "ASSET_GROUP_ID": "asset_group", "AD_ID": "ad"}
+ROW_KEYS: Dict[str, str] = {"campaign": "campaignId", "asset_group": "assetGroupId", "ad": "adId"}
+_FILTER_COLUMNS: Dict[str, str] = {key: column for column, key in ROW_KEYS.items()}
+
+ROLLUPS = os.environ.get("DV_REPORT_ROLLUPS", "on").lower() not in ("0", "off", "false", "no")
+
+# Dense bincount while the key space is at most this many times a partition's rows (or this small anyway).
+_DENSE_FACTOR = 4
+_DENSE_MIN = 1 << 16
+
+
+def _bad_request(detail: str, field: str, message: str) -> ProblemError:
+    return ProblemError(status.HTTP_400_BAD_REQUEST, detail, [{"field": field, "message": message}])
+
+
+def parse_day(value: str, field: str) -> int:
+    try:
+        return day_number(date.fromisoformat(value))
+    except ValueError:
+        raise _bad_request(f"{field} is not a date", field, "Expected YYYY-MM-DD.") from None
+
+
+def date_range(q: ReportQuery) -> Tuple[int, int]:
+    start, end = parse_day(q.startDate, "startDate"), parse_day(q.endDate, "endDate")
+    if end < start:
+        raise _bad_request("endDate is before startDate", "endDate", "Must not be before startDate.")
+    return start, end
+
+
+def bucket_of(day: int, grain: str) -> int:
+    """First day of the timeGrain bucket holding `day` (weeks start on Monday)."""
+    if grain == "WEEK":
+        return day - (day + 3) % 7  # 1970-01-01 was a Thursday
+    if grain == "MONTH":
+        return day_number(day_date(day).replace(day=1))
+    return day
+
+
+def buckets(start: int, end: int, grain: str) -> List[int]:
+    out = []
+    day = bucket_of(start, grain)
+    while day <= end:
+        out.append(day)
+        if grain == "WEEK":
+            day += 7
+        elif grain == "MONTH":
+            d = day_date(day)
+            day = day_number(date(d.year + d.month // 12, d.month % 12 + 1, 1))
+        else:
+            day += 1
+    return out
+
+
+def parse_filters(facts: FactStore, filters: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Filter key (campaignId, assetGroupId, adId) -> codes of the accepted ids (an id or a list of ids)."""
+    out: Dict[str, np.ndarray] = {}
+    for key, want in filters.items():
+        column = _FILTER_COLUMNS.get(key)
+        if column is None:
+            raise _bad_request(
+                "filters has an unknown key", f"filters.{key}", f"Supported filters: {', '.join(_FILTER_COLUMNS)}."
+            )
+        values = [want] if isinstance(want, str) else want
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise _bad_request("filters has an invalid value", f"filters.{key}", "Expected an id or a list of ids.")
+        dictionary = facts.dictionaries[column]
+        codes = [c for c in (dictionary.code(v) for v in values) if c >= 0]
+        out[column] = np.asarray(codes, dtype=np.intp)
+    return out
+
+
+class _Groups:
+    """Per-group metric sums: sorted unique int64 keys, and one float64 sum array per metric."""
+
+    __slots__ = ("keys", "sums")
+
+    def __init__(self, keys: np.ndarray, sums: List[np.ndarray]) -> None:
+        self.keys = keys
+        self.sums = sums
+
+
+def _nonzero(keys: np.ndarray, sums: List[np.ndarray]) -> _Groups:
+    present = sums[0] != 0
+    for s in sums[1:]:
+        present |= s != 0
+    index = np.flatnonzero(present)
+    return _Groups(keys[index], [s[index] for s in sums])
+
+
+def _reduce(key: Optional[np.ndarray], n: int, space: int, weights: Sequence[np.ndarray]) -> _Groups:
+    if key is None:
+        return _nonzero(np.zeros(1, np.int64), [np.array([w.sum()]) for w in weights])
+    if space <= max(_DENSE_MIN, _DENSE_FACTOR * n):
+        sums = [np.bincount(key, weights=w, minlength=space) for w in weights]
+        return _nonzero(np.arange(space, dtype=np.int64), sums)
+    keys, inverse = np.unique(key, return_inverse=True)
+    return _nonzero(keys, [np.bincount(inverse, weights=w, minlength=len(keys)) for w in weights])
+
+
+def group_partition(
+    columns: Dict[str, np.ndarray],
+    group_columns: Sequence[str],
+    sizes: Sequence[int],
+    filters: Dict[str, np.ndarray],
+    metrics: Sequence[str],
+) -> Optional[_Groups]:
+    """One partition's groups (keys in mixed radix over `sizes`), or None if no row passes the filters."""
+    mask = None
+    for column, codes in filters.items():
+        m = columns[column] == codes[0] if len(codes) == 1 else np.isin(columns[column], codes)
+        mask = m if mask is None else mask & m
+    if mask is not None:
+        n = int(np.count_nonzero(mask))
+        if n == 0:
+            return None
+        columns = {name: columns[name][mask] for name in (*group_columns, *metrics)}
+    else:
+        n = len(columns[metrics[0]])
+        if n == 0:
+            return None
+    key = None
+    if len(group_columns) == 1:
+        key = columns[group_columns[0]]
+    elif group_columns:
+        key = columns[group_columns[0]].astype(np.int64, copy=False)  # on-disk codes are int32
+        for column, size in zip(group_columns[1:], sizes[1:]):
+            key = key * size + columns[column]
+    return _reduce(key, n, prod(sizes), [columns[m] for m in metrics])
+
+
+def merge(parts: Sequence[_Groups], metrics_count: int) -> _Groups:
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return _Groups(np.zeros(0, np.int64), [np.zeros(0, np.float64) for _ in range(metrics_count)])
+    keys, inverse = np.unique(np.concatenate([p.keys for p in parts]), return_inverse=True)
+    sums = [
+        np.bincount(inverse, weights=np.concatenate([p.sums[i] for p in parts]), minlength=len(keys))
+        for i in range(metrics_count)
+    ]
+    return _Groups(keys, sums)
+
+
+def plan(facts: FactStore, columns: Sequence[str]) -> Optional[Rollup]:
+    """The coarsest rollup covering the id columns a query groups or filters on, or None for the raw facts."""
+    needed = set(columns)
+    for rollup in facts.rollups.values():
+        if needed <= rollup.columns():
+            return rollup
+    return None
+
+
+def parse_query(facts: FactStore, q: ReportExportQuery) -> Tuple[int, int, Dict[str, np.ndarray]]:
+    """The query's first and last day and its filters as codes (parse_filters); a ProblemError if it is invalid."""
+    start, end = date_range(q)
+    if not q.metrics:
+        raise _bad_request("metrics is empty", "metrics", "Request at least one metric.")
+    return start, end, parse_filters(facts, q.filters)
+
+
+class Aggregate:
+    """
+    A query's groups before they become rows: int64 keys and one sum array per metric, `order` the row order (None
+    once the arrays are in it, see ordered), what it takes to turn a key back into ids and a date, and the totals,
+    timeSeries and debug of the response.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        sums: List[np.ndarray],
+        order: Optional[np.ndarray],
+        dimensions: Sequence[str],
+        group_columns: Sequence[str],
+        sizes: Sequence[int],
+        first_bucket: int,
+        metric_columns: Sequence[str],
+        totals: Dict[str, int],
+        time_series: Optional[List[Dict[str, Any]]],
+        debug: Dict[str, Any],
+    ) -> None:
+        self.keys = keys
+        self.sums = sums
+        self.order = order
+        self.dimensions = dimensions
+        self.group_columns = group_columns
+        self.sizes = sizes
+        self.space = prod(sizes)
+        self.first_bucket = first_bucket  # day of the first DATE bucket; a key's bucket digit counts days from it
+        self.metric_columns = metric_columns
+        self.totals = totals
+        self.time_series = time_series
+        self.debug = debug
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def ordered(self) -> "Aggregate":
+        """Gather the arrays into row order (one pass), for reading all of the rows rather than a page."""
+        if self.order is not None:
+            self.keys = self.keys[self.order]
+            self.sums = [s[self.order] for s in self.sums]
+            self.order = None
+        return self
+
+    def fields(self, facts: FactStore, start: int, stop: int) -> Dict[str, List[Any]]:
+        """Rows start..stop column-wise: row key (date, campaignId, ..., then the metrics) -> one value per row."""
+        index = self.order[start:stop] if self.order is not None else slice(start, stop)
+        bucket, rest = np.divmod(self.keys[index], self.space)
+        ids: Dict[str, List[str]] = {}
+        for column, size in zip(reversed(self.group_columns), reversed(self.sizes)):
+            rest, codes = np.divmod(rest, size)
+            values = facts.dictionaries[column].values
+            ids[column] = [values[c] for c in codes.tolist()]
+        out: Dict[str, List[Any]] = {}
+        for d in self.dimensions:
+            if d == "DATE":
+                buckets = bucket.tolist()
+                dates = {b: day_date(self.first_bucket + b).isoformat() for b in set(buckets)}
+                out["date"] = [dates[b] for b in buckets]
+            else:
+                column = DIMENSION_COLUMNS[d]
+                out[ROW_KEYS[column]] = ids[column]
+        for m, s in zip(self.metric_columns, self.sums):
+            out[m] = np.rint(s[index]).astype(np.int64).tolist()
+        return out
+
+    def rows(self, facts: FactStore, start: int, stop: int) -> List[Dict[str, Any]]:
+        fields = self.fields(facts, start, stop)
+        names = list(fields)
+        return [dict(zip(names, values)) for values in zip(*fields.values())]
+
+
+def aggregate(facts: FactStore, q: ReportExportQuery, rollups: bool = ROLLUPS) -> Aggregate:
+    start, end, filters = parse_query(facts, q)
+    metrics = list(dict.fromkeys(q.metrics))
+    metric_columns = [m.lower() for m in metrics]
+    dimensions = list(dict.fromkeys(q.dimensions))
+    by_date = "DATE" in dimensions
+    date_grain = q.timeGrain if q.timeGrain != "NONE" else "DAY"
+    group_columns = [DIMENSION_COLUMNS[d] for d in dimensions if d != "DATE"]
+    rollup = plan(facts, [*group_columns, *filters]) if rollups else None
+    if any(len(codes) == 0 for codes in filters.values()):
+        partitions = []  # a filter with no known id matches nothing
+    elif rollup is not None:
+        partitions = rollup.partitions(start, end)
+    else:
+        partitions = facts.partitions(start, end)
+    # Sizes after the snapshots: every code in them was assigned before its rows were appended.
+    sizes = [max(1, len(facts.dictionaries[c])) for c in group_columns]
+    space = prod(sizes)
+
+    parts: List[_Groups] = []
+    series: Dict[int, np.ndarray] = {}
+    for day, columns in partitions:
+        groups = group_partition(columns, group_columns, sizes, filters, metric_columns)
+        if groups is None:
+            continue
+        if q.timeGrain != "NONE":
+            bucket = bucket_of(day, q.timeGrain)
+            totals = np.array([s.sum() for s in groups.sums])
+            series[bucket] = series[bucket] + totals if bucket in series else totals
+        if by_date:
+            # The bucket (days from the first one) is the most significant digit of the key.
+            offset = bucket_of(day, date_grain) - bucket_of(start, date_grain)
+            groups = _Groups(groups.keys + offset * space, groups.sums)
+        parts.append(groups)
+    merged = merge(parts, len(metrics))
+
+    # Date bucket ascending, then the first metric descending, then the key (lexsort's last key is the primary).
+    order_keys: List[np.ndarray] = [merged.keys]
+    if merged.sums:
+        order_keys.append(-merged.sums[0])
+    if by_date:
+        order_keys.append(merged.keys // space)
+    order = np.lexsort(order_keys) if len(merged.keys) else np.zeros(0, np.int64)
+
+    time_series = None
+    if q.timeGrain != "NONE":
+        zero = np.zeros(len(metrics))
+        time_series = []
+        for b in buckets(start, end, q.timeGrain):
+            values = series.get(b, zero)
+            time_series.append({"date": day_date(b).isoformat(), **{m: int(round(float(v))) for m, v in zip(metric_columns, values)}})
+    debug = {
+        "source": f"rollup:{rollup.column}" if rollup is not None else "facts",
+        "partitions": len(partitions),
+        "rowsScanned": sum(len(columns[metric_columns[0]]) for _, columns in partitions),
+    }
+    return Aggregate(
+        merged.keys, merged.sums, order, dimensions, group_columns, sizes, bucket_of(start, date_grain), metric_columns,
+        {m: int(round(float(s.sum()))) for m, s in zip(metric_columns, merged.sums)}, time_series, debug,
+    )
+
+
+def run_report(facts: FactStore, q: ReportQuery, rollups: bool = ROLLUPS) -> Dict[str, Any]:
+    result = aggregate(facts, q, rollups)
+    rows = result.rows(facts, q.offset, q.offset + q.limit)
+    return {"rows": rows, "totals": result.totals, "timeSeries": result.time_series, "debug": result.debug}
@@ -0,0 +1,129 @@
+"""
+Background report exports: POST /reports/jobs registers a ReportJob and returns its id; a job pool (a
+BulkJobRegistry of its own, DV_REPORT_JOB_WORKERS) runs the query through report_engine.aggregate with no row limit,
+and GET /reports/jobs/{jobId}/result streams every row as CSV or NDJSON.
+
+A finished job keeps its groups, not its rows: the keys and metric sums, in row order, are saved as .npy files in a
+temporary directory and memory-mapped, so a job with millions of rows holds a few dozen bytes per row on disk and
+next to nothing in memory. export_chunks formats EXPORT_CHUNK_ROWS rows at a time from those arrays, so neither the
+job nor a download ever builds the full list of rows; compression (gzip or br, from Accept-Encoding) is applied to
+each chunk by CompressionMiddleware. The files go when the job is purged, DV_REPORT_JOB_TTL seconds after it finished.
+
+Jobs and their results stay in the process that ran them, like the facts they read.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from api.core.bulk_jobs import BulkJobRegistry
+from api.core.facts import FactStore
+from api.core.fastjson import dumps
+from api.core.ids import new_id
+from api.core.report_engine import Aggregate, aggregate
+from api.models.report import ReportExportQuery
+
+REPORT_JOB_TTL_SECONDS = int(os.environ.get("DV_REPORT_JOB_TTL") or 3600)
+REPORT_JOB_WORKERS = max(1, int(os.environ.get("DV_REPORT_JOB_WORKERS") or 1))
+# Rows formatted per chunk of a download (a few hundred KiB of CSV).
+EXPORT_CHUNK_ROWS = 10_000
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ReportJob:
+    """
+    One export. Run by a pool thread and read by pollers, so state changes go through the job's lock; snapshot()
+    returns a detached copy. Statuses: QUEUED -> RUNNING -> SUCCEEDED | FAILED.
+    """
+
+    def __init__(self, query: ReportExportQuery, job_id: Optional[str] = None) -> None:
+        now = _now()
+        self.id = job_id or new_id("reportjob")
+        self.query = query
+        self.status = "QUEUED"
+        self.rowCount: Optional[int] = None
+        self.result: Optional[Aggregate] = None
+        self.error: Optional[str] = None
+        self.createdAt = now
+        self.updatedAt = now
+        self.finishedAt: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _touch(self, **changes: Any) -> None:
+        with self._lock:
+            for k, v in changes.items():
+                setattr(self, k, v)
+            self.updatedAt = _now()
+
+    def run(self, facts: FactStore) -> None:
+        self._touch(status="RUNNING")
+        result = aggregate(facts, self.query).ordered()
+        directory = tempfile.mkdtemp(prefix="dv-report-job-")
+        # Deleted once the registry drops the job; a download that is still reading keeps its mappings.
+        weakref.finalize(self, shutil.rmtree, directory, True)
+        result.keys = _spill(directory, "keys", result.keys)
+        result.sums = [_spill(directory, m, s) for m, s in zip(result.metric_columns, result.sums)]
+        self._touch(status="SUCCEEDED", result=result, rowCount=len(result), finishedAt=_now())
+
+    def fail(self, message: str) -> None:
+        self._touch(status="FAILED", error=message, finishedAt=_now())
+
+    def expires_at(self, ttl_seconds: int) -> Optional[datetime]:
+        return self.finishedAt + timedelta(seconds=ttl_seconds) if self.finishedAt else None
+
+    def snapshot(self, ttl_seconds: int = REPORT_JOB_TTL_SECONDS) -> Dict[str, Any]:
+        with self._lock:
+            result = self.result
+            return {
+                "id": self.id,
+                "status": self.status,
+                "query": self.query,
+                "rowCount": self.rowCount,
+                "totals": result.totals if result is not None else None,
+                "timeSeries": result.time_series if result is not None else None,
+                "debug": result.debug if result is not None else None,
+                "error": self.error,
+                "createdAt": self.createdAt,
+                "updatedAt": self.updatedAt,
+                "finishedAt": self.finishedAt,
+                "expiresAt": self.expires_at(ttl_seconds),
+            }
+
+
+def _spill(directory: str, name: str, values: np.ndarray) -> np.ndarray:
+    path = os.path.join(directory, f"{name}.npy")
+    np.save(path, values)
+    return np.load(path, mmap_mode="r")
+
+
+def export_chunks(facts: FactStore, result: Aggregate, fmt: str) -> Iterator[bytes]:
+    """Every row of `result` as CSV (with a header line) or NDJSON, EXPORT_CHUNK_ROWS rows per chunk."""
+    for start in range(0, max(len(result), 1), EXPORT_CHUNK_ROWS):
+        fields = result.fields(facts, start, start + EXPORT_CHUNK_ROWS)
+        names = list(fields)
+        if fmt == "csv":
+            out = io.StringIO()
+            writer = csv.writer(out, lineterminator="\n")
+            if start == 0:
+                writer.writerow(names)
+            writer.writerows(zip(*fields.values()))
+            yield out.getvalue().encode("utf-8")
+        else:
+            yield b"".join(dumps(dict(zip(names, values))) + b"\n" for values in zip(*fields.values()))
+
+
+REPORT_JOBS = BulkJobRegistry(REPORT_JOB_TTL_SECONDS, REPORT_JOB_WORKERS, thread_name="dv-report-job")
@@ -0,0 +1,150 @@
+"""
+Storage contract shared by the entity stores (core.store.MemoryStore, core.sqlite_store.SqliteStore).
+
+Entities are plain dicts keyed by "id". Readers go through collection(type) (or the per-type attributes
+partners/advertisers/campaigns/asset_groups/ads), which behave like read-only mappings; every write goes
+through save(). Entities are never deleted, only archived, so each type has a stable creation sequence used for
+ordering and page tokens.
+
+Concurrency: readers take no locks. Writers run their read-modify-write unit (the saves of one request plus the
+serving recompute they trigger) inside transaction(), which admits one writer at a time, and edit a private copy
+from for_update() that save() then swaps in whole, so a concurrent reader sees an entity either before or after
+a write, never half of it.
+
+Every save() is also appended to a change log (changes()), which clients follow to sync incrementally
+(GET /v1/changes, core.changes).
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, Collection, ContextManager, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# entity type -> store attribute holding that collection
+COLLECTIONS: Dict[str, str] = {
+    "partner": "partners",
+    "advertiser": "advertisers",
+    "campaign": "campaigns",
+    "asset_group": "asset_groups",
+    "ad": "ads",
+}
+
+# Non-entity tables kept on the store (see core.content); written through set_item/pop_item.
+AUX_TABLES = ("ad_content", "blob_refs", "blob_metadata")
+
+# Tables only a store shared by several server processes keeps (Repository.shared), e.g. bulk job progress
+# published for polls that land on another worker (core.bulk_jobs).
+SHARED_TABLES = ("bulk_jobs",)
+
+# entity type -> field referencing its parent (partners are roots)
+PARENT_KEYS: Dict[str, str] = {
+    "advertiser": "partnerId",
+    "campaign": "advertiserId",
+    "asset_group": "campaignId",
+    "ad": "assetGroupId",
+}
+
+
+# Change-log entries kept (Repository.changes); clients further behind must reload and resume from the latest seq.
+CHANGE_RETENTION = 100_000
+
+
+def change_entry(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    (op, entry) logged for a save that replaces `old` (None: a new entity) with `new`: the new values of the fields
+    that differ, plus the entity's serving state whether or not it changed.
+    """
+    if old is None:
+        op, changed = "created", dict(new)
+    else:
+        op, changed = "updated", {k: v for k, v in new.items() if k not in old or old[k] != v}
+    return op, {"changed": changed, "servingStatus": new.get("servingStatus"), "servingReasons": new.get("servingReasons")}
+
+
+def matches_filters(entity: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """List filters (core.paging.list_query, plus campaign status): namePrefix, archived, else exact match."""
+    for key, want in filters.items():
+        if key == "namePrefix":
+            if not str(entity.get("name", "")).startswith(want):
+                return False
+        elif key == "archived":
+            if bool(entity.get("archived", False)) != want:
+                return False
+        elif entity.get(key) != want:
+            return False
+    return True
+
+
+class Repository(ABC):
+    # Write-ahead log when the in-memory store is made durable (core.persistence); None otherwise.
+    journal: Optional[Any] = None
+    # True when several server processes (uvicorn --workers) can use the store at once.
+    shared: bool = False
+
+    @abstractmethod
+    def collection(self, entity_type: str) -> Mapping[str, Dict[str, Any]]: ...
+
+    @abstractmethod
+    def save(self, entity_type: str, entity: Dict[str, Any]) -> None:
+        """Insert or replace an entity (re-indexing it if its parent changed) and bump its version."""
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        """Exclusive, reentrant write section; readers are never blocked by it."""
+
+    def for_update(self, entity_type: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Copy of the stored entity to modify and save() (None if absent). Nested values are replaced, not edited."""
+        entity = self.collection(entity_type).get(entity_id)
+        return dict(entity) if entity is not None else None
+
+    @abstractmethod
+    def version(self, entity_type: str, entity_id: str) -> int:
+        """Counter bumped on every save of the entity; lets caches detect staleness."""
+
+    @abstractmethod
+    def collection_version(self, entity_type: str) -> str:
+        """
+        Opaque token that changes whenever any entity of the type is saved (and never repeats an earlier value
+        for different contents, also across restarts); collection ETags are derived from it (core.etags).
+        """
+
+    @abstractmethod
+    def last_change(self) -> int:
+        """Seq of the newest change-log entry (cheap enough to poll); moves on every save."""
+
+    @abstractmethod
+    def changes(
+        self, since: int, limit: int, types: Optional[Collection[str]] = None
+    ) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Change-log entries after seq `since`, oldest first, at most `limit`, optionally only of some types, and the
+        seq to pass as `since` next. Seqs increase with every save; an entry is
+        {seq, type, id, op: created|updated, changed: {field: new value}, servingStatus, servingReasons}.
+        None when `since` is not a position in the retained log (older than it, or from another store lifetime).
+        """
+
+    @abstractmethod
+    def children(self, entity_type: str, parent_id: str) -> List[Dict[str, Any]]:
+        """Entities of `entity_type` whose parent is `parent_id`, in creation order."""
+
+    @abstractmethod
+    def child_count(self, entity_type: str, parent_id: str) -> int: ...
+
+    @abstractmethod
+    def scan(
+        self,
+        entity_type: str,
+        parent_id: Optional[str] = None,
+        start_seq: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (seq, entity) in creation order from start_seq, optionally restricted to a parent and filters."""
+
+    @abstractmethod
+    def set_item(self, table: str, key: str, value: Any) -> None: ...
+
+    @abstractmethod
+    def pop_item(self, table: str, key: str) -> Any:
+        """Remove and return table[key] (None if absent)."""
+
+    def close(self) -> None:
+        """Release backend resources (connections); the in-memory store has none."""
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 
 def _is_archived(entity: Dict[str, Any]) -> bool:
@@ -50,9 +50,7 @@ def compute_serving(entity_type: str, entity: Dict[str, Any], store: Any) -> Tup
             if _is_archived(camp):
                 reasons.append("CAMPAIGN_ARCHIVED")
 
-        ag_id = entity.get("id")
-        ad_count = sum(1 for a in store.ads.values() if a.get("assetGroupId") == ag_id)
-        if ad_count == 0:
+        if store.child_count("ad", entity.get("id")) == 0:
             reasons.append("NO_ADS")
 
     elif entity_type == "ad":
@@ -71,20 +69,90 @@ def compute_serving(entity_type: str, entity: Dict[str, Any], store: Any) -> Tup
 
 
 def recompute_all(store: Any) -> None:
-    # Order matters: campaign -> asset_group -> ad
-    for cid, c in list(store.campaigns.items()):
-        c["servingStatus"], c["servingReasons"] = compute_serving("campaign", c, store)
+    with store.transaction():
+        # Order matters: campaign -> asset_group -> ad
+        for cid, c in list(store.campaigns.items()):
+            _apply("campaign", c, store)
 
-    for agid, ag in list(store.asset_groups.items()):
-        ag["servingStatus"], ag["servingReasons"] = compute_serving("asset_group", ag, store)
+        for agid, ag in list(store.asset_groups.items()):
+            _apply("asset_group", ag, store)
 
-    for adid, ad in list(store.ads.items()):
-        ad["servingStatus"], ad["servingReasons"] = compute_serving("ad", ad, store)
+        for adid, ad in list(store.ads.items()):
+            _apply("ad", ad, store)
 
-    # Partners/Advertisers/Creatives: set SERVING unless archived
-    for pid, p in list(store.partners.items()):
-        p["servingStatus"], p["servingReasons"] = compute_serving("partner", p, store)
+        # Partners/Advertisers/Creatives: set SERVING unless archived
+        for pid, p in list(store.partners.items()):
+            _apply("partner", p, store)
 
-    for aid, a in list(store.advertisers.items()):
-        a["servingStatus"], a["servingReasons"] = compute_serving("advertiser", a, store)
+        for aid, a in list(store.advertisers.items()):
+            _apply("advertiser", a, store)
 
+
+def _apply(entity_type: str, entity: Dict[str, Any], store: Any) -> Optional[Dict[str, Any]]:
+    """
+    Recompute one entity's serving state. If it changed, saves and returns an updated copy (the stored dict may be
+    in use by concurrent readers, so it is replaced rather than edited); returns None when nothing changed.
+    """
+    serving_status, reasons = compute_serving(entity_type, entity, store)
+    if (serving_status, reasons) == (entity.get("servingStatus"), entity.get("servingReasons")):
+        return None
+    updated = {**entity, "servingStatus": serving_status, "servingReasons": reasons}
+    store.save(entity_type, updated)
+    return updated
+
+
+# Parents before children: the order in which serving states depend on each other
+_HIERARCHY = ("partner", "advertiser", "campaign", "asset_group", "ad")
+# parent type -> child type whose compute_serving looks at the parent (advertisers ignore their partner)
+_SERVING_CHILD = {"advertiser": "campaign", "campaign": "asset_group", "asset_group": "ad"}
+
+
+def recompute_entity(
+    store: Any,
+    entity_type: str,
+    entity_id: str,
+    previous_parent_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Incremental counterpart of recompute_all for a single written entity. Returns that entity as recomputed
+    (callers respond with it: entities are replaced rather than edited on write, so earlier references can be
+    stale). Callers run it in the same store.transaction() as the write it follows.
+    """
+    recompute_written(store, [(entity_type, entity_id, previous_parent_id)])
+    return store.collection(entity_type).get(entity_id)
+
+
+def recompute_written(store: Any, written: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+    """
+    Recompute serving once for a set of written entities, given as (type, id, parent id before the write).
+    Each affected entity is evaluated once, top-down, so a batch of writes under one parent costs one pass over
+    that parent's subtree rather than one per write. Only entities whose compute_serving inputs can have changed
+    are re-evaluated:
+    - every written entity
+    - for a written ad: its asset group(s) for NO_ADS (old and new on reparent)
+    - the children of an entity that was written (its status/archived may have changed) or whose serving state
+      changed; partners have none (advertisers do not look at their partner)
+    """
+    pending: Dict[str, Dict[str, None]] = {t: {} for t in _HIERARCHY}
+    cascade: Dict[str, Set[str]] = {t: set() for t in _HIERARCHY}
+    for entity_type, entity_id, previous_parent_id in written:
+        pending[entity_type][entity_id] = None
+        cascade[entity_type].add(entity_id)
+        if entity_type == "ad":
+            ad = store.ads.get(entity_id)
+            for ag_id in (ad.get("assetGroupId") if ad else None, previous_parent_id):
+                if ag_id:
+                    pending["asset_group"][ag_id] = None
+
+    # Top-down, so every entity is evaluated after the parent it looks at.
+    for entity_type in _HIERARCHY:
+        child_type = _SERVING_CHILD.get(entity_type)
+        coll = store.collection(entity_type)
+        for entity_id in pending[entity_type]:
+            entity = coll.get(entity_id)
+            if entity is None:
+                continue
+            if _apply(entity_type, entity, store) is not None or entity_id in cascade[entity_type]:
+                if child_type is not None:
+                    for child in store.children(child_type, entity_id):
+                        pending[child_type][child["id"]] = None
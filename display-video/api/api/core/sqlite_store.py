@@ -0,0 +1,524 @@
+"""
+SQLite implementation of the store (DV_STORE=sqlite, database at DV_SQLITE_PATH).
+
+One table per entity type. The columns that lists filter and join on (parent id, name, status, servingStatus,
+archived) are real columns with indexes; the full entity is a pickled blob so reads round-trip datetimes, dates
+and nested dicts exactly. `seq` is the rowid, i.e. the creation order used for listing and page tokens.
+The database runs in WAL mode so readers never block the writer, and connections come from a small pool,
+which lets several server processes (uvicorn --workers) share one database file. transaction() pins one
+connection to the calling thread and holds SQLite's write lock (BEGIN IMMEDIATE) for the whole unit, so writers
+in different processes serialize too; readers keep seeing the last committed state.
+
+Each process keeps an LRU of decoded entities (DV_SQLITE_CACHE), since unpickling dominates the cost of a read.
+To keep it coherent across processes, every save() also appends to a `changes` table, and after committing, the
+writer stores its last change seq in a small memory-mapped file beside the database (<path>-signal). Before
+serving from its cache, a process compares that counter with the value it last acted on (a memory read). Only
+when it moved does it read the new change rows and evict those entities. A writer publishes before it responds,
+so a read that follows a write, on any worker, never gets the older copy.
+
+The same table is the change log served by GET /v1/changes (each row also holds the changed fields), so every
+worker serves the same sequence; the signal tells change streams on any worker that there is something new.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import queue
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from api.core.repository import AUX_TABLES, CHANGE_RETENTION, COLLECTIONS, PARENT_KEYS, SHARED_TABLES, Repository, change_entry
+
+POOL_SIZE = max(1, int(os.environ.get("DV_SQLITE_POOL") or 8))
+CACHE_SIZE = max(0, int(os.environ.get("DV_SQLITE_CACHE") or 100_000))
+SCAN_BATCH = 500
+
+_PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+# List filter -> indexed column (namePrefix is matched on the name column).
+_FILTER_COLUMNS = {"servingStatus": "serving_status", "archived": "archived", "status": "status"}
+
+
+def _schema() -> str:
+    statements = []
+    for entity_type in COLLECTIONS:
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {entity_type} ("
+            "seq INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, parent_id TEXT, name TEXT, status TEXT, "
+            "serving_status TEXT, archived INTEGER NOT NULL DEFAULT 0, version INTEGER NOT NULL DEFAULT 1, "
+            "data BLOB NOT NULL)"
+        )
+        statements.append(f"CREATE INDEX IF NOT EXISTS {entity_type}_parent ON {entity_type} (parent_id, seq)")
+        statements.append(f"CREATE INDEX IF NOT EXISTS {entity_type}_serving ON {entity_type} (serving_status, seq)")
+        statements.append(f"CREATE INDEX IF NOT EXISTS {entity_type}_archived ON {entity_type} (archived, seq)")
+    statements.append("CREATE TABLE IF NOT EXISTS aux (tbl TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, PRIMARY KEY (tbl, key))")
+    # The change log (Repository.changes): `entry` is the pickled changed fields and serving state.
+    statements.append(
+        "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, entity_type TEXT NOT NULL, "
+        "entity_id TEXT NOT NULL, op TEXT NOT NULL, entry BLOB NOT NULL)"
+    )
+    # Latest change seq per type, kept when older change rows are pruned: collection_version().
+    statements.append("CREATE TABLE IF NOT EXISTS collection_versions (entity_type TEXT PRIMARY KEY, seq INTEGER NOT NULL)")
+    return ";\n".join(statements) + ";"
+
+
+class _Pool:
+    """Up to `size` connections, handed out one per use; callers wait when all are busy."""
+
+    def __init__(self, path: str, size: int) -> None:
+        self._path = path
+        self._size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Connection pinned to a thread for the duration of its transaction().
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self._size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        pinned = getattr(self._local, "conn", None)
+        if pinned is not None:
+            yield pinned
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._all:
+                # Refresh planner statistics so filtered lists pick the most selective index.
+                self._all[0].execute("PRAGMA optimize")
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+class _ChangeSignal:
+    """
+    The last committed change seq, in an 8-byte memory-mapped file shared by every process using the database.
+    Readers only compare it for equality: a different value means "read the changes table", so writers storing
+    out of order cost a redundant catch-up, never a missed one.
+    """
+
+    def __init__(self, path: str) -> None:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._map = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+
+    def read(self) -> int:
+        return struct.unpack_from("<Q", self._map)[0]
+
+    def publish(self, seq: int) -> None:
+        struct.pack_into("<Q", self._map, 0, seq)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+class _EntityCache:
+    """LRU of decoded entities. `generation` moves on every invalidation, so a fill that raced one is dropped."""
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entity = self._entries.get(key)
+            if entity is not None:
+                self._entries.move_to_end(key)
+            return entity
+
+    def put(self, key: Tuple[str, str], entity: Dict[str, Any], generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = entity
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys: Iterable[Tuple[str, str]]) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+class _Collection(Mapping):
+    """Read-only mapping view of one entity table, served through the store's coherent per-process cache."""
+
+    def __init__(self, store: "SqliteStore", entity_type: str) -> None:
+        self._store = store
+        self._type = entity_type
+
+    def __getitem__(self, entity_id: str) -> Dict[str, Any]:
+        entity = self._store._fetch(self._type, entity_id)
+        if entity is None:
+            raise KeyError(entity_id)
+        return entity
+
+    def __contains__(self, entity_id: object) -> bool:
+        return self._store._exists(self._type, entity_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return (e["id"] for _, e in self._store.scan(self._type))
+
+    def __len__(self) -> int:
+        return self._store._one(f"SELECT COUNT(*) FROM {self._type}")[0]
+
+    def values(self) -> List[Dict[str, Any]]:  # type: ignore[override]
+        return [e for _, e in self._store.scan(self._type)]
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:  # type: ignore[override]
+        return [(e["id"], e) for _, e in self._store.scan(self._type)]
+
+
+class _AuxTable(Mapping):
+    def __init__(self, store: "SqliteStore", table: str) -> None:
+        self._store = store
+        self._table = table
+
+    def __getitem__(self, key: str) -> Any:
+        row = self._store._one("SELECT value FROM aux WHERE tbl = ? AND key = ?", (self._table, key))
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def __iter__(self) -> Iterator[str]:
+        with self._store._pool.connection() as conn:
+            keys = [r[0] for r in conn.execute("SELECT key FROM aux WHERE tbl = ? ORDER BY key", (self._table,))]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return self._store._one("SELECT COUNT(*) FROM aux WHERE tbl = ?", (self._table,))[0]
+
+
+class SqliteStore(Repository):
+    shared = True
+
+    def __init__(self, path: str, pool_size: int = POOL_SIZE, cache_size: int = CACHE_SIZE) -> None:
+        self.path = path
+        self._pool = _Pool(path, pool_size)
+        with self._pool.connection() as conn:
+            conn.executescript(_schema())
+        self._collections = {t: _Collection(self, t) for t in COLLECTIONS}
+        self._aux = {t: _AuxTable(self, t) for t in AUX_TABLES + SHARED_TABLES}
+        # Queues this process's writers in Python instead of in SQLite's busy-wait loop.
+        self._write_lock = threading.RLock()
+        # Per thread: transaction nesting depth and the last change seq it wrote.
+        self._local = threading.local()
+        self._cache = _EntityCache(cache_size) if cache_size else None
+        self._signal = _ChangeSignal(f"{path}-signal")
+        self._sync_lock = threading.Lock()
+        # Signal first: a commit landing in between only causes one redundant catch-up.
+        self._signal_seen = self._signal.read()
+        self._change_seen = self._one("SELECT COALESCE(MAX(seq), 0) FROM changes")[0]
+        # (signal value, collection versions read after it); reused until the signal moves
+        self._collection_versions: Optional[Tuple[int, Dict[str, str]]] = None
+
+    # Attribute-style access used throughout the routers (STORE.ads, STORE.ad_content, ...).
+    partners = property(lambda self: self._collections["partner"])
+    advertisers = property(lambda self: self._collections["advertiser"])
+    campaigns = property(lambda self: self._collections["campaign"])
+    asset_groups = property(lambda self: self._collections["asset_group"])
+    ads = property(lambda self: self._collections["ad"])
+    ad_content = property(lambda self: self._aux["ad_content"])
+    blob_refs = property(lambda self: self._aux["blob_refs"])
+    blob_metadata = property(lambda self: self._aux["blob_metadata"])
+    bulk_jobs = property(lambda self: self._aux["bulk_jobs"])
+
+    def _one(self, sql: str, params: Tuple[Any, ...] = ()) -> Optional[Tuple[Any, ...]]:
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def collection(self, entity_type: str) -> Mapping:
+        return self._collections[entity_type]
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        local = self._local
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            try:
+                yield
+            finally:
+                local.depth -= 1
+            return
+        with self._write_lock:
+            local.depth, local.last_change = 1, None
+            try:
+                with self._pool.transaction():
+                    yield
+            finally:
+                local.depth = 0
+            if local.last_change is not None:
+                # Committed: every process (this one included) catches up before its next cached read.
+                self._signal.publish(local.last_change)
+
+    def _cached(self) -> bool:
+        # Inside a transaction, reads must see its uncommitted writes and must not be cached.
+        return self._cache is not None and not getattr(self._local, "depth", 0)
+
+    def _sync(self) -> None:
+        """Evict the entities other commits changed since the last catch-up (see the module docstring)."""
+        signal = self._signal.read()
+        if signal == self._signal_seen:
+            return
+        with self._sync_lock:
+            if signal == self._signal_seen:
+                return
+            with self._pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT seq, entity_type, entity_id FROM changes WHERE seq > ? ORDER BY seq", (self._change_seen,)
+                ).fetchall()
+            if rows and rows[0][0] > self._change_seen + 1:
+                self._cache.clear()  # the rows we missed were already pruned
+            elif rows:
+                self._cache.evict((t, eid) for _, t, eid in rows)
+            if rows:
+                self._change_seen = rows[-1][0]
+            self._signal_seen = signal
+
+    def _fetch(self, entity_type: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        if not self._cached():
+            row = self._one(f"SELECT data FROM {entity_type} WHERE id = ?", (entity_id,))
+            return pickle.loads(row[0]) if row else None
+        self._sync()
+        key = (entity_type, entity_id)
+        entity = self._cache.get(key)
+        if entity is None:
+            generation = self._cache.generation
+            row = self._one(f"SELECT data FROM {entity_type} WHERE id = ?", (entity_id,))
+            if row is None:
+                return None
+            entity = pickle.loads(row[0])
+            self._cache.put(key, entity, generation)
+        return entity
+
+    def _exists(self, entity_type: str, entity_id: Any) -> bool:
+        # Entities are never deleted, so a cached one needs no catch-up.
+        if self._cached() and self._cache.get((entity_type, entity_id)) is not None:
+            return True
+        return self._one(f"SELECT 1 FROM {entity_type} WHERE id = ?", (entity_id,)) is not None
+
+    def _load_many(self, entity_type: str, ids: List[str], generation: int) -> List[Dict[str, Any]]:
+        found = {}
+        missing = []
+        for eid in ids:
+            entity = self._cache.get((entity_type, eid))
+            if entity is None:
+                missing.append(eid)
+            else:
+                found[eid] = entity
+        if missing:
+            marks = ",".join("?" * len(missing))
+            with self._pool.connection() as conn:
+                rows = conn.execute(f"SELECT id, data FROM {entity_type} WHERE id IN ({marks})", missing).fetchall()
+            for eid, data in rows:
+                entity = pickle.loads(data)
+                self._cache.put((entity_type, eid), entity, generation)
+                found[eid] = entity
+        return [found[eid] for eid in ids]
+
+    def save(self, entity_type: str, entity: Dict[str, Any]) -> None:
+        parent_key = PARENT_KEYS.get(entity_type)
+        row = (
+            entity["id"],
+            entity.get(parent_key) if parent_key else None,
+            entity.get("name"),
+            entity.get("status"),
+            entity.get("servingStatus"),
+            1 if entity.get("archived") else 0,
+            pickle.dumps(entity, protocol=_PROTOCOL),
+        )
+        with self.transaction(), self._pool.connection() as conn:
+            old = conn.execute(f"SELECT data FROM {entity_type} WHERE id = ?", (entity["id"],)).fetchone()
+            conn.execute(
+                f"INSERT INTO {entity_type} (id, parent_id, name, status, serving_status, archived, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET parent_id = excluded.parent_id, name = excluded.name, "
+                "status = excluded.status, serving_status = excluded.serving_status, archived = excluded.archived, "
+                "data = excluded.data, version = version + 1",
+                row,
+            )
+            op, entry = change_entry(pickle.loads(old[0]) if old else None, entity)
+            seq = conn.execute(
+                "INSERT INTO changes (entity_type, entity_id, op, entry) VALUES (?, ?, ?, ?)",
+                (entity_type, entity["id"], op, pickle.dumps(entry, protocol=_PROTOCOL)),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO collection_versions (entity_type, seq) VALUES (?, ?) "
+                "ON CONFLICT(entity_type) DO UPDATE SET seq = excluded.seq",
+                (entity_type, seq),
+            )
+            if seq % 1024 == 0:
+                conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_RETENTION,))
+            self._local.last_change = seq
+
+    def version(self, entity_type: str, entity_id: str) -> int:
+        row = self._one(f"SELECT version FROM {entity_type} WHERE id = ?", (entity_id,))
+        return row[0] if row else 0
+
+    def collection_version(self, entity_type: str) -> str:
+        # The type's latest change seq: persistent and the same in every process.
+        if getattr(self._local, "depth", 0):
+            row = self._one("SELECT seq FROM collection_versions WHERE entity_type = ?", (entity_type,))
+            return str(row[0]) if row else "0"
+        signal = self._signal.read()
+        known = self._collection_versions
+        if known is None or known[0] != signal:
+            # Read after the signal, so the versions are at least as new as the commits it announces.
+            with self._pool.connection() as conn:
+                rows = conn.execute("SELECT entity_type, seq FROM collection_versions").fetchall()
+            known = (signal, {t: "0" for t in COLLECTIONS} | {t: str(seq) for t, seq in rows})
+            self._collection_versions = known
+        return known[1][entity_type]
+
+    def last_change(self) -> int:
+        # The signal holds the seq of the last commit; it is still 0 if this database predates the signal file.
+        return self._signal.read() or self._one("SELECT COALESCE(MAX(seq), 0) FROM changes")[0]
+
+    def changes(
+        self, since: int, limit: int, types: Optional[Collection[str]] = None
+    ) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        with self._pool.connection() as conn:
+            first, last = conn.execute("SELECT MIN(seq), MAX(seq) FROM changes").fetchone()
+            if last is None:
+                return ([], since) if since == 0 else None
+            if since < first - 1 or since > last:
+                return None
+            sql = "SELECT seq, entity_type, entity_id, op, entry FROM changes WHERE seq > ?"
+            params: List[Any] = [since]
+            if types is not None:
+                sql += f" AND entity_type IN ({','.join('?' * len(types))})"
+                params.extend(types)
+            rows = conn.execute(sql + " ORDER BY seq LIMIT ?", [*params, limit]).fetchall()
+        out = []
+        for seq, entity_type, entity_id, op, entry in rows:
+            out.append({"seq": seq, "type": entity_type, "id": entity_id, "op": op, **pickle.loads(entry)})
+        if len(rows) == limit:
+            return out, rows[-1][0]
+        # A commit landing after MIN/MAX was read may already be in `rows`.
+        return out, (max(last, rows[-1][0]) if rows else last)
+
+    def children(self, entity_type: str, parent_id: str) -> List[Dict[str, Any]]:
+        return [e for _, e in self.scan(entity_type, parent_id=parent_id)]
+
+    def child_count(self, entity_type: str, parent_id: str) -> int:
+        return self._one(f"SELECT COUNT(*) FROM {entity_type} WHERE parent_id = ?", (parent_id,))[0]
+
+    def scan(
+        self,
+        entity_type: str,
+        parent_id: Optional[str] = None,
+        start_seq: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        where = ["seq >= ?"]
+        params: List[Any] = []
+        if parent_id is not None:
+            where.append("parent_id = ?")
+            params.append(parent_id)
+        for key, want in (filters or {}).items():
+            if key == "namePrefix":
+                where.append("substr(name, 1, ?) = ?")
+                params.extend([len(want), want])
+            elif key in _FILTER_COLUMNS:
+                where.append(f"{_FILTER_COLUMNS[key]} = ?")
+                params.append(int(bool(want)) if key == "archived" else want)
+            else:
+                raise ValueError(f"Unsupported filter {key!r}")
+        cached = self._cached()
+        # With the cache, select ids only and decode just the entities it does not hold.
+        columns = "seq, id" if cached else "seq, data"
+        sql = f"SELECT {columns} FROM {entity_type} WHERE {' AND '.join(where)} ORDER BY seq LIMIT {SCAN_BATCH}"
+        # Keyset batches: a caller that stops early (one page) reads one batch, and no connection is held
+        # between batches.
+        seq = start_seq
+        while True:
+            if cached:
+                self._sync()
+                generation = self._cache.generation
+            with self._pool.connection() as conn:
+                rows = conn.execute(sql, [seq, *params]).fetchall()
+            if cached:
+                entities = self._load_many(entity_type, [r[1] for r in rows], generation)
+                for (row_seq, _), entity in zip(rows, entities):
+                    yield row_seq, entity
+            else:
+                for row_seq, data in rows:
+                    yield row_seq, pickle.loads(data)
+            if len(rows) < SCAN_BATCH:
+                return
+            seq = rows[-1][0] + 1
+
+    def set_item(self, table: str, key: str, value: Any) -> None:
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO aux (tbl, key, value) VALUES (?, ?, ?) ON CONFLICT(tbl, key) DO UPDATE SET value = excluded.value",
+                (table, key, pickle.dumps(value, protocol=_PROTOCOL)),
+            )
+
+    def pop_item(self, table: str, key: str) -> Any:
+        with self._pool.connection() as conn:
+            row = conn.execute("DELETE FROM aux WHERE tbl = ? AND key = ? RETURNING value", (table, key)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        self._pool.close()
+        self._signal.close()
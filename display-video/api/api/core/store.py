@@ -1,18 +1,240 @@
 from __future__ import annotations
 
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Dict, Any
+from typing import Collection, Dict, Any, Iterator, List, Optional, Tuple
+
+from api.core.repository import AUX_TABLES, CHANGE_RETENTION, COLLECTIONS, PARENT_KEYS, Repository, change_entry, matches_filters
 
 
 @dataclass
-class MemoryStore:
+class MemoryStore(Repository):
     partners: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     advertisers: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     campaigns: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     asset_groups: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     ads: Dict[str, Dict[str, Any]] = field(default_factory=dict)
-    # adId -> (bytes, content_type) for file-based ads; in-memory only
-    ad_content: Dict[str, tuple[bytes, str]] = field(default_factory=dict)
+    # adId -> {"digest", "size", "contentType"} for file-based ads; the bytes live in core.blobs.BLOBS
+    ad_content: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # digest -> number of ads referencing it (see core.content)
+    blob_refs: Dict[str, int] = field(default_factory=dict)
+    # digest -> metadata_key -> metadata extracted when that content first passed validation
+    blob_metadata: Dict[str, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+
+    # Secondary indexes, maintained by save(). Entities are never deleted (only archived), so a
+    # per-type insertion sequence is stable: _order[type][seq] == id and _seq[type][id] == seq.
+    _order: Dict[str, List[str]] = field(default_factory=lambda: {t: [] for t in COLLECTIONS}, repr=False)
+    _seq: Dict[str, Dict[str, int]] = field(default_factory=lambda: {t: {} for t in COLLECTIONS}, repr=False)
+    # child type -> parent id -> sorted seqs of children (creation order)
+    _children: Dict[str, Dict[str, List[int]]] = field(default_factory=lambda: {t: {} for t in PARENT_KEYS}, repr=False)
+    # child type -> child id -> parent id it is currently indexed under
+    _parent_of: Dict[str, Dict[str, Optional[str]]] = field(default_factory=lambda: {t: {} for t in PARENT_KEYS}, repr=False)
+    # entity type -> id -> counter bumped on every write (save or serving change); lets caches detect staleness
+    _versions: Dict[str, Dict[str, int]] = field(default_factory=lambda: {t: {} for t in COLLECTIONS}, repr=False)
+    # entity type -> saves since this process started; with _epoch, the collection_version() of the type
+    _saves: Dict[str, int] = field(default_factory=lambda: {t: 0 for t in COLLECTIONS}, repr=False)
+    # Counters restart with the process (recovery replays only the last state), so tokens also carry a random epoch.
+    _epoch: str = field(default_factory=lambda: uuid.uuid4().hex[:8], repr=False)
+    # Change log (changes()): entries with consecutive seqs, oldest first; trimmed by swapping in a shorter list.
+    _changes: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    # Seqs continue from the start time in microseconds, so a cursor from before a restart is never mistaken for
+    # a position in the new log.
+    _last_change: int = field(default_factory=lambda: time.time_ns() // 1000, repr=False)
+    # Write-ahead log (core.persistence.Journal) when DV_DATA_DIR is set; every write is appended to it.
+    journal: Optional[Any] = field(default=None, repr=False)
+    # Held by transaction(); reads never take it.
+    _write_lock: Any = field(default_factory=threading.RLock, repr=False)
+
+    def collection(self, entity_type: str) -> Dict[str, Dict[str, Any]]:
+        return getattr(self, COLLECTIONS[entity_type])
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # No rollback: writers validate before their first save.
+        with self._write_lock:
+            yield
+
+    def save(self, entity_type: str, entity: Dict[str, Any]) -> None:
+        """Insert a new entity or replace an existing one (usually a for_update() copy), re-indexing it if reparented."""
+        eid = entity["id"]
+        seqs = self._seq[entity_type]
+        if eid not in seqs:
+            seqs[eid] = len(self._order[entity_type])
+            self._order[entity_type].append(eid)
+        coll = self.collection(entity_type)
+        self._log_change(entity_type, coll.get(eid), entity)
+        coll[eid] = entity
+        self.touch(entity_type, eid)
+
+        parent_key = PARENT_KEYS.get(entity_type)
+        if parent_key is None:
+            return
+        new_parent = entity.get(parent_key)
+        parents = self._parent_of[entity_type]
+        if eid in parents and parents[eid] == new_parent:
+            return
+        seq = seqs[eid]
+        index = self._children[entity_type]
+        # Readers iterate these lists without locks: appending is safe, anything else swaps in a new list.
+        if eid in parents and parents[eid] is not None:
+            old = index[parents[eid]]
+            i = bisect_left(old, seq)
+            index[parents[eid]] = old[:i] + old[i + 1:]
+        if new_parent is not None:
+            siblings = index.setdefault(new_parent, [])
+            if not siblings or siblings[-1] < seq:
+                siblings.append(seq)
+            else:
+                siblings = list(siblings)
+                insort(siblings, seq)
+                index[new_parent] = siblings
+        parents[eid] = new_parent
+
+    def touch(self, entity_type: str, entity_id: str) -> None:
+        """Bump an entity's version (and journal its new state); save() calls this after indexing."""
+        versions = self._versions[entity_type]
+        versions[entity_id] = versions.get(entity_id, 0) + 1
+        self._saves[entity_type] += 1
+        if self.journal is not None:
+            # Full entity state, so replaying the log (or a log suffix over a snapshot) is idempotent.
+            self.journal.append(("put", entity_type, self.collection(entity_type)[entity_id]))
+
+    def _log_change(self, entity_type: str, old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> None:
+        op, entry = change_entry(old, new)
+        seq = self._last_change + 1
+        log = self._changes
+        if len(log) >= 2 * CHANGE_RETENTION:
+            # Readers may be slicing the old list; it stays intact.
+            log = self._changes = log[-CHANGE_RETENTION:]
+        log.append({"seq": seq, "type": entity_type, "id": new["id"], "op": op, **entry})
+        self._last_change = seq
+
+    def set_item(self, table: str, key: str, value: Any) -> None:
+        getattr(self, table)[key] = value
+        if self.journal is not None:
+            self.journal.append(("set", table, key, value))
+
+    def pop_item(self, table: str, key: str) -> Any:
+        value = getattr(self, table).pop(key, None)
+        if value is not None and self.journal is not None:
+            self.journal.append(("del", table, key))
+        return value
+
+    def version(self, entity_type: str, entity_id: str) -> int:
+        return self._versions[entity_type].get(entity_id, 0)
+
+    def collection_version(self, entity_type: str) -> str:
+        return f"{self._epoch}.{self._saves[entity_type]}"
+
+    def last_change(self) -> int:
+        return self._last_change
+
+    def changes(
+        self, since: int, limit: int, types: Optional[Collection[str]] = None
+    ) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        # `last` first: entries are appended before _last_change moves, so the list read next holds all up to it.
+        last = self._last_change
+        log = self._changes
+        first = log[0]["seq"] if log else last + 1
+        if since < first - 1 or since > last:
+            return None
+        out: List[Dict[str, Any]] = []
+        for entry in log[since - first + 1:]:
+            if entry["seq"] > last:
+                break  # appended after `last` was read
+            if types is None or entry["type"] in types:
+                out.append(entry)
+                if len(out) == limit:
+                    return out, entry["seq"]
+        return out, last
+
+    def children(self, entity_type: str, parent_id: str) -> List[Dict[str, Any]]:
+        """Entities of `entity_type` whose parent is `parent_id`, in creation order."""
+        order = self._order[entity_type]
+        coll = self.collection(entity_type)
+        return [coll[order[s]] for s in self._children[entity_type].get(parent_id, ())]
+
+    def child_count(self, entity_type: str, parent_id: str) -> int:
+        return len(self._children[entity_type].get(parent_id, ()))
+
+    def scan(
+        self,
+        entity_type: str,
+        parent_id: Optional[str] = None,
+        start_seq: int = 0,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (seq, entity) in creation order from start_seq, optionally restricted to one parent's children."""
+        order = self._order[entity_type]
+        coll = self.collection(entity_type)
+        if parent_id is None:
+            seqs: Any = range(start_seq, len(order))
+        else:
+            children = self._children[entity_type].get(parent_id, [])
+            seqs = children[bisect_left(children, start_seq):]
+        for seq in seqs:
+            entity = coll[order[seq]]
+            if not filters or matches_filters(entity, filters):
+                yield seq, entity
+
+    def dump_state(self) -> Dict[str, Any]:
+        """
+        Copy of the persistent state for a snapshot: entities per type in creation order plus the aux tables.
+        Safe to call while other threads write; changes racing with the copy are covered by the log suffix.
+        """
+        entities: Dict[str, List[Dict[str, Any]]] = {}
+        for entity_type in COLLECTIONS:
+            coll = dict(self.collection(entity_type))
+            entities[entity_type] = [dict(coll[eid]) for eid in list(self._order[entity_type]) if eid in coll]
+        state: Dict[str, Any] = {"entities": entities}
+        for table in AUX_TABLES:
+            state[table] = dict(getattr(self, table))
+        return state
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Replace the contents with a dump_state() result, rebuilding the indexes in one pass."""
+        for entity_type, entities in state["entities"].items():
+            coll = {e["id"]: e for e in entities}
+            setattr(self, COLLECTIONS[entity_type], coll)
+            order = [e["id"] for e in entities]
+            self._order[entity_type] = order
+            self._seq[entity_type] = {eid: seq for seq, eid in enumerate(order)}
+            self._versions[entity_type] = {}
+            self._saves[entity_type] += 1
+            parent_key = PARENT_KEYS.get(entity_type)
+            if parent_key is None:
+                continue
+            children: Dict[str, List[int]] = {}
+            parents: Dict[str, Optional[str]] = {}
+            for seq, e in enumerate(entities):
+                parent = e.get(parent_key)
+                parents[e["id"]] = parent
+                if parent is not None:
+                    children.setdefault(parent, []).append(seq)
+            self._children[entity_type] = children
+            self._parent_of[entity_type] = parents
+        for table in AUX_TABLES:
+            setattr(self, table, dict(state.get(table, {})))
+
+
+def open_store(backend: Optional[str] = None) -> Repository:
+    """
+    Build the store selected by DV_STORE: "memory" (default; optionally made durable by core.persistence)
+    or "sqlite" (core.sqlite_store at DV_SQLITE_PATH, shareable by several server processes).
+    """
+    backend = (backend or os.environ.get("DV_STORE") or "memory").lower()
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        from api.core.sqlite_store import SqliteStore
+
+        return SqliteStore(os.environ.get("DV_SQLITE_PATH") or "display-video.db")
+    raise ValueError(f"DV_STORE must be 'memory' or 'sqlite', got {backend!r}")
 
 
-STORE = MemoryStore()
+STORE: Repository = open_store()
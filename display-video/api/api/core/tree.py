@@ -0,0 +1,117 @@
+"""
+Nested hierarchy reads (GET /advertisers/{id}/tree, /campaigns/{id}/tree): a whole subtree in one response instead of
+a list call per campaign and per asset group.
+
+Each node is rendered like the entity's single GET (the cached fragment with DV_FAST_RESPONSES, without a field
+mask), and its children are spliced into the serialized object as "<collection>": [...] with a "<type>Count",
+walking the store's parent -> children index once, top-down.
+"""
+from __future__ import annotations
+
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from api.core.etags import collection_etag, not_modified
+from api.core.fastjson import dumps, fast_responses_enabled, project, render
+from api.core.fields import parse_fields
+from api.core.repository import matches_filters
+
+# parent type -> child type nested under it
+CHILD_TYPE: Dict[str, str] = {"advertiser": "campaign", "campaign": "asset_group", "asset_group": "ad"}
+
+# child type -> (key of the children array, key of their count) in the parent's node
+_CHILD_KEYS: Dict[str, Tuple[bytes, bytes]] = {
+    "campaign": (b"campaigns", b"campaignCount"),
+    "asset_group": (b"assetGroups", b"assetGroupCount"),
+    "ad": (b"ads", b"adCount"),
+}
+
+# entity type -> (response model, payload builder) as used by that type's GET; filled in by the routers
+_NODES: Dict[str, Tuple[Type[BaseModel], Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]]] = {}
+
+
+def register_node(
+    entity_type: str,
+    model: Type[BaseModel],
+    build: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> None:
+    _NODES[entity_type] = (model, build)
+
+
+def tree_types(entity_type: str) -> List[str]:
+    """Entity types of the levels of a tree rooted at `entity_type`, top-down."""
+    types = []
+    t: Optional[str] = entity_type
+    while t is not None:
+        types.append(t)
+        t = CHILD_TYPE.get(t)
+    return types
+
+
+def tree_models(entity_type: str) -> List[Type[BaseModel]]:
+    """Response models of the levels of a tree rooted at `entity_type` (what a field mask may name)."""
+    return [_NODES[t][0] for t in tree_types(entity_type)]
+
+
+def render_tree(
+    store: Any,
+    entity_type: str,
+    root: Dict[str, Any],
+    mask: Optional[AbstractSet[str]] = None,
+    archived: Optional[bool] = None,
+    depth: Optional[int] = None,
+) -> bytes:
+    """
+    JSON of `root` with its descendants nested. `archived` filters descendants (not the root) like the list
+    endpoints do; `depth` limits how many levels of children are included (None: all). Nodes at the depth limit
+    still carry their child count, taken from the index when no filter applies.
+    """
+    filters = {"archived": archived} if archived is not None else None
+
+    def node(t: str, entity: Dict[str, Any], level: int) -> bytes:
+        model, build = _NODES[t]
+        if mask is not None or fast_responses_enabled():
+            body = render(t, entity, model, build, mask)
+        else:
+            body = dumps(project(model, build(entity) if build else entity))
+        child_type = CHILD_TYPE.get(t)
+        if child_type is None:
+            return body
+        key, count_key = _CHILD_KEYS[child_type]
+        expand = depth is None or level < depth
+        if not expand and filters is None:
+            return body[:-1] + b',"%s":%d}' % (count_key, store.child_count(child_type, entity["id"]))
+        children = store.children(child_type, entity["id"])
+        if filters is not None:
+            children = [c for c in children if matches_filters(c, filters)]
+        extra = b',"%s":%d' % (count_key, len(children))
+        if expand:
+            extra += b',"%s":[%s]' % (key, b",".join(node(child_type, c, level + 1) for c in children))
+        return body[:-1] + extra + b"}"
+
+    return node(entity_type, root, 0)
+
+
+def tree_response(
+    store: Any,
+    request: Request,
+    entity_type: str,
+    root: Dict[str, Any],
+    fields: Optional[str] = None,
+    archived: Optional[bool] = None,
+    depth: Optional[int] = None,
+) -> Response:
+    # The ETag covers every level's collection (a tree changes with any of them); the root's id is in the path.
+    etag = collection_etag(store, request, *tree_types(entity_type))
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, *tree_models(entity_type))
+    return Response(
+        content=render_tree(store, entity_type, root, mask, archived, depth),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
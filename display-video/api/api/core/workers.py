@@ -0,0 +1,49 @@
+"""
+Worker pool for CPU-bound bulk work (per-member validation and metadata extraction of bulk ZIPs).
+
+DV_BULK_WORKERS sets the pool size (default: CPU count; 1 runs everything inline on the calling thread) and
+DV_BULK_EXECUTOR picks "thread" (default) or "process". Process workers are spawned, not forked, so they never
+inherit the server's threads or STORE; tasks must be picklable top-level functions over plain arguments.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+BULK_WORKERS = max(1, int(os.environ.get("DV_BULK_WORKERS") or os.cpu_count() or 1))
+BULK_EXECUTOR = os.environ.get("DV_BULK_EXECUTOR", "thread").lower()
+# Tasks submitted but not yet collected, per bulk request; bounds memory held by finished-but-unread results.
+BULK_MAX_IN_FLIGHT = 2 * BULK_WORKERS
+
+_executor: Optional[Executor] = None
+_lock = threading.Lock()
+
+
+def make_executor(kind: str, workers: int) -> Executor:
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dv-bulk")
+    raise ValueError(f"DV_BULK_EXECUTOR must be 'thread' or 'process', got {kind!r}")
+
+
+def bulk_executor() -> Optional[Executor]:
+    """The shared bulk pool, created on first use; None when DV_BULK_WORKERS=1 (run inline)."""
+    global _executor
+    if BULK_WORKERS <= 1:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = make_executor(BULK_EXECUTOR, BULK_WORKERS)
+        return _executor
+
+
+def shutdown_bulk_executor() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
@@ -5,6 +5,8 @@ from typing import Optional, List, Literal
 
 from pydantic import BaseModel, Field
 
+from api.models.batch import BATCH_MAX_ITEMS, BatchItemResult
+
 
 AdType = Literal["DISPLAY", "VIDEO"]
 InputType = Literal[
@@ -64,6 +66,40 @@ class AdOut(AdBase):
     contentUrl: Optional[str] = None  # only for file-based ads
 
 
+class ListAdsResponse(BaseModel):
+    ads: List[AdOut]
+    nextPageToken: Optional[str] = None
+
+
+BulkJobStatus = Literal["QUEUED", "VALIDATING", "CREATING", "SUCCEEDED", "FAILED"]
+
+
+class BulkJobItem(BaseModel):
+    filename: str
+    trackingTags: List[str] = []
+    errors: List[dict] = []
+    adId: Optional[str] = None  # set once the ad for this member is created
+
+
+class BulkJobOut(BaseModel):
+    id: str
+    status: BulkJobStatus
+    assetGroupId: str
+    mode: AdType
+    create: bool
+    total: Optional[int] = None  # members in the zip, known once its directory has been read
+    validated: int = 0
+    created: int = 0
+    items: List[BulkJobItem] = []  # filled when validation finishes, in zip order
+    globalErrors: List[dict] = []
+    createdAdIds: List[str] = []
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    finishedAt: Optional[datetime] = None
+    expiresAt: Optional[datetime] = None  # finished jobs are retained until then
+
+
 class AdCreateTagBody(BaseModel):
     assetGroupId: str = Field(..., min_length=1)
     name: str = Field(..., min_length=1, max_length=200)
@@ -74,4 +110,28 @@ class AdCreateTagBody(BaseModel):
     brandUrl: Optional[str] = None
     sponsoredBy: Optional[str] = None
     ctaText: Optional[str] = None
-    trackingTags: Optional[List[str]] = Field(None, max_length=5)
\ No newline at end of file
+    trackingTags: Optional[List[str]] = Field(None, max_length=5)
+
+
+
+class AdBatchUpdateItem(AdUpdate):
+    id: str = Field(..., min_length=1)
+
+
+class AdBatchCreateBody(BaseModel):
+    # Tag-based ads only: file-based ads are uploaded through POST /ads or /ads/bulk.
+    items: List[AdCreateTagBody] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class AdBatchUpdateBody(BaseModel):
+    items: List[AdBatchUpdateItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class AdBatchResult(BatchItemResult):
+    ad: Optional[AdOut] = None
+
+
+class AdBatchResponse(BaseModel):
+    results: List[AdBatchResult]
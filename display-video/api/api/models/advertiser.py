@@ -27,3 +27,8 @@ class AdvertiserOut(AdvertiserBase):
     updatedAt: datetime
     servingStatus: str = "SERVING"
     servingReasons: List[str] = []
+
+
+class ListAdvertisersResponse(BaseModel):
+    advertisers: List[AdvertiserOut]
+    nextPageToken: Optional[str] = None
@@ -5,6 +5,8 @@ from typing import Optional, List, Any, Dict
 
 from pydantic import BaseModel, Field
 
+from api.models.batch import BATCH_MAX_ITEMS, BatchItemResult
+
 
 class AssetGroupBase(BaseModel):
     campaignId: str = Field(..., min_length=1)
@@ -32,3 +34,30 @@ class AssetGroupOut(AssetGroupBase):
     updatedAt: datetime
     servingStatus: str = "NOT_SERVING"
     servingReasons: List[str] = []
+
+
+class ListAssetGroupsResponse(BaseModel):
+    assetGroups: List[AssetGroupOut]
+    nextPageToken: Optional[str] = None
+
+
+class AssetGroupBatchUpdateItem(AssetGroupUpdate):
+    id: str = Field(..., min_length=1)
+
+
+class AssetGroupBatchCreateBody(BaseModel):
+    items: List[AssetGroupCreate] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class AssetGroupBatchUpdateBody(BaseModel):
+    items: List[AssetGroupBatchUpdateItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class AssetGroupBatchResult(BatchItemResult):
+    assetGroup: Optional[AssetGroupOut] = None
+
+
+class AssetGroupBatchResponse(BaseModel):
+    results: List[AssetGroupBatchResult]
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+BATCH_MAX_ITEMS = 1000
+
+
+class BatchArchiveBody(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True  # all-or-nothing; false applies the valid items and reports the rest per item
+
+
+class BatchItemResult(BaseModel):
+    index: int  # position in the request's items/ids
+    status: int  # what the single-entity endpoint would have answered
+    error: Optional[Dict[str, Any]] = None  # problem details when the item failed
@@ -5,6 +5,8 @@ from typing import Optional, List, Any, Dict
 
 from pydantic import BaseModel, Field
 
+from api.models.batch import BATCH_MAX_ITEMS, BatchItemResult
+
 
 class CampaignBase(BaseModel):
     advertiserId: str = Field(..., min_length=1)
@@ -36,5 +38,32 @@ class CampaignOut(CampaignBase):
     servingReasons: List[str] = []
 
 
+class ListCampaignsResponse(BaseModel):
+    campaigns: List[CampaignOut]
+    nextPageToken: Optional[str] = None
+
+
 class CampaignCreateOut(CampaignOut):
     pass
+
+
+class CampaignBatchUpdateItem(CampaignUpdate):
+    id: str = Field(..., min_length=1)
+
+
+class CampaignBatchCreateBody(BaseModel):
+    items: List[CampaignCreate] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class CampaignBatchUpdateBody(BaseModel):
+    items: List[CampaignBatchUpdateItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    atomic: bool = True
+
+
+class CampaignBatchResult(BatchItemResult):
+    campaign: Optional[CampaignOut] = None
+
+
+class CampaignBatchResponse(BaseModel):
+    results: List[CampaignBatchResult]
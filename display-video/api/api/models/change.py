@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel
+
+CHANGES_DEFAULT_LIMIT = 1000
+CHANGES_MAX_LIMIT = 10000
+
+ChangeOp = Literal["created", "updated"]
+
+
+class ChangeOut(BaseModel):
+    seq: int  # position in the change log; increases with every write
+    type: str  # entity type: partner, advertiser, campaign, asset_group or ad
+    id: str
+    op: ChangeOp
+    changed: Dict[str, Any]  # new values of the fields the write changed (every field when created)
+    servingStatus: Optional[str] = None  # after the write, changed or not
+    servingReasons: Optional[List[str]] = None
+
+
+class ChangesResponse(BaseModel):
+    changes: List[ChangeOut]
+    nextSince: int  # pass back as since; equals the latest seq once caught up
@@ -25,3 +25,8 @@ class PartnerOut(PartnerBase):
     updatedAt: datetime
     servingStatus: str = "SERVING"
     servingReasons: List[str] = []
+
+
+class ListPartnersResponse(BaseModel):
+    partners: List[PartnerOut]
+    nextPageToken: Optional[str] = None
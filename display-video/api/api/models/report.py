@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
@@ -10,13 +11,16 @@ Metric = Literal["IMPRESSIONS", "CLICKS", "SPEND"]
 Dimension = Literal["DATE", "CAMPAIGN_ID", "ASSET_GROUP_ID", "AD_ID"]
 
 
-class ReportQuery(BaseModel):
+class ReportExportQuery(BaseModel):
     startDate: str = Field(..., min_length=8, max_length=32)
     endDate: str = Field(..., min_length=8, max_length=32)
     timeGrain: TimeGrain = "NONE"
     metrics: List[Metric] = Field(default_factory=lambda: ["IMPRESSIONS"])
     dimensions: List[Dimension] = Field(default_factory=list)
     filters: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ReportQuery(ReportExportQuery):
     limit: int = Field(100, ge=1, le=1000)
     offset: int = Field(0, ge=0)
 
@@ -25,3 +29,46 @@ class ReportResponse(BaseModel):
     rows: List[Dict[str, Any]]
     totals: Dict[str, Any]
     timeSeries: Optional[List[Dict[str, Any]]] = None
+    debug: Optional[Dict[str, Any]] = None  # source: rollup:<column> or facts; partitions (days read); rowsScanned
+
+
+ReportJobStatus = Literal["QUEUED", "RUNNING", "SUCCEEDED", "FAILED"]
+ExportFormat = Literal["csv", "ndjson"]
+
+
+class ReportJobOut(BaseModel):
+    id: str
+    status: ReportJobStatus
+    query: ReportExportQuery
+    rowCount: Optional[int] = None  # rows in the result, once it has SUCCEEDED
+    totals: Optional[Dict[str, Any]] = None
+    timeSeries: Optional[List[Dict[str, Any]]] = None
+    debug: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    finishedAt: Optional[datetime] = None
+    expiresAt: Optional[datetime] = None  # finished jobs (and their results) are retained until then
+
+
+class ReportCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    maxBytes: int
+    ttlSeconds: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int  # entries dropped because facts were appended to a day in their range
+
+
+class IngestError(BaseModel):
+    line: int
+    field: str
+    message: str
+
+
+class IngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[IngestError]  # the first ones (core.ingest.MAX_ERRORS)
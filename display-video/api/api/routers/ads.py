@@ -1,19 +1,50 @@
 from __future__ import annotations
 
 import json
+import os
+import zipfile
+from concurrent.futures import Future
 from datetime import datetime, timezone
-from typing import List, Optional
+from functools import partial
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import JSONResponse
 from starlette import status
-
+from starlette.concurrency import run_in_threadpool
+
+from api.core.batch import run_batch
+from api.core.blob_response import blob_response
+from api.core.blobs import BLOBS, BlobWriter, copy_into, spool_to_tempfile, spool_upload
+from api.core.bulk_jobs import BULK_JOBS, BulkJob
+from api.core.content import attach_upload, known_metadata, metadata_key, release, remember_metadata
+from api.core.errors import ProblemError
+from api.core.etags import check_if_match, collection_etag, entity_etag, not_modified, set_etag
+from api.core.fastjson import entity_response, fast_responses_enabled, list_response
+from api.core.fields import FIELDS_DESCRIPTION, parse_fields
 from api.core.ids import new_id
-from api.core.serving import recompute_all
+from api.core.paging import ListQuery, list_query, select
+from api.core.serving import recompute_entity
 from api.core.store import STORE
-from api.models.ad import AdCreateTagBody, AdOut, AdUpdate
+from api.core.tree import register_node
+from api.core.workers import BULK_MAX_IN_FLIGHT, bulk_executor
+from api.models.ad import (
+    AdBatchCreateBody,
+    AdBatchResponse,
+    AdBatchUpdateBody,
+    AdBatchUpdateItem,
+    AdCreateTagBody,
+    AdOut,
+    AdUpdate,
+    BulkJobOut,
+    ListAdsResponse,
+)
+from api.models.batch import BatchArchiveBody
 from api.validators.ad_validator import (
-    extract_display_image_metadata,
+    DISPLAY_IMAGE_MAX_BYTES,
+    INVALID_ZIP_ERROR,
+    ZIP_READ_ERRORS,
+    display_image_metadata,
     extract_video_metadata_demo,
     generate_vast_wrapper_demo,
     get_image_dimensions_from_bytes,
@@ -33,47 +64,59 @@ CONTENT_BASE = "http://localhost:8000/v1"
 router = APIRouter()
 
 
-def _problem_details(status_code: int, detail: str, errors: Optional[list] = None):
-    payload = {"type": "about:blank", "title": "Validation Error", "status": status_code, "detail": detail, "code": "VALIDATION_ERROR"}
-    if errors:
-        payload["errors"] = errors
-    return JSONResponse(status_code=status_code, content=payload, media_type="application/problem+json")
+def _ad_payload(ad: dict) -> dict:
+    adid = ad["id"]
+    content_url = f"{CONTENT_BASE}/ads/{adid}/content" if adid in STORE.ad_content else None
+    return {
+        "id": ad["id"],
+        "assetGroupId": ad["assetGroupId"],
+        "name": ad["name"],
+        "adType": ad.get("adType", "DISPLAY"),
+        "inputType": ad.get("inputType", "DISPLAY_IMAGE"),
+        "landingUrl": ad.get("landingUrl"),
+        "brandUrl": ad.get("brandUrl"),
+        "sponsoredBy": ad.get("sponsoredBy"),
+        "ctaText": ad.get("ctaText"),
+        "tagText": ad.get("tagText"),
+        "filename": ad.get("filename"),
+        "metadata": ad.get("metadata"),
+        "trackingTags": ad.get("trackingTags"),
+        "substitutedPreview": ad.get("substitutedPreview"),
+        "generatedVastWrapper": ad.get("generatedVastWrapper"),
+        "archived": ad.get("archived", False),
+        "createdAt": ad["createdAt"],
+        "updatedAt": ad["updatedAt"],
+        "servingStatus": ad.get("servingStatus", "NOT_SERVING"),
+        "servingReasons": ad.get("servingReasons", []),
+        "contentUrl": content_url,
+    }
 
 
 def _ad_to_out(ad: dict) -> AdOut:
-    adid = ad["id"]
-    content_url = f"{CONTENT_BASE}/ads/{adid}/content" if adid in STORE.ad_content else None
-    return AdOut(
-        id=ad["id"],
-        assetGroupId=ad["assetGroupId"],
-        name=ad["name"],
-        adType=ad.get("adType", "DISPLAY"),
-        inputType=ad.get("inputType", "DISPLAY_IMAGE"),
-        landingUrl=ad.get("landingUrl"),
-        brandUrl=ad.get("brandUrl"),
-        sponsoredBy=ad.get("sponsoredBy"),
-        ctaText=ad.get("ctaText"),
-        tagText=ad.get("tagText"),
-        filename=ad.get("filename"),
-        metadata=ad.get("metadata"),
-        trackingTags=ad.get("trackingTags"),
-        substitutedPreview=ad.get("substitutedPreview"),
-        generatedVastWrapper=ad.get("generatedVastWrapper"),
-        archived=ad.get("archived", False),
-        createdAt=ad["createdAt"],
-        updatedAt=ad["updatedAt"],
-        servingStatus=ad.get("servingStatus", "NOT_SERVING"),
-        servingReasons=ad.get("servingReasons", []),
-        contentUrl=content_url,
-    )
+    return AdOut(**_ad_payload(ad))
 
 
-@router.get("/ads", response_model=List[AdOut], summary="List ads")
-def list_ads(assetGroupId: Optional[str] = None):
-    ads = list(STORE.ads.values())
-    if assetGroupId:
-        ads = [a for a in ads if a.get("assetGroupId") == assetGroupId]
-    return [_ad_to_out(a) for a in ads]
+register_node("ad", AdOut, _ad_payload)
+
+
+@router.get("/ads", response_model=Union[List[AdOut], ListAdsResponse], summary="List ads")
+def list_ads(request: Request, response: Response, assetGroupId: Optional[str] = None, query: ListQuery = Depends(list_query)):
+    etag = collection_etag(STORE, request, "ad")
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(query.fields, AdOut)
+    ads, next_token = select(STORE, "ad", query, parent_id=assetGroupId or None)
+    if mask is not None or fast_responses_enabled():
+        return list_response(
+            "ad", ads, AdOut, _ad_payload, envelope="ads" if query.paginated else None, next_page_token=next_token, mask=mask,
+            headers={"ETag": etag},
+        )
+    response.headers["ETag"] = etag
+    out = [_ad_to_out(a) for a in ads]
+    if query.paginated:
+        return {"ads": out, "nextPageToken": next_token}
+    return out
 
 
 def _parse_tracking_tags(tags_form: Optional[str]) -> List[str]:
@@ -102,29 +145,38 @@ async def create_ad_file(
     file: UploadFile = File(...),
 ):
     if assetGroupId not in STORE.asset_groups:
-        return _problem_details(400, "assetGroupId does not exist", [{"field": "assetGroupId", "message": "Asset group not found."}])
+        raise ProblemError(400, "assetGroupId does not exist", [{"field": "assetGroupId", "message": "Asset group not found."}])
     if adType not in ("DISPLAY", "VIDEO"):
-        return _problem_details(400, "Invalid adType", [{"field": "adType", "message": "adType must be DISPLAY or VIDEO."}])
+        raise ProblemError(400, "Invalid adType", [{"field": "adType", "message": "adType must be DISPLAY or VIDEO."}])
     valid_input: List[str] = ["DISPLAY_IMAGE", "DISPLAY_HTML5_ZIP", "VIDEO_FILE"]
     if inputType not in valid_input:
-        return _problem_details(400, "Invalid inputType", [{"field": "inputType", "message": f"inputType for file must be one of {valid_input}."}])
+        raise ProblemError(400, "Invalid inputType", [{"field": "inputType", "message": f"inputType for file must be one of {valid_input}."}])
 
     tags_list = _parse_tracking_tags(trackingTags)
     ok, errs = validate_tracking_tags(tags_list)
     if not ok:
-        return _problem_details(400, "Invalid tracking tags", errs)
+        raise ProblemError(400, "Invalid tracking tags", errs)
 
-    bytes_data = await file.read()
+    # Stream the upload to the blob store while hashing; only images (<= 5 MB when valid) are read back into memory.
+    writer = await spool_upload(BLOBS, file)
+    size = writer.size
     content_type = file.content_type or ("video/mp4" if inputType == "VIDEO_FILE" else "image/png")
     filename = file.filename or "file"
+    digest = writer.digest
+    meta_key = metadata_key(inputType, content_type, filename)
+    # Same bytes already accepted under this type/extension: reuse their metadata and skip validation.
+    meta = known_metadata(STORE, digest, meta_key)
 
     if inputType == "DISPLAY_IMAGE":
-        dims = get_image_dimensions_from_bytes(bytes_data)
-        w, h = (dims[0], dims[1]) if dims else (None, None)
-        ok, errs = validate_display_image(content_type, filename, len(bytes_data), w, h)
-        if not ok:
-            return _problem_details(400, "Display image validation failed", errs)
-        meta = extract_display_image_metadata(bytes_data, content_type, filename)
+        if meta is None:
+            head = writer.read_back(DISPLAY_IMAGE_MAX_BYTES + 1)
+            dims = get_image_dimensions_from_bytes(head)
+            w, h = (dims[0], dims[1]) if dims else (None, None)
+            ok, errs = validate_display_image(content_type, filename, size, w, h)
+            if not ok:
+                writer.abort()
+                raise ProblemError(400, "Display image validation failed", errs)
+            meta = display_image_metadata(content_type, size, dims)
         # Stitch tracking: substituted preview with macro-substituted tracking tags
         stitched_parts = []
         for t in tags_list:
@@ -133,17 +185,22 @@ async def create_ad_file(
         stitched = "\n".join(stitched_parts) if stitched_parts else None
         vast = None
     elif inputType == "DISPLAY_HTML5_ZIP":
-        ok, errs = validate_html5_zip(filename, len(bytes_data))
-        if not ok:
-            return _problem_details(400, "HTML5 ZIP validation failed", errs)
-        meta = {"fileType": content_type, "fileSizeBytes": len(bytes_data), "assetUrl": None, "filename": filename}
+        if meta is None:
+            ok, errs = validate_html5_zip(filename, size)
+            if not ok:
+                writer.abort()
+                raise ProblemError(400, "HTML5 ZIP validation failed", errs)
+            meta = {"fileType": content_type, "fileSizeBytes": size, "assetUrl": None}
+        meta["filename"] = filename
         stitched = None
         vast = None
     elif inputType == "VIDEO_FILE":
-        ok, errs = validate_video_file(filename, content_type, len(bytes_data))
-        if not ok:
-            return _problem_details(400, "Video file validation failed", errs)
-        meta = extract_video_metadata_demo(bytes_data, filename)
+        if meta is None:
+            ok, errs = validate_video_file(filename, content_type, size)
+            if not ok:
+                writer.abort()
+                raise ProblemError(400, "Video file validation failed", errs)
+            meta = extract_video_metadata_demo(size, filename)
         vast = None  # set below after we have adid
         stitched = None
     else:
@@ -151,6 +208,7 @@ async def create_ad_file(
         stitched = None
         vast = None
 
+    meta["sha256"] = digest
     now = datetime.now(timezone.utc)
     adid = new_id("ad")
     if inputType == "VIDEO_FILE":
@@ -178,34 +236,40 @@ async def create_ad_file(
         "servingStatus": "NOT_SERVING",
         "servingReasons": [],
     }
-    STORE.ads[adid] = ad
-    STORE.ad_content[adid] = (bytes_data, content_type)
-    recompute_all(STORE)
-    return _ad_to_out(ad)
+    return await run_in_threadpool(_store_uploaded_ad, ad, writer, content_type, meta_key)
 
 
-@router.post("/ads/tag", response_model=AdOut, summary="Create ad (tag-based, JSON)", status_code=status.HTTP_201_CREATED)
-def create_ad_tag(body: AdCreateTagBody):
+def _store_uploaded_ad(ad: dict, writer: BlobWriter, content_type: str, meta_key: str) -> AdOut:
+    # Runs in a worker thread: waiting for other writers must not stall the event loop.
+    with STORE.transaction():
+        remember_metadata(STORE, writer.digest, meta_key, ad["metadata"])
+        # Content first, so the ad is never visible without its contentUrl.
+        attach_upload(STORE, BLOBS, ad["id"], writer, content_type)
+        STORE.save("ad", ad)
+        return _ad_to_out(recompute_entity(STORE, "ad", ad["id"]))
+
+
+def _new_tag_ad(body: AdCreateTagBody) -> dict:
+    """Validate a tag-based ad (single or batch create) and build it, unsaved; raises ProblemError."""
     if body.assetGroupId not in STORE.asset_groups:
-        return _problem_details(400, "Asset group not found", [{"field": "assetGroupId", "message": "Asset group does not exist."}])
+        raise ProblemError(400, "Asset group not found", [{"field": "assetGroupId", "message": "Asset group does not exist."}])
     tags_list = body.trackingTags or []
     ok, errs = validate_tracking_tags(tags_list)
     if not ok:
-        return _problem_details(400, "Invalid tracking tags", errs)
+        raise ProblemError(400, "Invalid tracking tags", errs)
     if body.inputType == "DISPLAY_THIRD_PARTY_TAG":
         ok, errs = validate_dcm_tag(body.tagText)
         if not ok:
-            return _problem_details(400, "DCM tag validation failed", errs)
+            raise ProblemError(400, "DCM tag validation failed", errs)
         substituted = substitute_macros(body.tagText)
     else:
         ok, errs = validate_vast_tag(body.tagText)
         if not ok:
-            return _problem_details(400, "VAST tag validation failed", errs)
+            raise ProblemError(400, "VAST tag validation failed", errs)
         substituted = substitute_macros(body.tagText)
     now = datetime.now(timezone.utc)
-    adid = new_id("ad")
-    ad = {
-        "id": adid,
+    return {
+        "id": new_id("ad"),
         "assetGroupId": body.assetGroupId,
         "name": body.name,
         "adType": body.adType,
@@ -226,9 +290,39 @@ def create_ad_tag(body: AdCreateTagBody):
         "servingStatus": "NOT_SERVING",
         "servingReasons": [],
     }
-    STORE.ads[adid] = ad
-    recompute_all(STORE)
-    return _ad_to_out(ad)
+
+
+@router.post("/ads/tag", response_model=AdOut, summary="Create ad (tag-based, JSON)", status_code=status.HTTP_201_CREATED)
+def create_ad_tag(body: AdCreateTagBody):
+    with STORE.transaction():
+        ad = _new_tag_ad(body)
+        STORE.save("ad", ad)
+        return _ad_to_out(recompute_entity(STORE, "ad", ad["id"]))
+
+
+def _release_content(ad: dict) -> None:
+    release(STORE, BLOBS, ad["id"])
+
+
+@router.post("/ads:batchCreate", response_model=AdBatchResponse, summary="Create tag-based ads in one batch")
+def batch_create_ads(body: AdBatchCreateBody):
+    return run_batch(STORE, "ad", body.items, _new_tag_ad, atomic=body.atomic, key="ad", created=True, render=_ad_payload)
+
+
+@router.post("/ads:batchUpdate", response_model=AdBatchResponse, summary="Update ads in one batch")
+def batch_update_ads(body: AdBatchUpdateBody):
+    def prepare(item: AdBatchUpdateItem) -> dict:
+        return _updated(_ad_for_update(item.id), item)
+
+    return run_batch(STORE, "ad", body.items, prepare, atomic=body.atomic, key="ad", render=_ad_payload)
+
+
+@router.post("/ads:batchArchive", response_model=AdBatchResponse, summary="Archive ads in one batch")
+def batch_archive_ads(body: BatchArchiveBody):
+    return run_batch(
+        STORE, "ad", body.ids, _archived, atomic=body.atomic, key="ad", field="ids",
+        before_save=_release_content, render=_ad_payload,
+    )
 
 
 @router.post("/ads/bulk", summary="Bulk upload (zip + optional manifest); parse and optionally create ads")
@@ -236,20 +330,71 @@ async def bulk_upload_ads(
     assetGroupId: str = Form(..., min_length=1),
     mode: str = Form(...),  # DISPLAY | VIDEO
     create: bool = Form(False),
+    run_async: bool = Form(False, alias="async"),
     file: UploadFile = File(...),
 ):
     if assetGroupId not in STORE.asset_groups:
-        return _problem_details(400, "Asset group not found", [{"field": "assetGroupId", "message": "Asset group does not exist."}])
+        raise ProblemError(400, "Asset group not found", [{"field": "assetGroupId", "message": "Asset group does not exist."}])
     if mode not in ("DISPLAY", "VIDEO"):
-        return _problem_details(400, "Invalid mode", [{"field": "mode", "message": "mode must be DISPLAY or VIDEO."}])
+        raise ProblemError(400, "Invalid mode", [{"field": "mode", "message": "mode must be DISPLAY or VIDEO."}])
     if not file.filename or not file.filename.lower().endswith(".zip"):
-        return _problem_details(400, "Bulk upload requires a ZIP file", [{"field": "file", "message": "Upload a .zip file."}])
+        raise ProblemError(400, "Bulk upload requires a ZIP file", [{"field": "file", "message": "Upload a .zip file."}])
+
+    # Spool the archive to disk and walk it member by member; payloads go straight into content storage.
+    zip_path = await spool_to_tempfile(file, suffix=".zip")
+    job = BulkJob(assetGroupId, mode, create)
+    if run_async:
+        # Job mode: return at once and let the UI poll GET /ads/bulk-jobs/{jobId} for progress.
+        BULK_JOBS.register(job)
+        future = BULK_JOBS.submit(_run_bulk_job, zip_path, job)
+        future.add_done_callback(partial(_bulk_job_done, zip_path, job))
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=BulkJobOut(**job.snapshot(BULK_JOBS.ttl_seconds)).model_dump(mode="json"),
+            headers={"Location": f"/v1/ads/bulk-jobs/{job.id}"},
+        )
+    try:
+        # Validation fans out over the bulk pool; the whole walk runs off the event loop.
+        return await run_in_threadpool(_bulk_from_zip, zip_path, job)
+    finally:
+        os.remove(zip_path)
+
+
+@router.get("/ads/bulk-jobs/{jobId}", response_model=BulkJobOut, summary="Get bulk upload job progress and results")
+def get_bulk_job(jobId: str):
+    snapshot = BULK_JOBS.snapshot(jobId)
+    if not snapshot:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bulk job not found")
+    return BulkJobOut(**snapshot)
 
-    zip_bytes = await file.read()
+
+def _run_bulk_job(zip_path: str, job: BulkJob) -> None:
+    try:
+        _bulk_from_zip(zip_path, job)
+        job.succeed()
+    except Exception as e:
+        job.fail(str(e) or type(e).__name__)
+    finally:
+        os.remove(zip_path)
+
+
+def _bulk_job_done(zip_path: str, job: BulkJob, future: Future) -> None:
+    # A job cancelled while still queued (pool shutdown) never ran _run_bulk_job, so clean up here.
+    if future.cancelled():
+        job.fail("Cancelled before it started (server shutting down).")
+        os.remove(zip_path)
+
+
+def _bulk_from_zip(zip_path: str, job: BulkJob) -> dict:
+    assetGroupId, mode, create = job.assetGroupId, job.mode, job.create
+    # Creating reads every payload into the blob store anyway, so only a validate-only run reads them to check CRCs.
     if mode == "DISPLAY":
-        parsed, global_errors = parse_bulk_display_zip(zip_bytes)
+        parsed, global_errors = parse_bulk_display_zip(
+            zip_path, bulk_executor(), BULK_MAX_IN_FLIGHT, job.validating, verify=not create
+        )
     else:
-        parsed, global_errors = parse_bulk_video_zip(zip_bytes)
+        job.validating(0, 0)
+        parsed, global_errors = parse_bulk_video_zip(zip_path, verify=not create)
 
     # Build response items (no raw bytes)
     items = [
@@ -261,74 +406,134 @@ async def bulk_upload_ads(
         for p in parsed
     ]
     response: dict = {"globalErrors": global_errors, "items": items}
+    job.validated_items(items, global_errors)
 
     if create and not global_errors and all(not p.get("errors") for p in parsed):
-        created = []
-        for p in parsed:
-            name = p["filename"].rsplit(".", 1)[0] if "." in p["filename"] else p["filename"]
-            ad_type = "DISPLAY" if mode == "DISPLAY" else "VIDEO"
-            input_type = "DISPLAY_IMAGE" if mode == "DISPLAY" else "VIDEO_FILE"
-            now = datetime.now(timezone.utc)
-            adid = new_id("ad")
-            meta = extract_display_image_metadata(p["bytes"], p["contentType"], p["filename"]) if mode == "DISPLAY" else extract_video_metadata_demo(p["bytes"], p["filename"])
-            vast = None
-            if mode == "VIDEO":
-                content_url = f"{CONTENT_BASE}/ads/{adid}/content"
-                vast = generate_vast_wrapper_demo(content_url, p.get("trackingTags"))
-            ad = {
-                "id": adid,
-                "assetGroupId": assetGroupId,
-                "name": name,
-                "adType": ad_type,
-                "inputType": input_type,
-                "landingUrl": None,
-                "brandUrl": None,
-                "sponsoredBy": None,
-                "ctaText": None,
-                "tagText": None,
-                "filename": p["filename"],
-                "metadata": meta,
-                "trackingTags": p.get("trackingTags", []),
-                "substitutedPreview": None,
-                "generatedVastWrapper": vast,
-                "archived": False,
-                "createdAt": now,
-                "updatedAt": now,
-                "servingStatus": "NOT_SERVING",
-                "servingReasons": [],
-            }
-            STORE.ads[adid] = ad
-            STORE.ad_content[adid] = (p["bytes"], p["contentType"])
-            created.append(_ad_to_out(ad))
-        response["created"] = [c.model_dump() for c in created]
-        recompute_all(STORE)
+        job.creating()
+        writers = _spool_members(zip_path, parsed)
+        if writers is None:
+            # A damaged member only shows once its payload is read: fail the whole upload before creating any ad.
+            global_errors.append(dict(INVALID_ZIP_ERROR))
+            job.validated_items(items, global_errors)
+            return response
+        created: List[str] = []
+        try:
+            for index, (p, writer) in enumerate(zip(parsed, writers)):
+                name = p["filename"].rsplit(".", 1)[0] if "." in p["filename"] else p["filename"]
+                ad_type = "DISPLAY" if mode == "DISPLAY" else "VIDEO"
+                input_type = "DISPLAY_IMAGE" if mode == "DISPLAY" else "VIDEO_FILE"
+                now = datetime.now(timezone.utc)
+                adid = new_id("ad")
+                meta_key = metadata_key(input_type, p["contentType"], p["filename"])
+                meta = known_metadata(STORE, writer.digest, meta_key)
+                if meta is None and mode == "DISPLAY":
+                    # Dimensions were already sniffed during (parallel) validation.
+                    dims = (p["width"], p["height"]) if p.get("width") else None
+                    meta = display_image_metadata(p["contentType"], p["size"], dims)
+                elif meta is None:
+                    meta = extract_video_metadata_demo(p["size"], p["filename"])
+                meta["sha256"] = writer.digest
+                vast = None
+                if mode == "VIDEO":
+                    content_url = f"{CONTENT_BASE}/ads/{adid}/content"
+                    vast = generate_vast_wrapper_demo(content_url, p.get("trackingTags"))
+                ad = {
+                    "id": adid,
+                    "assetGroupId": assetGroupId,
+                    "name": name,
+                    "adType": ad_type,
+                    "inputType": input_type,
+                    "landingUrl": None,
+                    "brandUrl": None,
+                    "sponsoredBy": None,
+                    "ctaText": None,
+                    "tagText": None,
+                    "filename": p["filename"],
+                    "metadata": meta,
+                    "trackingTags": p.get("trackingTags", []),
+                    "substitutedPreview": None,
+                    "generatedVastWrapper": vast,
+                    "archived": False,
+                    "createdAt": now,
+                    "updatedAt": now,
+                    "servingStatus": "NOT_SERVING",
+                    "servingReasons": [],
+                }
+                # One short write section per ad (never the whole walk), so other writers interleave; the content
+                # reference and the ad are written together, as for a single upload.
+                with STORE.transaction():
+                    remember_metadata(STORE, writer.digest, meta_key, meta)
+                    attach_upload(STORE, BLOBS, adid, writer, p["contentType"])
+                    STORE.save("ad", ad)
+                job.created_ad(index, adid)
+                created.append(adid)
+        finally:
+            for writer in writers[len(created):]:
+                writer.abort()
+            # Also on a failure part-way through, so the ads created so far get their serving status.
+            with STORE.transaction():
+                recompute_entity(STORE, "asset_group", assetGroupId)
+        # Read back after the recompute so the created ads carry their final serving status.
+        response["created"] = [_ad_to_out(STORE.ads[i]).model_dump() for i in created]
     return response
 
 
-@router.get("/ads/{adId}/content", summary="Get ad file bytes")
-def get_ad_content(adId: str):
+def _spool_members(zip_path: str, parsed: List[dict]) -> Optional[List[BlobWriter]]:
+    """
+    Stream every member into an uncommitted blob writer (closed, so a large archive holds no open files), reading
+    each payload once and checking its CRC on the way; None, with nothing left behind, when a member is damaged.
+    """
+    writers: List[BlobWriter] = []
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            for p in parsed:
+                writer = BLOBS.writer()
+                writers.append(writer)
+                with zf.open(p["member"]) as fh:
+                    copy_into(writer, fh)
+                writer.close()
+    except BaseException as e:
+        for writer in writers:
+            writer.abort()
+        if isinstance(e, ZIP_READ_ERRORS):
+            return None
+        raise
+    return writers
+
+
+@router.get("/ads/{adId}/content", summary="Get ad file bytes (supports Range, ETag/If-None-Match)")
+def get_ad_content(adId: str, request: Request):
     if adId not in STORE.ads:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ad not found")
     if adId not in STORE.ad_content:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No content for this ad")
-    data, content_type = STORE.ad_content[adId]
-    return Response(content=data, media_type=content_type)
+    return blob_response(request, BLOBS, STORE.ad_content[adId])
 
 
 @router.get("/ads/{adId}", response_model=AdOut, summary="Get ad")
-def get_ad(adId: str):
+def get_ad(adId: str, request: Request, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     ad = STORE.ads.get(adId)
     if not ad:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ad not found")
+    etag = entity_etag(ad)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, AdOut)
+    if mask is not None or fast_responses_enabled():
+        return entity_response("ad", ad, AdOut, _ad_payload, headers={"ETag": etag}, mask=mask)
+    response.headers["ETag"] = etag
     return _ad_to_out(ad)
 
 
-@router.patch("/ads/{adId}", response_model=AdOut, summary="Update ad")
-def update_ad(adId: str, body: AdUpdate):
-    ad = STORE.ads.get(adId)
+def _ad_for_update(adId: str) -> dict:
+    ad = STORE.for_update("ad", adId)
     if not ad:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ad not found")
+    return ad
+
 
+def _updated(ad: dict, body: AdUpdate) -> dict:
     updates = body.model_dump(exclude_unset=True)
     if "assetGroupId" in updates:
         if updates["assetGroupId"] not in STORE.asset_groups:
@@ -339,16 +544,32 @@ def update_ad(adId: str, body: AdUpdate):
             ad[key] = updates[key]
 
     ad["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
-    return _ad_to_out(ad)
+    return ad
 
 
-@router.post("/ads/{adId}:archive", response_model=AdOut, summary="Archive ad")
-def archive_ad(adId: str):
-    ad = STORE.ads.get(adId)
-    if not ad:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ad not found")
+def _archived(adId: str) -> dict:
+    ad = _ad_for_update(adId)
     ad["archived"] = True
     ad["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+    return ad
+
+
+@router.patch("/ads/{adId}", response_model=AdOut, summary="Update ad")
+def update_ad(adId: str, body: AdUpdate, request: Request, response: Response):
+    with STORE.transaction():
+        ad = _ad_for_update(adId)
+        check_if_match(request, ad)
+        previous_ag_id = ad["assetGroupId"]
+        STORE.save("ad", _updated(ad, body))
+        ad = recompute_entity(STORE, "ad", adId, previous_parent_id=previous_ag_id)
+    set_etag(response, ad)
     return _ad_to_out(ad)
+
+
+@router.post("/ads/{adId}:archive", response_model=AdOut, summary="Archive ad")
+def archive_ad(adId: str):
+    with STORE.transaction():
+        ad = _archived(adId)
+        release(STORE, BLOBS, adId)
+        STORE.save("ad", ad)
+        return _ad_to_out(recompute_entity(STORE, "ad", adId))
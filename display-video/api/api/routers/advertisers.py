@@ -1,78 +1,126 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from starlette import status
 
+from api.core.etags import check_if_match, collection_etag, entity_etag, not_modified, set_etag
+from api.core.fastjson import entity_response, fast_responses_enabled, list_response
+from api.core.fields import FIELDS_DESCRIPTION, parse_fields
 from api.core.ids import new_id
+from api.core.paging import ListQuery, list_query, select
 from api.core.store import STORE
-from api.core.serving import recompute_all
-from api.models.advertiser import AdvertiserCreate, AdvertiserOut, AdvertiserUpdate
+from api.core.serving import recompute_entity
+from api.core.tree import register_node, tree_response
+from api.models.advertiser import AdvertiserCreate, AdvertiserOut, AdvertiserUpdate, ListAdvertisersResponse
 
 router = APIRouter()
 
+register_node("advertiser", AdvertiserOut)
 
-@router.get("/advertisers", response_model=List[AdvertiserOut], summary="List advertisers")
-def list_advertisers():
-    return list(STORE.advertisers.values())
+
+@router.get("/advertisers", response_model=Union[List[AdvertiserOut], ListAdvertisersResponse], summary="List advertisers")
+def list_advertisers(request: Request, response: Response, partnerId: Optional[str] = None, query: ListQuery = Depends(list_query)):
+    etag = collection_etag(STORE, request, "advertiser")
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(query.fields, AdvertiserOut)
+    advertisers, next_token = select(STORE, "advertiser", query, parent_id=partnerId or None)
+    if mask is not None or fast_responses_enabled():
+        return list_response(
+            "advertiser", advertisers, AdvertiserOut, envelope="advertisers" if query.paginated else None, next_page_token=next_token, mask=mask,
+            headers={"ETag": etag},
+        )
+    response.headers["ETag"] = etag
+    if query.paginated:
+        return {"advertisers": advertisers, "nextPageToken": next_token}
+    return advertisers
 
 
 @router.post("/advertisers", response_model=AdvertiserOut, summary="Create advertiser", status_code=status.HTTP_201_CREATED)
 def create_advertiser(body: AdvertiserCreate):
-    if body.partnerId not in STORE.partners:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="partnerId does not exist")
-
-    now = datetime.now(timezone.utc)
-    aid = new_id("advertiser")
-    adv = {
-        "id": aid,
-        "partnerId": body.partnerId,
-        "name": body.name,
-        "archived": False,
-        "createdAt": now,
-        "updatedAt": now,
-        "servingStatus": "SERVING",
-        "servingReasons": [],
-    }
-    STORE.advertisers[aid] = adv
-    recompute_all(STORE)
-    return adv
+    with STORE.transaction():
+        if body.partnerId not in STORE.partners:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="partnerId does not exist")
+
+        now = datetime.now(timezone.utc)
+        aid = new_id("advertiser")
+        adv = {
+            "id": aid,
+            "partnerId": body.partnerId,
+            "name": body.name,
+            "archived": False,
+            "createdAt": now,
+            "updatedAt": now,
+            "servingStatus": "SERVING",
+            "servingReasons": [],
+        }
+        STORE.save("advertiser", adv)
+        return recompute_entity(STORE, "advertiser", aid)
 
 
 @router.get("/advertisers/{advertiserId}", response_model=AdvertiserOut, summary="Get advertiser")
-def get_advertiser(advertiserId: str):
+def get_advertiser(advertiserId: str, request: Request, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     a = STORE.advertisers.get(advertiserId)
     if not a:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+    etag = entity_etag(a)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, AdvertiserOut)
+    if mask is not None or fast_responses_enabled():
+        return entity_response("advertiser", a, AdvertiserOut, headers={"ETag": etag}, mask=mask)
+    response.headers["ETag"] = etag
     return a
 
 
-@router.patch("/advertisers/{advertiserId}", response_model=AdvertiserOut, summary="Update advertiser")
-def update_advertiser(advertiserId: str, body: AdvertiserUpdate):
+@router.get("/advertisers/{advertiserId}/tree", summary="Get advertiser with its campaigns, asset groups and ads nested")
+def get_advertiser_tree(
+    advertiserId: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to keep on every node (id is always kept)"),
+    archived: Optional[bool] = Query(None, description="Only include descendants with this archived state"),
+    depth: Optional[int] = Query(None, ge=0, le=3, description="Levels of children to include (default: all)"),
+):
     a = STORE.advertisers.get(advertiserId)
     if not a:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+    return tree_response(STORE, request, "advertiser", a, fields, archived, depth)
 
-    if body.partnerId is not None:
-        if body.partnerId not in STORE.partners:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="partnerId does not exist")
-        a["partnerId"] = body.partnerId
-    if body.name is not None:
-        a["name"] = body.name
 
-    a["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+@router.patch("/advertisers/{advertiserId}", response_model=AdvertiserOut, summary="Update advertiser")
+def update_advertiser(advertiserId: str, body: AdvertiserUpdate, request: Request, response: Response):
+    with STORE.transaction():
+        a = STORE.for_update("advertiser", advertiserId)
+        if not a:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+        check_if_match(request, a)
+
+        if body.partnerId is not None:
+            if body.partnerId not in STORE.partners:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="partnerId does not exist")
+            a["partnerId"] = body.partnerId
+        if body.name is not None:
+            a["name"] = body.name
+
+        a["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("advertiser", a)
+        a = recompute_entity(STORE, "advertiser", advertiserId)
+    set_etag(response, a)
     return a
 
 
 @router.post("/advertisers/{advertiserId}:archive", response_model=AdvertiserOut, summary="Archive advertiser")
 def archive_advertiser(advertiserId: str):
-    a = STORE.advertisers.get(advertiserId)
-    if not a:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
-    a["archived"] = True
-    a["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
-    return a
+    with STORE.transaction():
+        a = STORE.for_update("advertiser", advertiserId)
+        if not a:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advertiser not found")
+        a["archived"] = True
+        a["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("advertiser", a)
+        return recompute_entity(STORE, "advertiser", advertiserId)
@@ -1,38 +1,50 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from starlette import status
 
+from api.core.batch import run_batch
+from api.core.etags import check_if_match, collection_etag, entity_etag, not_modified, set_etag
+from api.core.fastjson import entity_response, fast_responses_enabled, list_response
+from api.core.fields import FIELDS_DESCRIPTION, parse_fields
 from api.core.ids import new_id
+from api.core.paging import ListQuery, list_query, select
 from api.core.store import STORE
-from api.core.serving import recompute_all
-from api.models.asset_group import AssetGroupCreate, AssetGroupOut, AssetGroupUpdate
+from api.core.serving import recompute_entity
+from api.core.tree import register_node
+from api.models.asset_group import (
+    AssetGroupBatchCreateBody,
+    AssetGroupBatchResponse,
+    AssetGroupBatchUpdateBody,
+    AssetGroupBatchUpdateItem,
+    AssetGroupCreate,
+    AssetGroupOut,
+    AssetGroupUpdate,
+    ListAssetGroupsResponse,
+)
+from api.models.batch import BatchArchiveBody
 
 router = APIRouter()
 
+register_node("asset_group", AssetGroupOut)
 
-@router.get("/asset-groups", response_model=List[AssetGroupOut], summary="List asset groups")
-def list_asset_groups(campaignId: Optional[str] = None):
-    groups = list(STORE.asset_groups.values())
-    if campaignId:
-        groups = [g for g in groups if g.get("campaignId") == campaignId]
-    return groups
 
+# Validation and edits shared by the single-entity and batch endpoints. They build the entity to save
+# (raising HTTPException when the input is invalid) but do not save it; callers run them in STORE.transaction().
 
-@router.post("/asset-groups", response_model=AssetGroupOut, summary="Create asset group", status_code=status.HTTP_201_CREATED)
-def create_asset_group(body: AssetGroupCreate):
+
+def _new_asset_group(body: AssetGroupCreate) -> dict:
     if body.campaignId not in STORE.campaigns:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="campaignId does not exist")
 
     now = datetime.now(timezone.utc)
-    agid = new_id("asset_group")
     raw_bid = body.defaultBid or {"amount": 0, "currency": "USD"}
     default_bid = {"amount": raw_bid.get("amount", 0), "currency": raw_bid.get("currency") or "USD"}
-    ag = {
-        "id": agid,
+    return {
+        "id": new_id("asset_group"),
         "campaignId": body.campaignId,
         "name": body.name,
         "defaultBid": default_bid,
@@ -44,25 +56,16 @@ def create_asset_group(body: AssetGroupCreate):
         "servingStatus": "NOT_SERVING",
         "servingReasons": [],
     }
-    STORE.asset_groups[agid] = ag
-    recompute_all(STORE)
-    return ag
 
 
-@router.get("/asset-groups/{assetGroupId}", response_model=AssetGroupOut, summary="Get asset group")
-def get_asset_group(assetGroupId: str):
-    ag = STORE.asset_groups.get(assetGroupId)
+def _asset_group_for_update(assetGroupId: str) -> dict:
+    ag = STORE.for_update("asset_group", assetGroupId)
     if not ag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset group not found")
     return ag
 
 
-@router.patch("/asset-groups/{assetGroupId}", response_model=AssetGroupOut, summary="Update asset group")
-def update_asset_group(assetGroupId: str, body: AssetGroupUpdate):
-    ag = STORE.asset_groups.get(assetGroupId)
-    if not ag:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset group not found")
-
+def _updated(ag: dict, body: AssetGroupUpdate) -> dict:
     if body.name is not None:
         ag["name"] = body.name
     if body.defaultBid is not None:
@@ -74,16 +77,90 @@ def update_asset_group(assetGroupId: str, body: AssetGroupUpdate):
         ag["deliverySettings"] = body.deliverySettings
 
     ag["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
     return ag
 
 
-@router.post("/asset-groups/{assetGroupId}:archive", response_model=AssetGroupOut, summary="Archive asset group")
-def archive_asset_group(assetGroupId: str):
+def _archived(assetGroupId: str) -> dict:
+    ag = _asset_group_for_update(assetGroupId)
+    ag["archived"] = True
+    ag["updatedAt"] = datetime.now(timezone.utc)
+    return ag
+
+
+@router.get("/asset-groups", response_model=Union[List[AssetGroupOut], ListAssetGroupsResponse], summary="List asset groups")
+def list_asset_groups(request: Request, response: Response, campaignId: Optional[str] = None, query: ListQuery = Depends(list_query)):
+    etag = collection_etag(STORE, request, "asset_group")
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(query.fields, AssetGroupOut)
+    groups, next_token = select(STORE, "asset_group", query, parent_id=campaignId or None)
+    if mask is not None or fast_responses_enabled():
+        return list_response(
+            "asset_group", groups, AssetGroupOut, envelope="assetGroups" if query.paginated else None, next_page_token=next_token, mask=mask,
+            headers={"ETag": etag},
+        )
+    response.headers["ETag"] = etag
+    if query.paginated:
+        return {"assetGroups": groups, "nextPageToken": next_token}
+    return groups
+
+
+@router.post("/asset-groups", response_model=AssetGroupOut, summary="Create asset group", status_code=status.HTTP_201_CREATED)
+def create_asset_group(body: AssetGroupCreate):
+    with STORE.transaction():
+        ag = _new_asset_group(body)
+        STORE.save("asset_group", ag)
+        return recompute_entity(STORE, "asset_group", ag["id"])
+
+
+@router.post("/asset-groups:batchCreate", response_model=AssetGroupBatchResponse, summary="Create asset groups in one batch")
+def batch_create_asset_groups(body: AssetGroupBatchCreateBody):
+    return run_batch(STORE, "asset_group", body.items, _new_asset_group, atomic=body.atomic, key="assetGroup", created=True)
+
+
+@router.post("/asset-groups:batchUpdate", response_model=AssetGroupBatchResponse, summary="Update asset groups in one batch")
+def batch_update_asset_groups(body: AssetGroupBatchUpdateBody):
+    def prepare(item: AssetGroupBatchUpdateItem) -> dict:
+        return _updated(_asset_group_for_update(item.id), item)
+
+    return run_batch(STORE, "asset_group", body.items, prepare, atomic=body.atomic, key="assetGroup")
+
+
+@router.post("/asset-groups:batchArchive", response_model=AssetGroupBatchResponse, summary="Archive asset groups in one batch")
+def batch_archive_asset_groups(body: BatchArchiveBody):
+    return run_batch(STORE, "asset_group", body.ids, _archived, atomic=body.atomic, key="assetGroup", field="ids")
+
+
+@router.get("/asset-groups/{assetGroupId}", response_model=AssetGroupOut, summary="Get asset group")
+def get_asset_group(assetGroupId: str, request: Request, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     ag = STORE.asset_groups.get(assetGroupId)
     if not ag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asset group not found")
-    ag["archived"] = True
-    ag["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+    etag = entity_etag(ag)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, AssetGroupOut)
+    if mask is not None or fast_responses_enabled():
+        return entity_response("asset_group", ag, AssetGroupOut, headers={"ETag": etag}, mask=mask)
+    response.headers["ETag"] = etag
     return ag
+
+
+@router.patch("/asset-groups/{assetGroupId}", response_model=AssetGroupOut, summary="Update asset group")
+def update_asset_group(assetGroupId: str, body: AssetGroupUpdate, request: Request, response: Response):
+    with STORE.transaction():
+        ag = _asset_group_for_update(assetGroupId)
+        check_if_match(request, ag)
+        STORE.save("asset_group", _updated(ag, body))
+        ag = recompute_entity(STORE, "asset_group", assetGroupId)
+    set_etag(response, ag)
+    return ag
+
+
+@router.post("/asset-groups/{assetGroupId}:archive", response_model=AssetGroupOut, summary="Archive asset group")
+def archive_asset_group(assetGroupId: str):
+    with STORE.transaction():
+        STORE.save("asset_group", _archived(assetGroupId))
+        return recompute_entity(STORE, "asset_group", assetGroupId)
@@ -1,33 +1,49 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from starlette import status
 
+from api.core.batch import run_batch
+from api.core.etags import check_if_match, collection_etag, entity_etag, not_modified, set_etag
+from api.core.fastjson import entity_response, fast_responses_enabled, list_response
+from api.core.fields import FIELDS_DESCRIPTION, parse_fields
 from api.core.ids import new_id
+from api.core.paging import ListQuery, list_query, select
 from api.core.store import STORE
-from api.core.serving import recompute_all
-from api.models.campaign import CampaignCreate, CampaignCreateOut, CampaignOut, CampaignUpdate
+from api.core.serving import recompute_entity
+from api.core.tree import register_node, tree_response
+from api.models.batch import BatchArchiveBody
+from api.models.campaign import (
+    CampaignBatchCreateBody,
+    CampaignBatchResponse,
+    CampaignBatchUpdateBody,
+    CampaignBatchUpdateItem,
+    CampaignCreate,
+    CampaignCreateOut,
+    CampaignOut,
+    CampaignUpdate,
+    ListCampaignsResponse,
+)
 
 router = APIRouter()
 
+register_node("campaign", CampaignOut)
 
-@router.get("/campaigns", response_model=List[CampaignOut], summary="List campaigns")
-def list_campaigns():
-    return list(STORE.campaigns.values())
 
+# Validation and edits shared by the single-entity and batch endpoints. They build the entity to save
+# (raising HTTPException when the input is invalid) but do not save it; callers run them in STORE.transaction().
 
-@router.post("/campaigns", response_model=CampaignCreateOut, summary="Create campaign", status_code=status.HTTP_201_CREATED)
-def create_campaign(body: CampaignCreate):
+
+def _new_campaign(body: CampaignCreate) -> dict:
     if body.advertiserId not in STORE.advertisers:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="advertiserId does not exist")
 
     now = datetime.now(timezone.utc)
-    cid = new_id("campaign")
-    campaign = {
-        "id": cid,
+    return {
+        "id": new_id("campaign"),
         "advertiserId": body.advertiserId,
         "name": body.name,
         "startDate": body.startDate,
@@ -40,25 +56,16 @@ def create_campaign(body: CampaignCreate):
         "servingStatus": "NOT_SERVING",
         "servingReasons": [],
     }
-    STORE.campaigns[cid] = campaign
-    recompute_all(STORE)
-    return campaign
 
 
-@router.get("/campaigns/{campaignId}", response_model=CampaignOut, summary="Get campaign")
-def get_campaign(campaignId: str):
-    c = STORE.campaigns.get(campaignId)
+def _campaign_for_update(campaignId: str) -> dict:
+    c = STORE.for_update("campaign", campaignId)
     if not c:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
     return c
 
 
-@router.patch("/campaigns/{campaignId}", response_model=CampaignOut, summary="Update campaign")
-def update_campaign(campaignId: str, body: CampaignUpdate):
-    c = STORE.campaigns.get(campaignId)
-    if not c:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
-
+def _updated(c: dict, body: CampaignUpdate) -> dict:
     if body.advertiserId is not None:
         if body.advertiserId not in STORE.advertisers:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="advertiserId does not exist")
@@ -73,38 +80,132 @@ def update_campaign(campaignId: str, body: CampaignUpdate):
         c["targeting"] = body.targeting
 
     c["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
     return c
 
 
-@router.post("/campaigns/{campaignId}:activate", response_model=CampaignOut, summary="Activate campaign")
-def activate_campaign(campaignId: str):
-    c = STORE.campaigns.get(campaignId)
-    if not c:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
-    c["status"] = "ACTIVE"
+def _archived(campaignId: str) -> dict:
+    c = _campaign_for_update(campaignId)
+    c["archived"] = True
     c["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
     return c
 
 
-@router.post("/campaigns/{campaignId}:deactivate", response_model=CampaignOut, summary="Deactivate campaign")
-def deactivate_campaign(campaignId: str):
+@router.get("/campaigns", response_model=Union[List[CampaignOut], ListCampaignsResponse], summary="List campaigns")
+def list_campaigns(
+    request: Request,
+    response: Response,
+    advertiserId: Optional[str] = None,
+    status: Optional[str] = None,
+    query: ListQuery = Depends(list_query),
+):
+    if status is not None:
+        query.filters["status"] = status
+    etag = collection_etag(STORE, request, "campaign")
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(query.fields, CampaignOut)
+    campaigns, next_token = select(STORE, "campaign", query, parent_id=advertiserId or None)
+    if mask is not None or fast_responses_enabled():
+        return list_response(
+            "campaign", campaigns, CampaignOut, envelope="campaigns" if query.paginated else None, next_page_token=next_token, mask=mask,
+            headers={"ETag": etag},
+        )
+    response.headers["ETag"] = etag
+    if query.paginated:
+        return {"campaigns": campaigns, "nextPageToken": next_token}
+    return campaigns
+
+
+@router.post("/campaigns", response_model=CampaignCreateOut, summary="Create campaign", status_code=status.HTTP_201_CREATED)
+def create_campaign(body: CampaignCreate):
+    with STORE.transaction():
+        campaign = _new_campaign(body)
+        STORE.save("campaign", campaign)
+        return recompute_entity(STORE, "campaign", campaign["id"])
+
+
+@router.post("/campaigns:batchCreate", response_model=CampaignBatchResponse, summary="Create campaigns in one batch")
+def batch_create_campaigns(body: CampaignBatchCreateBody):
+    return run_batch(STORE, "campaign", body.items, _new_campaign, atomic=body.atomic, key="campaign", created=True)
+
+
+@router.post("/campaigns:batchUpdate", response_model=CampaignBatchResponse, summary="Update campaigns in one batch")
+def batch_update_campaigns(body: CampaignBatchUpdateBody):
+    def prepare(item: CampaignBatchUpdateItem) -> dict:
+        return _updated(_campaign_for_update(item.id), item)
+
+    return run_batch(STORE, "campaign", body.items, prepare, atomic=body.atomic, key="campaign")
+
+
+@router.post("/campaigns:batchArchive", response_model=CampaignBatchResponse, summary="Archive campaigns in one batch")
+def batch_archive_campaigns(body: BatchArchiveBody):
+    return run_batch(STORE, "campaign", body.ids, _archived, atomic=body.atomic, key="campaign", field="ids")
+
+
+@router.get("/campaigns/{campaignId}", response_model=CampaignOut, summary="Get campaign")
+def get_campaign(campaignId: str, request: Request, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     c = STORE.campaigns.get(campaignId)
     if not c:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
-    c["status"] = "INACTIVE"
-    c["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+    etag = entity_etag(c)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, CampaignOut)
+    if mask is not None or fast_responses_enabled():
+        return entity_response("campaign", c, CampaignOut, headers={"ETag": etag}, mask=mask)
+    response.headers["ETag"] = etag
     return c
 
 
-@router.post("/campaigns/{campaignId}:archive", response_model=CampaignOut, summary="Archive campaign")
-def archive_campaign(campaignId: str):
+@router.get("/campaigns/{campaignId}/tree", summary="Get campaign with its asset groups and ads nested")
+def get_campaign_tree(
+    campaignId: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to keep on every node (id is always kept)"),
+    archived: Optional[bool] = Query(None, description="Only include descendants with this archived state"),
+    depth: Optional[int] = Query(None, ge=0, le=2, description="Levels of children to include (default: all)"),
+):
     c = STORE.campaigns.get(campaignId)
     if not c:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found")
-    c["archived"] = True
-    c["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+    return tree_response(STORE, request, "campaign", c, fields, archived, depth)
+
+
+@router.patch("/campaigns/{campaignId}", response_model=CampaignOut, summary="Update campaign")
+def update_campaign(campaignId: str, body: CampaignUpdate, request: Request, response: Response):
+    with STORE.transaction():
+        c = _campaign_for_update(campaignId)
+        check_if_match(request, c)
+        STORE.save("campaign", _updated(c, body))
+        c = recompute_entity(STORE, "campaign", campaignId)
+    set_etag(response, c)
     return c
+
+
+@router.post("/campaigns/{campaignId}:activate", response_model=CampaignOut, summary="Activate campaign")
+def activate_campaign(campaignId: str):
+    with STORE.transaction():
+        c = _campaign_for_update(campaignId)
+        c["status"] = "ACTIVE"
+        c["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("campaign", c)
+        return recompute_entity(STORE, "campaign", campaignId)
+
+
+@router.post("/campaigns/{campaignId}:deactivate", response_model=CampaignOut, summary="Deactivate campaign")
+def deactivate_campaign(campaignId: str):
+    with STORE.transaction():
+        c = _campaign_for_update(campaignId)
+        c["status"] = "INACTIVE"
+        c["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("campaign", c)
+        return recompute_entity(STORE, "campaign", campaignId)
+
+
+@router.post("/campaigns/{campaignId}:archive", response_model=CampaignOut, summary="Archive campaign")
+def archive_campaign(campaignId: str):
+    with STORE.transaction():
+        STORE.save("campaign", _archived(campaignId))
+        return recompute_entity(STORE, "campaign", campaignId)
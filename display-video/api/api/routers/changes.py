@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from api.core.changes import change_events, changes_body, parse_types, read_changes
+from api.core.errors import ProblemError
+from api.core.store import STORE
+from api.models.change import CHANGES_DEFAULT_LIMIT, CHANGES_MAX_LIMIT, ChangesResponse
+
+router = APIRouter()
+
+TYPES_DESCRIPTION = "Comma-separated entity types to include (partner, advertiser, campaign, asset_group, ad); default all"
+
+
+@router.get("/changes", response_model=ChangesResponse, summary="List changes after a change-log position")
+def list_changes(
+    since: Optional[int] = Query(None, ge=0, description="Seq to continue from (a previous nextSince); omit to get the latest seq"),
+    limit: int = Query(CHANGES_DEFAULT_LIMIT, ge=1, le=CHANGES_MAX_LIMIT),
+    types: Optional[str] = Query(None, description=TYPES_DESCRIPTION),
+):
+    wanted = parse_types(types)
+    if since is None:
+        return Response(content=changes_body([], STORE.last_change()), media_type="application/json")
+    entries, next_since = read_changes(STORE, since, limit, wanted)
+    return Response(content=changes_body(entries, next_since), media_type="application/json")
+
+
+@router.get("/changes/stream", response_class=StreamingResponse, summary="Stream changes as server-sent events")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Seq to continue from; default: only changes from now on"),
+    types: Optional[str] = Query(None, description=TYPES_DESCRIPTION),
+):
+    wanted = parse_types(types)
+    # An EventSource reconnecting after a dropped connection sends the id of the last event it received.
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise ProblemError(
+                status.HTTP_400_BAD_REQUEST,
+                "Last-Event-ID must be a change seq",
+                [{"field": "Last-Event-ID", "message": "Expected a non-negative integer."}],
+            )
+        since = int(last_event_id)
+    if since is None:
+        since = STORE.last_change()
+    else:
+        # Fail an unknown position with a plain 410 before the stream starts.
+        await run_in_threadpool(read_changes, STORE, since, 1, wanted)
+    return StreamingResponse(
+        change_events(STORE, request, since, wanted),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
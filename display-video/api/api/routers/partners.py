@@ -1,68 +1,99 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from starlette import status
 
+from api.core.etags import check_if_match, collection_etag, entity_etag, not_modified, set_etag
+from api.core.fastjson import entity_response, fast_responses_enabled, list_response
+from api.core.fields import FIELDS_DESCRIPTION, parse_fields
 from api.core.ids import new_id
+from api.core.paging import ListQuery, list_query, select
 from api.core.store import STORE
-from api.core.serving import recompute_all
-from api.models.partner import PartnerCreate, PartnerOut, PartnerUpdate
+from api.core.serving import recompute_entity
+from api.models.partner import ListPartnersResponse, PartnerCreate, PartnerOut, PartnerUpdate
 
 router = APIRouter()
 
 
-@router.get("/partners", response_model=List[PartnerOut], summary="List partners")
-def list_partners():
-    return list(STORE.partners.values())
+@router.get("/partners", response_model=Union[List[PartnerOut], ListPartnersResponse], summary="List partners")
+def list_partners(request: Request, response: Response, query: ListQuery = Depends(list_query)):
+    etag = collection_etag(STORE, request, "partner")
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(query.fields, PartnerOut)
+    partners, next_token = select(STORE, "partner", query)
+    if mask is not None or fast_responses_enabled():
+        return list_response(
+            "partner", partners, PartnerOut, envelope="partners" if query.paginated else None, next_page_token=next_token, mask=mask,
+            headers={"ETag": etag},
+        )
+    response.headers["ETag"] = etag
+    if query.paginated:
+        return {"partners": partners, "nextPageToken": next_token}
+    return partners
 
 
 @router.post("/partners", response_model=PartnerOut, summary="Create partner", status_code=status.HTTP_201_CREATED)
 def create_partner(body: PartnerCreate):
-    now = datetime.now(timezone.utc)
-    pid = new_id("partner")
-    partner = {
-        "id": pid,
-        "name": body.name,
-        "archived": False,
-        "createdAt": now,
-        "updatedAt": now,
-        "servingStatus": "SERVING",
-        "servingReasons": [],
-    }
-    STORE.partners[pid] = partner
-    recompute_all(STORE)
-    return partner
+    with STORE.transaction():
+        now = datetime.now(timezone.utc)
+        pid = new_id("partner")
+        partner = {
+            "id": pid,
+            "name": body.name,
+            "archived": False,
+            "createdAt": now,
+            "updatedAt": now,
+            "servingStatus": "SERVING",
+            "servingReasons": [],
+        }
+        STORE.save("partner", partner)
+        return recompute_entity(STORE, "partner", pid)
 
 
 @router.get("/partners/{partnerId}", response_model=PartnerOut, summary="Get partner")
-def get_partner(partnerId: str):
+def get_partner(partnerId: str, request: Request, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     p = STORE.partners.get(partnerId)
     if not p:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partner not found")
+    etag = entity_etag(p)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    mask = parse_fields(fields, PartnerOut)
+    if mask is not None or fast_responses_enabled():
+        return entity_response("partner", p, PartnerOut, headers={"ETag": etag}, mask=mask)
+    response.headers["ETag"] = etag
     return p
 
 
 @router.patch("/partners/{partnerId}", response_model=PartnerOut, summary="Update partner")
-def update_partner(partnerId: str, body: PartnerUpdate):
-    p = STORE.partners.get(partnerId)
-    if not p:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partner not found")
-    if body.name is not None:
-        p["name"] = body.name
-    p["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
+def update_partner(partnerId: str, body: PartnerUpdate, request: Request, response: Response):
+    with STORE.transaction():
+        p = STORE.for_update("partner", partnerId)
+        if not p:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partner not found")
+        check_if_match(request, p)
+        if body.name is not None:
+            p["name"] = body.name
+        p["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("partner", p)
+        p = recompute_entity(STORE, "partner", partnerId)
+    set_etag(response, p)
     return p
 
 
 @router.post("/partners/{partnerId}:archive", response_model=PartnerOut, summary="Archive partner")
 def archive_partner(partnerId: str):
-    p = STORE.partners.get(partnerId)
-    if not p:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partner not found")
-    p["archived"] = True
-    p["updatedAt"] = datetime.now(timezone.utc)
-    recompute_all(STORE)
-    return p
+    with STORE.transaction():
+        p = STORE.for_update("partner", partnerId)
+        if not p:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Partner not found")
+        p["archived"] = True
+        p["updatedAt"] = datetime.now(timezone.utc)
+        STORE.save("partner", p)
+        return recompute_entity(STORE, "partner", partnerId)
@@ -1,78 +1,114 @@
 from __future__ import annotations
 
-import hashlib
-import random
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+import asyncio
+from concurrent.futures import Future
+from functools import partial
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from starlette import status
-
-from api.models.report import ReportQuery, ReportResponse
+from starlette.concurrency import run_in_threadpool
+
+from api.core.errors import ProblemError
+from api.core.facts import FACTS
+from api.core.ingest import INGEST_CONCURRENCY, EventIngest, ingest_format
+from api.core.report_cache import REPORT_CACHE, cached_report
+from api.core.report_engine import parse_query
+from api.core.report_jobs import EXPORT_MEDIA_TYPES, REPORT_JOBS, ReportJob, export_chunks
+from api.core.store import STORE
+from api.models.report import (
+    ExportFormat,
+    IngestResponse,
+    ReportCacheStats,
+    ReportExportQuery,
+    ReportJobOut,
+    ReportQuery,
+    ReportResponse,
+)
 
 router = APIRouter()
 
-
-def _seed_from_query(q: ReportQuery) -> int:
-    raw = f"{q.startDate}|{q.endDate}|{q.timeGrain}|{q.metrics}|{q.dimensions}|{sorted(q.filters.items())}|{q.limit}|{q.offset}"
-    h = hashlib.sha256(raw.encode("utf-8")).hexdigest()
-    return int(h[:16], 16)
-
-
-def _rand_metric(rng: random.Random, metric: str) -> int:
-    if metric == "IMPRESSIONS":
-        return rng.randint(1_000, 100_000)
-    if metric == "CLICKS":
-        return rng.randint(0, 5_000)
-    if metric == "SPEND":
-        return rng.randint(100, 50_000)  # cents
-    return rng.randint(0, 1000)
-
-
-def _make_row(rng: random.Random, q: ReportQuery, date_value: Optional[str] = None) -> Dict[str, Any]:
-    row: Dict[str, Any] = {}
-    for d in q.dimensions:
-        if d == "DATE":
-            row["date"] = date_value or q.startDate
-        elif d == "CAMPAIGN_ID":
-            row["campaignId"] = f"campaign_{rng.randint(1, 50)}"
-        elif d == "ASSET_GROUP_ID":
-            row["assetGroupId"] = f"asset_group_{rng.randint(1, 100)}"
-        elif d == "AD_ID":
-            row["adId"] = f"ad_{rng.randint(1, 200)}"
-
-    for m in q.metrics:
-        key = m.lower()
-        row[key] = _rand_metric(rng, m)
-    return row
+_INGEST_SLOTS = asyncio.Semaphore(INGEST_CONCURRENCY)
 
 
 @router.post("/reports/query", response_model=ReportResponse, summary="Query reporting (rows + totals + timeSeries)", status_code=status.HTTP_200_OK)
 def query_report(body: ReportQuery):
-    seed = _seed_from_query(body)
-    rng = random.Random(seed)
-
-    rows: List[Dict[str, Any]] = []
-    for _ in range(body.limit):
-        rows.append(_make_row(rng, body))
-
-    totals: Dict[str, Any] = {}
-    for m in body.metrics:
-        key = m.lower()
-        totals[key] = sum(r.get(key, 0) for r in rows)
-
-    time_series: Optional[List[Dict[str, Any]]] = None
-    if body.timeGrain != "NONE":
-        # Deterministic pseudo timeSeries: 7 points
-        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
-        step = {"DAY": 1, "WEEK": 7, "MONTH": 30}[body.timeGrain]
-        time_series = []
-        for i in range(7):
-            dt = base + timedelta(days=i * step)
-            date_str = dt.date().isoformat()
-            point = _make_row(rng, ReportQuery(**body.model_dump(exclude={"limit", "offset"})), date_value=date_str)
-            # Ensure it always has a date key when timeSeries is present
-            point.setdefault("date", date_str)
-            time_series.append(point)
-
-    return {"rows": rows, "totals": totals, "timeSeries": time_series}
+    content, hit = cached_report(REPORT_CACHE, FACTS, body)
+    return Response(content=content, media_type="application/json", headers={"X-Cache": "hit" if hit else "miss"})
+
+
+@router.get("/reports/cache", response_model=ReportCacheStats, summary="Report query cache statistics (this process)")
+def report_cache_stats():
+    return REPORT_CACHE.stats()
+
+
+@router.post("/reports/jobs", response_model=ReportJobOut, status_code=status.HTTP_202_ACCEPTED, summary="Start a report export job (every row, no limit)")
+def create_report_job(body: ReportExportQuery):
+    parse_query(FACTS, body)  # an invalid query is a 400 now rather than a FAILED job
+    job = ReportJob(body)
+    REPORT_JOBS.register(job)
+    future = REPORT_JOBS.submit(_run_report_job, job)
+    future.add_done_callback(partial(_report_job_done, job))
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=ReportJobOut(**job.snapshot(REPORT_JOBS.ttl_seconds)).model_dump(mode="json"),
+        headers={"Location": f"/v1/reports/jobs/{job.id}"},
+    )
+
+
+@router.get("/reports/jobs/{jobId}", response_model=ReportJobOut, summary="Get report export job status")
+def get_report_job(jobId: str):
+    return ReportJobOut(**_report_job(jobId).snapshot(REPORT_JOBS.ttl_seconds))
+
+
+@router.get("/reports/jobs/{jobId}/result", response_class=StreamingResponse, summary="Download a report export (CSV or NDJSON, streamed)")
+def get_report_job_result(jobId: str, format: ExportFormat = Query("csv", description="csv (with a header line) or ndjson")):
+    job = _report_job(jobId)
+    result = job.result
+    if result is None:
+        detail = f"Report job is {job.status}" + (f": {job.error}" if job.error else "; poll it until it has SUCCEEDED")
+        raise ProblemError(
+            status.HTTP_409_CONFLICT,
+            detail,
+            title="Report Not Ready",
+            code="REPORT_JOB_NOT_READY",
+            type_="https://example.com/problems/report-job-not-ready",
+        )
+    return StreamingResponse(
+        export_chunks(FACTS, result, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{job.id}.{format}"'},
+    )
+
+
+def _report_job(job_id: str) -> ReportJob:
+    job = REPORT_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report job not found")
+    return job
+
+
+def _run_report_job(job: ReportJob) -> None:
+    try:
+        job.run(FACTS)
+    except ProblemError as e:
+        job.fail(e.detail)
+    except Exception as e:
+        job.fail(str(e) or type(e).__name__)
+
+
+def _report_job_done(job: ReportJob, future: Future) -> None:
+    if future.cancelled():
+        job.fail("Cancelled before it started (server shutting down).")
+
+
+@router.post("/reports/events:ingest", response_model=IngestResponse, summary="Ingest delivery events (NDJSON or CSV body)")
+async def ingest_events(request: Request):
+    ingest = EventIngest(FACTS, STORE, ingest_format(request.headers.get("content-type")))
+    # Waiting for a slot leaves the body unread, and each full batch is appended before the next chunk is read,
+    # so a fast sender is held back by TCP flow control instead of piling up in memory.
+    async with _INGEST_SLOTS:
+        async for chunk in request.stream():
+            if ingest.write(chunk):
+                await run_in_threadpool(ingest.flush)
+        return await run_in_threadpool(ingest.close)
@@ -7,8 +7,11 @@ from __future__ import annotations
 import re
 import struct
 import zipfile
-from io import BytesIO
-from typing import Any, Dict, List, Optional, Tuple
+import zlib
+from collections import deque
+from concurrent.futures import Executor, Future
+from functools import partial
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
 
 # PRD constants
 DISPLAY_IMAGE_MAX_BYTES = 5 * 1024 * 1024  # 5 MB
@@ -192,10 +195,14 @@ def get_image_dimensions_from_bytes(data: bytes) -> Optional[Tuple[int, int]]:
 
 
 def extract_display_image_metadata(data: bytes, content_type: str, filename: str) -> Dict[str, Any]:
-    dims = get_image_dimensions_from_bytes(data)
+    return display_image_metadata(content_type, len(data), get_image_dimensions_from_bytes(data))
+
+
+def display_image_metadata(content_type: str, size: int, dims: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+    """Display image metadata from already-known size and dimensions (e.g. sniffed during bulk validation)."""
     meta: Dict[str, Any] = {
         "fileType": content_type,
-        "fileSizeBytes": len(data),
+        "fileSizeBytes": size,
         "assetUrl": None,
     }
     if dims:
@@ -204,13 +211,13 @@ def extract_display_image_metadata(data: bytes, content_type: str, filename: str
     return meta
 
 
-def extract_video_metadata_demo(data: bytes, filename: str) -> Dict[str, Any]:
-    """Demo: no real codec/duration parsing; placeholders."""
+def extract_video_metadata_demo(size: int, filename: str) -> Dict[str, Any]:
+    """Demo: no real codec/duration parsing; placeholders. Only the byte size is needed, so callers can stream."""
     return {
         "duration": None,
         "bitrate": "—",
         "resolution": "—",
-        "fileSizeBytes": len(data),
+        "fileSizeBytes": size,
         "assetUrl": None,
         "codecNote": "Codec validation is best-effort in demo.",
     }
@@ -243,123 +250,234 @@ def _parse_manifest_csv(csv_bytes: bytes) -> List[Dict[str, Any]]:
     return rows
 
 
-def parse_bulk_display_zip(zip_bytes: bytes) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+# Image dimension sniffing reads the member head progressively; PNG/GIF resolve from the first bytes,
+# JPEG only needs to reach its SOF marker.
+IMAGE_SNIFF_INITIAL_BYTES = 64 * 1024
+
+BulkSource = Union[str, BinaryIO]
+
+# What reading a damaged member raises: bad CRC or header (BadZipFile), corrupt deflate data, truncated data.
+ZIP_READ_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+INVALID_ZIP_ERROR = {"field": "file", "message": "Invalid ZIP file."}
+VERIFY_CHUNK_BYTES = 1024 * 1024
+
+
+def verify_member(fh: BinaryIO) -> None:
+    """Read the rest of a member so its CRC is checked; raises one of ZIP_READ_ERRORS when it is damaged."""
+    while fh.read(VERIFY_CHUNK_BYTES):
+        pass
+
+
+def sniff_image_dimensions(fh: BinaryIO, max_bytes: int) -> Optional[Tuple[int, int]]:
+    """Best-effort dimensions from a stream without reading more than needed (at most max_bytes)."""
+    head = fh.read(min(IMAGE_SNIFF_INITIAL_BYTES, max_bytes))
+    while True:
+        dims = get_image_dimensions_from_bytes(head)
+        if dims or head[:2] not in (b"\xff\xd8", b"\xff\xd9") or len(head) >= max_bytes:
+            return dims
+        more = fh.read(min(len(head), max_bytes - len(head)))
+        if not more:
+            return dims
+        head += more
+
+
+def _read_manifest(zf: zipfile.ZipFile) -> Dict[str, Dict[str, Any]]:
+    for n in zf.namelist():
+        if n.lower().endswith("manifest.csv"):
+            rows = _parse_manifest_csv(zf.read(n))
+            # Build lookup by filename (key = basename for matching)
+            return {r["filename"].lstrip("./"): r for r in rows}
+    return {}
+
+
+def _bulk_members(zf: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    return [i for i in zf.infolist() if not i.filename.endswith("/") and not i.filename.lower().endswith("manifest.csv")]
+
+
+def _member_tags(manifest_by_name: Dict[str, Dict[str, Any]], name: str) -> List[str]:
+    base = name.split("/")[-1] if "/" in name else name
+    return manifest_by_name.get(base, {}).get("trackingTags", [])[:5]
+
+
+# Members per pool task: each task reopens the archive, so batching amortizes reading the zip directory.
+BULK_BATCH_SIZE = 16
+
+
+def check_display_batch(
+    zip_path: str, batch: List[Tuple[str, List[str]]], verify: bool = False
+) -> List[Dict[str, Any]]:
+    """Pool task: check a run of (member name, tracking tags) against its own handle on the archive."""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        return [check_display_member(zf, zf.getinfo(name), tags, verify) for name, tags in batch]
+
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _map_ordered(
+    executor: Executor,
+    fn: Callable[..., List[Dict[str, Any]]],
+    arg: Any,
+    batches: Iterable[Any],
+    max_in_flight: int,
+    collected: Callable[[int], None],
+) -> List[Dict[str, Any]]:
+    """Run fn(arg, batch) on the executor with at most max_in_flight batches outstanding; results keep batch order."""
+    out: List[Dict[str, Any]] = []
+    pending: Deque[Future] = deque()
+    try:
+        for batch in batches:
+            if len(pending) >= max_in_flight:
+                out.extend(pending.popleft().result())
+                collected(len(out))
+            pending.append(executor.submit(fn, arg, batch))
+        while pending:
+            out.extend(pending.popleft().result())
+            collected(len(out))
+    finally:
+        for f in pending:
+            f.cancel()
+    return out
+
+
+def parse_bulk_display_zip(
+    source: BulkSource,
+    executor: Optional[Executor] = None,
+    max_in_flight: int = 8,
+    on_progress: Optional[ProgressCallback] = None,
+    verify: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
     """
-    Parse bulk display zip (images + optional manifest.csv).
-    Returns (parsed_items, global_errors). Each item: {filename, bytes, content_type, trackingTags, errors[]}.
+    Parse bulk display zip (images + optional manifest.csv) from a path or seekable file, one member at a time.
+    Sizes come from the zip directory and dimensions from the member head, so payloads are never held. With verify,
+    each member is also read to its end so a damaged one fails validation; otherwise whoever reads the payloads next
+    (bulk creation, which streams them into the blob store) has to handle ZIP_READ_ERRORS. With an executor (and a
+    path source), members are checked in batches on the pool, at most max_in_flight batches at once; items stay in
+    zip order either way. on_progress(done, total) is called as members are checked.
+    Returns (parsed_items, global_errors). Each item: {filename, member, size, contentType, width, height,
+    trackingTags, errors[]}.
     """
     global_errors: List[Dict[str, str]] = []
     parsed: List[Dict[str, Any]] = []
-    manifest_rows: List[Dict[str, Any]] = []
+    inline = executor is None or not isinstance(source, str)
     try:
-        with zipfile.ZipFile(BytesIO(zip_bytes), "r") as zf:
-            names = zf.namelist()
-            manifest_data = None
-            for n in names:
-                if n.lower().endswith("manifest.csv"):
-                    manifest_data = zf.read(n)
-                    break
-            if manifest_data is not None:
-                manifest_rows = _parse_manifest_csv(manifest_data)
-            # Build lookup by filename (key = basename for matching)
-            manifest_by_name = {r["filename"].lstrip("./"): r for r in manifest_rows}
-
-            for name in names:
-                if name.endswith("/") or name.lower().endswith("manifest.csv"):
-                    continue
-                data = zf.read(name)
-                base = name.split("/")[-1] if "/" in name else name
-                tracking_tags = []
-                if base in manifest_by_name:
-                    tracking_tags = manifest_by_name[base].get("trackingTags", [])[:5]
-                ext = base.rsplit(".", 1)[-1].lower() if "." in base else ""
-                ct = "image/png"
-                if ext in ("jpg", "jpeg"):
-                    ct = "image/jpeg"
-                elif ext == "png":
-                    ct = "image/png"
-                elif ext == "gif":
-                    ct = "image/gif"
-                elif ext == "tiff":
-                    ct = "image/tiff"
-                item_errors: List[Dict[str, str]] = []
-                dims = get_image_dimensions_from_bytes(data) if ext in DISPLAY_IMAGE_EXTENSIONS else None
-                w, h = (dims[0], dims[1]) if dims else (None, None)
-                ok, errs = validate_display_image(ct, base, len(data), w, h)
-                if not ok:
-                    item_errors.extend(errs)
-                ok2, errs2 = validate_tracking_tags(tracking_tags)
-                if not ok2:
-                    item_errors.extend([{"field": f"{base}:tracking", "message": e.get("message", "")} for e in errs2])
-                parsed.append({
-                    "filename": base,
-                    "bytes": data,
-                    "contentType": ct,
-                    "trackingTags": tracking_tags,
-                    "errors": item_errors,
-                })
-    except zipfile.BadZipFile:
-        global_errors.append({"field": "file", "message": "Invalid ZIP file."})
+        with zipfile.ZipFile(source, "r") as zf:
+            manifest_by_name = _read_manifest(zf)
+            members = [(i.filename, _member_tags(manifest_by_name, i.filename)) for i in _bulk_members(zf)]
+            total = len(members)
+            progress = (lambda done: on_progress(done, total)) if on_progress else (lambda done: None)
+            progress(0)
+            if inline:
+                for name, tags in members:
+                    parsed.append(check_display_member(zf, zf.getinfo(name), tags, verify))
+                    progress(len(parsed))
+        if not inline:
+            batches = (members[i:i + BULK_BATCH_SIZE] for i in range(0, len(members), BULK_BATCH_SIZE))
+            task = partial(check_display_batch, verify=verify)
+            parsed = _map_ordered(executor, task, source, batches, max_in_flight, progress)
+    except ZIP_READ_ERRORS:
+        global_errors.append(dict(INVALID_ZIP_ERROR))
     except Exception as e:
         global_errors.append({"field": "file", "message": str(e)})
     return parsed, global_errors
 
 
-def parse_bulk_video_zip(zip_bytes: bytes) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+def check_display_member(
+    zf: zipfile.ZipFile, info: zipfile.ZipInfo, tracking_tags: List[str], verify: bool = False
+) -> Dict[str, Any]:
+    name = info.filename
+    base = name.split("/")[-1] if "/" in name else name
+    ext = base.rsplit(".", 1)[-1].lower() if "." in base else ""
+    ct = "image/png"
+    if ext in ("jpg", "jpeg"):
+        ct = "image/jpeg"
+    elif ext == "png":
+        ct = "image/png"
+    elif ext == "gif":
+        ct = "image/gif"
+    elif ext == "tiff":
+        ct = "image/tiff"
+    item_errors: List[Dict[str, str]] = []
+    dims = None
+    if ext in DISPLAY_IMAGE_EXTENSIONS or verify:
+        with zf.open(info) as fh:
+            if ext in DISPLAY_IMAGE_EXTENSIONS:
+                dims = sniff_image_dimensions(fh, min(info.file_size, DISPLAY_IMAGE_MAX_BYTES))
+            if verify:
+                verify_member(fh)
+    w, h = (dims[0], dims[1]) if dims else (None, None)
+    ok, errs = validate_display_image(ct, base, info.file_size, w, h)
+    if not ok:
+        item_errors.extend(errs)
+    ok2, errs2 = validate_tracking_tags(tracking_tags)
+    if not ok2:
+        item_errors.extend([{"field": f"{base}:tracking", "message": e.get("message", "")} for e in errs2])
+    return {
+        "filename": base,
+        "member": name,
+        "size": info.file_size,
+        "contentType": ct,
+        "width": w,
+        "height": h,
+        "trackingTags": tracking_tags,
+        "errors": item_errors,
+    }
+
+
+def parse_bulk_video_zip(source: BulkSource, verify: bool = False) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
     """
-    Parse bulk video zip (mp4s + optional manifest.csv).
-    Returns (parsed_items, global_errors). Each item: {filename, bytes, content_type, trackingTags, errors[]}.
+    Parse bulk video zip (mp4s + optional manifest.csv) from a path or seekable file. Validation only needs
+    the zip directory entry, so member payloads are not read (and there is nothing worth fanning out) unless verify
+    asks for each to be read through, as parse_bulk_display_zip does.
+    Returns (parsed_items, global_errors). Each item: {filename, member, size, contentType, trackingTags, errors[]}.
     """
     global_errors: List[Dict[str, str]] = []
     parsed: List[Dict[str, Any]] = []
     try:
-        with zipfile.ZipFile(BytesIO(zip_bytes), "r") as zf:
-            names = zf.namelist()
-            manifest_data = None
-            for n in names:
-                if n.lower().endswith("manifest.csv"):
-                    manifest_data = zf.read(n)
-                    break
-            manifest_rows = _parse_manifest_csv(manifest_data) if manifest_data else []
-            manifest_by_name = {r["filename"].lstrip("./"): r for r in manifest_rows}
-
-            for name in names:
-                if name.endswith("/") or name.lower().endswith("manifest.csv"):
-                    continue
-                data = zf.read(name)
-                base = name.split("/")[-1] if "/" in name else name
-                if not base.lower().endswith(".mp4"):
-                    parsed.append({
-                        "filename": base,
-                        "bytes": data,
-                        "contentType": "application/octet-stream",
-                        "trackingTags": [],
-                        "errors": [{"field": "file", "message": "Only .mp4 files allowed in video bulk upload."}],
-                    })
-                    continue
-                tracking_tags = manifest_by_name.get(base, {}).get("trackingTags", [])[:5]
-                ct = "video/mp4"
-                item_errors: List[Dict[str, str]] = []
-                ok, errs = validate_video_file(base, ct, len(data))
-                if not ok:
-                    item_errors.extend(errs)
-                ok2, errs2 = validate_tracking_tags(tracking_tags)
-                if not ok2:
-                    item_errors.extend([{"field": f"{base}:tracking", "message": e.get("message", "")} for e in errs2])
-                parsed.append({
-                    "filename": base,
-                    "bytes": data,
-                    "contentType": ct,
-                    "trackingTags": tracking_tags,
-                    "errors": item_errors,
-                })
-    except zipfile.BadZipFile:
-        global_errors.append({"field": "file", "message": "Invalid ZIP file."})
+        with zipfile.ZipFile(source, "r") as zf:
+            manifest_by_name = _read_manifest(zf)
+            for info in _bulk_members(zf):
+                parsed.append(check_video_member(info, _member_tags(manifest_by_name, info.filename)))
+                if verify:
+                    with zf.open(info) as fh:
+                        verify_member(fh)
+    except ZIP_READ_ERRORS:
+        global_errors.append(dict(INVALID_ZIP_ERROR))
     except Exception as e:
         global_errors.append({"field": "file", "message": str(e)})
     return parsed, global_errors
 
 
+def check_video_member(info: zipfile.ZipInfo, tracking_tags: List[str]) -> Dict[str, Any]:
+    name = info.filename
+    base = name.split("/")[-1] if "/" in name else name
+    if not base.lower().endswith(".mp4"):
+        return {
+            "filename": base,
+            "member": name,
+            "size": info.file_size,
+            "contentType": "application/octet-stream",
+            "trackingTags": [],
+            "errors": [{"field": "file", "message": "Only .mp4 files allowed in video bulk upload."}],
+        }
+    ct = "video/mp4"
+    item_errors: List[Dict[str, str]] = []
+    ok, errs = validate_video_file(base, ct, info.file_size)
+    if not ok:
+        item_errors.extend(errs)
+    ok2, errs2 = validate_tracking_tags(tracking_tags)
+    if not ok2:
+        item_errors.extend([{"field": f"{base}:tracking", "message": e.get("message", "")} for e in errs2])
+    return {
+        "filename": base,
+        "member": name,
+        "size": info.file_size,
+        "contentType": ct,
+        "trackingTags": tracking_tags,
+        "errors": item_errors,
+    }
+
+
 def generate_vast_wrapper_demo(
     content_url: str,
     tracking_tags: Optional[List[str]] = None,
@@ -0,0 +1,85 @@
+"""
+Wall-clock of bulk DISPLAY zip validation (dimension sniffing + checks) by worker count and executor kind.
+
+    cd api && python -m bench.bench_bulk_parse [--images 500] [--workers 1,2,4,8] [--executors thread,process]
+
+Images are JPEGs with large APP segments ahead of the frame header (EXIF/ICC-heavy exports), deflated, so each
+member costs real decompression and marker walking. "1 worker" is the inline path (DV_BULK_WORKERS=1).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from api.core.workers import make_executor
+from api.validators.ad_validator import parse_bulk_display_zip
+
+SIZES = [(300, 250), (336, 280), (300, 600), (1200, 628), (1080, 1080), (1080, 1920)]
+
+
+def jpeg(width: int, height: int, rng: random.Random) -> bytes:
+    segments = b""
+    for _ in range(2):
+        body = bytes(rng.getrandbits(4) for _ in range(60000))  # compressible but not trivially so
+        segments += b"\xff\xe2" + (len(body) + 2).to_bytes(2, "big") + body
+    sof = b"\xff\xc0" + (17).to_bytes(2, "big") + b"\x08" + height.to_bytes(2, "big") + width.to_bytes(2, "big") + b"\0" * 10
+    return b"\xff\xd8" + segments + sof + b"\xff\xd9"
+
+
+def build_zip(path: str, n_images: int) -> None:
+    rng = random.Random(7)
+    # A handful of distinct payloads keeps generation fast; zip members are still compressed individually.
+    payloads = [jpeg(w, h, rng) for w, h in SIZES]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.csv", "Filename,tracking1\n" + "".join(f"img{i:04d}.jpg,https://t.example.com/{i}\n" for i in range(n_images)))
+        for i in range(n_images):
+            zf.writestr(f"img{i:04d}.jpg", payloads[i % len(payloads)])
+
+
+def run(path: str, kind: str, workers: int, repeat: int) -> float:
+    executor = make_executor(kind, workers) if workers > 1 else None
+    try:
+        if executor is not None:
+            parse_bulk_display_zip(path, executor, 2 * workers)  # warm up the pool (process spawn, imports)
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            parsed, errors = parse_bulk_display_zip(path, executor, 2 * workers)
+            best = min(best, time.perf_counter() - t0)
+            assert not errors and not any(p["errors"] for p in parsed), errors
+        return best
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", type=int, default=500)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--executors", default="thread,process")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    try:
+        build_zip(path, args.images)
+        print(f"{args.images} images, {os.path.getsize(path) / 1e6:.1f} MB zip, {os.cpu_count()} CPUs")
+        print(f"{'executor':>9} {'workers':>8} {'seconds':>9} {'images/s':>10} {'speedup':>8}")
+        for kind in args.executors.split(","):
+            baseline = None
+            for workers in (int(w) for w in args.workers.split(",")):
+                secs = run(path, kind, workers, args.repeat)
+                baseline = baseline or secs
+                print(f"{kind:>9} {workers:>8} {secs:>9.3f} {args.images / secs:>10.0f} {baseline / secs:>7.2f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Delivery-event ingestion throughput: the file loader (python -m api.core.ingest) and POST /v1/reports/events:ingest.
+
+    cd api && python -m bench.bench_ingest [--events 2000000] [--days 30] [--campaigns 50] [--groups 10] [--ads 10]
+
+Writes --events random events for campaigns x groups x ads ads to temporary NDJSON and CSV files, then loads each
+through EventIngest as the CLI does and, in-process (TestClient, 64 KiB chunks), through the HTTP endpoint.
+First, check_rejections makes sure metric values that are not non-negative integers up to 2**53 (booleans, strings
+and lists in NDJSON, huge or fractional numbers in either format) are rejected on the batch and the per-line paths.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from api.core.facts import FACTS
+from api.core.ingest import EventIngest, ingest_file
+from api.core.store import STORE, MemoryStore
+from main import app
+
+START = date(2025, 1, 1)
+CHUNK = 64 * 1024
+
+
+def populate(n_campaigns: int, n_groups: int, n_ads: int) -> list:
+    fresh = MemoryStore()
+    STORE.__dict__.update(fresh.__dict__)
+    now = datetime.now(timezone.utc)
+    base = {"archived": False, "createdAt": now, "updatedAt": now, "servingStatus": "NOT_SERVING", "servingReasons": []}
+    ad_ids = []
+    for c in range(n_campaigns):
+        STORE.save("campaign", {"id": f"campaign_{c}", "advertiserId": "advertiser_1", "name": f"C{c}", **base})
+        for g in range(n_groups):
+            gid = f"asset_group_{c}_{g}"
+            STORE.save("asset_group", {"id": gid, "campaignId": f"campaign_{c}", "name": f"G{g}", **base})
+            for i in range(n_ads):
+                ad_ids.append(f"ad_{c}_{g}_{i}")
+                STORE.save("ad", {"id": ad_ids[-1], "assetGroupId": gid, "name": f"Ad {i}", **base})
+    return ad_ids
+
+
+def write_files(directory: str, ad_ids: list, events: int, days: int) -> dict:
+    rng = np.random.default_rng(7)
+    dates = [(START + timedelta(days=d)).isoformat() for d in range(days)]
+    day = rng.integers(0, days, events)
+    ad = rng.integers(0, len(ad_ids), events)
+    impressions = rng.integers(0, 5000, events)
+    clicks = rng.integers(0, 50, events)
+    spend = rng.integers(0, 100_000, events)
+    paths = {"ndjson": os.path.join(directory, "events.ndjson"), "csv": os.path.join(directory, "events.csv")}
+    with open(paths["ndjson"], "w") as f:
+        for i in range(events):
+            f.write(f'{{"date":"{dates[day[i]]}","adId":"{ad_ids[ad[i]]}","impressions":{impressions[i]},'
+                    f'"clicks":{clicks[i]},"spend":{spend[i]}}}\n')
+    with open(paths["csv"], "w") as f:
+        f.write("date,adId,impressions,clicks,spend\n")
+        for i in range(events):
+            f.write(f"{dates[day[i]]},{ad_ids[ad[i]]},{impressions[i]},{clicks[i]},{spend[i]}\n")
+    return paths
+
+
+def load_file(path: str, fmt: str) -> dict:
+    ingest = EventIngest(FACTS, STORE, fmt)
+    with open(path, "rb") as stream:
+        ingest_file(ingest, stream)
+    return ingest.close()
+
+
+def post_file(client: TestClient, path: str, fmt: str) -> dict:
+    def body():
+        with open(path, "rb") as stream:
+            while chunk := stream.read(CHUNK):
+                yield chunk
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return client.post("/v1/reports/events:ingest", content=body(), headers={"Content-Type": content_type}).json()
+
+
+def check_rejections(client: TestClient, ad_id: str) -> None:
+    good = f'{{"date":"2025-01-01","adId":"{ad_id}","impressions":7,"clicks":1,"spend":2.0}}'
+    bad = {
+        "true": "impressions",
+        '"5"': "impressions",
+        "[1]": "impressions",
+        '{"n":1}': "impressions",
+        "null": "impressions",
+        "1e300": "impressions",
+        str(2 ** 53 + 2): "impressions",
+        "-1": "impressions",
+        "1.5": "impressions",
+    }
+    for broken in ("", "not json\n"):  # one batched orjson.loads, and the per-line fallback after a broken line
+        FACTS.clear()
+        lines = [good] + [f'{{"date":"2025-01-01","adId":"{ad_id}","{field}":{value}}}' for value, field in bad.items()]
+        result = client.post(
+            "/v1/reports/events:ingest", content=broken + "\n".join(lines) + "\n", headers={"Content-Type": "application/x-ndjson"}
+        ).json()
+        assert result["accepted"] == 1 and result["rejected"] == len(bad) + bool(broken), result
+        assert all(e["field"] == "impressions" for e in result["errors"][bool(broken):]), result
+        assert FACTS.row_count() == 1
+    FACTS.clear()
+    body = f"date,adId,impressions,clicks\n2025-01-01,{ad_id},5,\n" + "".join(
+        f"2025-01-01,{ad_id},{value},1\n" for value in ("true", "1e300", str(2 ** 53 + 2), "-1", "1.5", "x", "inf")
+    )
+    result = client.post("/v1/reports/events:ingest", content=body, headers={"Content-Type": "text/csv"}).json()
+    assert result["accepted"] == 1 and result["rejected"] == 7, result
+    FACTS.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10, help="asset groups per campaign")
+    parser.add_argument("--ads", type=int, default=10, help="ads per asset group")
+    args = parser.parse_args()
+
+    ad_ids = populate(args.campaigns, args.groups, args.ads)
+    client = TestClient(app)
+    check_rejections(client, ad_ids[0])
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, ad_ids, args.events, args.days)
+        print(f"{args.events:,} events over {args.days} days for {len(ad_ids):,} ads")
+        print(f"{'':>14} {'MB':>7} {'seconds':>8} {'events/s':>11}")
+        for fmt, path in paths.items():
+            size = os.path.getsize(path) / 1e6
+            for label, run in (("file", load_file), ("http", lambda p, f: post_file(client, p, f))):
+                FACTS.clear()
+                start = time.perf_counter()
+                result = run(path, fmt)
+                elapsed = time.perf_counter() - start
+                assert result["accepted"] == args.events and FACTS.row_count() == args.events, result
+                print(f"{fmt + ' ' + label:>14} {size:>7.0f} {elapsed:>8.2f} {args.events / elapsed:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Rows/sec for GET /v1/ads: response_model path vs. the DV_FAST_RESPONSES fragment path.
+
+    cd api && python -m bench.bench_list_serialization [--sizes 1000,10000,100000] [--repeat 3] [--cache-mb 1024]
+
+"fast (cold)" is the first request after population (every fragment is serialized);
+"fast (warm)" reuses cached fragments, which is the steady state for unchanged ads as long as they all fit in the
+fragment cache (--cache-mb, DV_FRAGMENT_CACHE_BYTES in the server).
+"masked" asks for the columns of the UI's ads table only (fields=...); the KiB columns compare payload sizes.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from fastapi.testclient import TestClient
+
+from api.core import fastjson
+from api.core.serving import recompute_all
+from api.core.store import STORE, MemoryStore
+from main import app
+
+UI_FIELDS = "name,adType,inputType,servingStatus,servingReasons,archived,updatedAt"
+TAG = "<ins class='dcmads' data-dcm-placement='N123.456/B789.012' data-dcm-rendering-mode='script'></ins>" * 4
+
+
+def populate(n_ads: int) -> None:
+    fresh = MemoryStore()
+    STORE.__dict__.update(fresh.__dict__)
+    now = datetime.now(timezone.utc)
+    base = {"archived": False, "createdAt": now, "updatedAt": now, "servingStatus": "NOT_SERVING", "servingReasons": []}
+    STORE.save("partner", {"id": "partner_1", "name": "P", **base})
+    STORE.save("advertiser", {"id": "advertiser_1", "partnerId": "partner_1", "name": "A", **base})
+    STORE.save("campaign", {"id": "campaign_1", "advertiserId": "advertiser_1", "name": "C", "status": "ACTIVE",
+                            "startDate": None, "endDate": None, "targeting": {}, **base})
+    n_groups = max(1, n_ads // 500)
+    for g in range(n_groups):
+        STORE.save("asset_group", {"id": f"asset_group_{g}", "campaignId": "campaign_1", "name": f"G{g}",
+                                   "defaultBid": {"amount": 0, "currency": "USD"}, "targeting": {}, "deliverySettings": {}, **base})
+    for i in range(n_ads):
+        STORE.save("ad", {
+            "id": f"ad_{i}", "assetGroupId": f"asset_group_{i % n_groups}", "name": f"Ad {i}", "adType": "DISPLAY",
+            "inputType": "DISPLAY_THIRD_PARTY_TAG", "landingUrl": "https://example.com", "brandUrl": None,
+            "sponsoredBy": None, "ctaText": None, "tagText": TAG, "filename": None, "metadata": {},
+            "trackingTags": ["https://t.example.com/px"], "substitutedPreview": TAG, "generatedVastWrapper": None,
+            **base,
+        })
+    recompute_all(STORE)
+
+
+def timed(client: TestClient, n_ads: int, fields: Optional[str] = None) -> Tuple[float, int]:
+    start = time.perf_counter()
+    resp = client.get("/v1/ads", params={"fields": fields} if fields else None)
+    elapsed = time.perf_counter() - start
+    assert resp.status_code == 200 and resp.content.count(b'"id"') == n_ads
+    return elapsed, len(resp.content)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cache-mb", type=int, default=1024, help="fragment cache bound")
+    args = parser.parse_args()
+    fastjson.FRAGMENTS.max_bytes = args.cache_mb * 1024 * 1024
+
+    client = TestClient(app)
+    print(
+        f"{'ads':>8} {'model rows/s':>14} {'fast cold rows/s':>17} {'fast warm rows/s':>17} {'speedup':>8}"
+        f" {'masked rows/s':>14} {'KiB':>8} {'masked KiB':>11}"
+    )
+    for n in [int(x) for x in args.sizes.split(",")]:
+        populate(n)
+        fastjson.FAST_RESPONSES = False
+        slow, size = min(timed(client, n) for _ in range(args.repeat))
+        masked, masked_size = min(timed(client, n, UI_FIELDS) for _ in range(args.repeat))
+        fastjson.FAST_RESPONSES = True
+        cold, _ = timed(client, n)
+        warm, _ = min(timed(client, n) for _ in range(args.repeat))
+        fastjson.FAST_RESPONSES = False
+        print(
+            f"{n:>8} {n / slow:>14,.0f} {n / cold:>17,.0f} {n / warm:>17,.0f} {slow / warm:>7.1f}x"
+            f" {n / masked:>14,.0f} {size / 1024:>8,.0f} {masked_size / 1024:>11,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Read throughput of `uvicorn main:app --workers N` sharing one SQLite store (DV_STORE=sqlite).
+
+    cd api && python -m bench.bench_multiworker [--workers 1,2,4] [--clients 8] [--seconds 5] [--ads 5000]
+
+For each worker count, a server is started on a database populated up front. Client processes, each on one
+keep-alive connection, then loop over single-ad GETs and 50-ad list pages for --seconds. Throughput can scale only
+up to the number of cores that the server and the clients share (reported first). The server is also run once with
+DV_SQLITE_CACHE=0 for comparison.
+
+Before the load, a coherence check PATCHes an ad on one connection and immediately GETs it on fresh connections
+(which land on arbitrary workers). With the change signal, no GET may return the old name.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def populate(db_path: str, n_ads: int):
+    from api.core.serving import recompute_all
+    from api.core.sqlite_store import SqliteStore
+
+    store = SqliteStore(db_path)
+    now = datetime.now(timezone.utc)
+    base = {"archived": False, "createdAt": now, "updatedAt": now, "servingStatus": "NOT_SERVING", "servingReasons": []}
+    groups = [f"assetgroup_{g}" for g in range(max(1, n_ads // 50))]
+    with store.transaction():
+        store.save("partner", {"id": "partner_1", "name": "P", **base})
+        store.save("advertiser", {"id": "advertiser_1", "partnerId": "partner_1", "name": "A", **base})
+        store.save("campaign", {"id": "campaign_1", "advertiserId": "advertiser_1", "name": "C", "status": "ACTIVE",
+                                "startDate": None, "endDate": None, "targeting": {}, **base})
+        for g in groups:
+            store.save("asset_group", {"id": g, "campaignId": "campaign_1", "name": g,
+                                       "defaultBid": {"amount": 0, "currency": "USD"}, "targeting": {},
+                                       "deliverySettings": {}, **base})
+        for i in range(n_ads):
+            store.save("ad", {
+                "id": f"ad_{i}", "assetGroupId": groups[i % len(groups)], "name": f"Ad {i}", "adType": "DISPLAY",
+                "inputType": "DISPLAY_THIRD_PARTY_TAG", "landingUrl": None, "brandUrl": None, "sponsoredBy": None,
+                "ctaText": None, "tagText": "<ins class='dcmads'></ins>", "filename": None, "metadata": {},
+                "trackingTags": [], "substitutedPreview": None, "generatedVastWrapper": None, **base,
+            })
+    recompute_all(store)
+    store.close()
+    return groups
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, db_path: str, port: int, cache: bool) -> subprocess.Popen:
+    env = dict(os.environ, DV_STORE="sqlite", DV_SQLITE_PATH=db_path)
+    if not cache:
+        env["DV_SQLITE_CACHE"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=API_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/v1/partners")
+            if conn.getresponse().status == 200:
+                # Give the remaining workers a moment to finish importing.
+                time.sleep(1 + 0.5 * workers)
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def coherence_check(port: int, n_ads: int, rounds: int = 50) -> int:
+    stale = 0
+    writer = http.client.HTTPConnection("127.0.0.1", port)
+    for r in range(rounds):
+        ad_id = f"ad_{random.randrange(n_ads)}"
+        name = f"renamed {r}"
+        writer.request("PATCH", f"/v1/ads/{ad_id}", body=json.dumps({"name": name}), headers={"Content-Type": "application/json"})
+        resp = writer.getresponse()
+        resp.read()
+        assert resp.status == 200, resp.status
+        for _ in range(4):
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            conn.request("GET", f"/v1/ads/{ad_id}")
+            if json.loads(conn.getresponse().read())["name"] != name:
+                stale += 1
+            conn.close()
+    return stale
+
+
+def client(port: int, seconds: float, n_ads: int, groups, out) -> None:
+    rnd = random.Random()
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    end = time.perf_counter() + seconds
+    while True:
+        t0 = time.perf_counter()
+        if t0 >= end:
+            break
+        if rnd.random() < 0.5:
+            conn.request("GET", f"/v1/ads/ad_{rnd.randrange(n_ads)}")
+        else:
+            conn.request("GET", f"/v1/ads?assetGroupId={rnd.choice(groups)}&pageSize=50")
+        resp = conn.getresponse()
+        resp.read()
+        assert resp.status == 200, resp.status
+        latencies.append(time.perf_counter() - t0)
+    out.put(latencies)
+
+
+def run(workers: int, db_path: str, args, groups, cache: bool = True) -> None:
+    port = _free_port()
+    server = start_server(workers, db_path, port, cache)
+    try:
+        stale = coherence_check(port, args.ads)
+        ctx = multiprocessing.get_context("spawn")
+        out = ctx.Queue()
+        clients = [ctx.Process(target=client, args=(port, args.seconds, args.ads, groups, out)) for _ in range(args.clients)]
+        for c in clients:
+            c.start()
+        latencies = []
+        for _ in clients:
+            latencies.extend(out.get())
+        for c in clients:
+            c.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    print(
+        f"{workers:>8} {'on' if cache else 'off':>6} {len(latencies) / args.seconds:>8.0f} "
+        f"{latencies[len(latencies) // 2] * 1e3:>8.2f} {latencies[int(len(latencies) * 0.99) - 1] * 1e3:>8.2f} {stale:>6}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--ads", type=int, default=5000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="dv-multiworker-")
+    try:
+        db_path = os.path.join(tmp, "bench.db")
+        groups = populate(db_path, args.ads)
+        print(f"{os.cpu_count()} CPUs; {args.ads} ads; {args.clients} client processes x {args.seconds}s")
+        print(f"{'workers':>8} {'cache':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'stale':>6}")
+        counts = [int(w) for w in args.workers.split(",")]
+        run(counts[0], db_path, args, groups, cache=False)
+        for workers in counts:
+            run(workers, db_path, args, groups)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Report export jobs over HTTP: how long the job takes, how fast its result downloads, and what the server's memory does.
+
+    cd api && python -m bench.bench_report_export [--rows 10000000] [--days 30] [--campaigns 50] [--groups 10]
+        [--ads 200]
+
+Writes --rows facts (as bench_reports does) to a temporary DV_FACTS_DIR and starts `uvicorn main:app` on it. Then
+POSTs the AD_ID x DATE export finance asks for (one row per ad and day), polls the job, and downloads
+GET /reports/jobs/{id}/result in each format, uncompressed and gzipped, reading the body as it arrives. The
+server's resident memory is sampled throughout: it should not grow with the rows downloaded, since they are
+formatted a chunk at a time from the job's memory-mapped arrays.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from api.core.facts import FactStore, day_date, day_number
+from bench.bench_reports import populate
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = date(2025, 1, 1)
+READ_BYTES = 1 << 20
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(facts_dir: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DV_FACTS_DIR=facts_dir)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"], cwd=API_DIR, env=env
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/v1/reports/cache")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class RssSampler:
+    """Highest resident memory of a process seen while the block runs (sampled every 10 ms)."""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb(self.pid))
+            time.sleep(0.01)
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def request(port: int, method: str, path: str, body: object = None) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    data = json.loads(response.read())
+    assert response.status < 300, data
+    return data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10, help="asset groups per campaign")
+    parser.add_argument("--ads", type=int, default=200, help="ads per asset group")
+    args = parser.parse_args()
+
+    facts_dir = tempfile.mkdtemp(prefix="dv-bench-export-")
+    port = _free_port()
+    server = None
+    try:
+        facts = FactStore(facts_dir)
+        populate(facts, args.rows, args.days, args.campaigns, args.groups, args.ads)
+        facts.sync()
+        del facts
+        server = start_server(facts_dir, port)
+        idle = rss_mb(server.pid)
+
+        end = day_date(day_number(START) + args.days - 1).isoformat()
+        query = {"startDate": START.isoformat(), "endDate": end, "dimensions": ["AD_ID", "DATE"],
+                 "metrics": ["IMPRESSIONS", "CLICKS", "SPEND"]}
+        with RssSampler(server.pid) as sampler:
+            start = time.perf_counter()
+            job = request(port, "POST", "/v1/reports/jobs", query)
+            while job["status"] not in ("SUCCEEDED", "FAILED"):
+                time.sleep(0.05)
+                job = request(port, "GET", f"/v1/reports/jobs/{job['id']}")
+            elapsed = time.perf_counter() - start
+        assert job["status"] == "SUCCEEDED", job
+        print(f"{args.rows:,} facts -> {job['rowCount']:,} rows; job took {elapsed:.2f}s; server RSS {idle:.0f} MB idle, "
+              f"{sampler.peak:.0f} MB peak while it ran")
+
+        print(f"{'':>16} {'MB':>7} {'seconds':>8} {'rows/s':>11} {'peak RSS MB':>12}")
+        for fmt in ("csv", "ndjson"):
+            for encoding in ("identity", "gzip"):
+                with RssSampler(server.pid) as sampler:
+                    conn = http.client.HTTPConnection("127.0.0.1", port)
+                    start = time.perf_counter()
+                    conn.request("GET", f"/v1/reports/jobs/{job['id']}/result?format={fmt}", headers={"Accept-Encoding": encoding})
+                    response = conn.getresponse()
+                    assert response.status == 200, response.read()
+                    size = 0
+                    while chunk := response.read(READ_BYTES):
+                        size += len(chunk)
+                    elapsed = time.perf_counter() - start
+                    conn.close()
+                print(f"{fmt + ' ' + encoding:>16} {size / 1e6:>7.1f} {elapsed:>8.2f} {job['rowCount'] / elapsed:>11,.0f}"
+                      f" {sampler.peak:>12.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(facts_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Report query latency over synthetic delivery facts.
+
+    cd api && python -m bench.bench_reports [--rows 10000000] [--days 30] [--campaigns 50] [--groups 10] [--ads 10] [--repeat 5]
+        [--dir DIR]
+
+Fills the fact store with --rows facts spread over --days days and campaigns x groups x ads ads, then times
+run_report (best of --repeat, single thread) for the shapes the reporting page asks for, answered from the rollup
+the planner picks, from the raw facts, and from the report cache (core.report_cache, a hit). With --dir the facts are written to (and memory-mapped from) files in an
+empty directory DIR instead of held in memory, and reopening the directory is timed too.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from api.core.facts import FactStore, day_date, day_number
+from api.core.report_cache import ReportCache, cached_report
+from api.core.report_engine import run_report
+from api.models.report import ReportQuery
+
+START = date(2025, 1, 1)
+
+
+def populate(facts: FactStore, rows: int, days: int, n_campaigns: int, n_groups: int, n_ads: int, seed: int = 7) -> None:
+    rng = np.random.default_rng(seed)
+    ad_ids = [f"ad_{c}_{g}_{a}" for c in range(n_campaigns) for g in range(n_groups) for a in range(n_ads)]
+    ad_codes = facts.encode("ad", ad_ids)
+    group_codes = facts.encode("asset_group", [ad.rsplit("_", 1)[0].replace("ad_", "asset_group_", 1) for ad in ad_ids])
+    campaign_codes = facts.encode("campaign", [f"campaign_{c}" for c in range(n_campaigns) for _ in range(n_groups * n_ads)])
+    per_day = rows // days
+    first = day_number(START)
+    for d in range(days):
+        n = per_day + (rows % days if d == days - 1 else 0)
+        ads = rng.integers(0, len(ad_ids), n)
+        impressions = rng.integers(0, 1000, n)
+        facts.append(first + d, {
+            "campaign": campaign_codes[ads],
+            "asset_group": group_codes[ads],
+            "ad": ad_codes[ads],
+            "impressions": impressions,
+            "clicks": rng.binomial(impressions, 0.01),
+            "spend": impressions * rng.integers(1, 5, n),
+        })
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10, help="asset groups per campaign")
+    parser.add_argument("--ads", type=int, default=10, help="ads per asset group")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", help="store the facts in this (empty) directory")
+    args = parser.parse_args()
+
+    facts = FactStore(args.dir)
+    start = time.perf_counter()
+    populate(facts, args.rows, args.days, args.campaigns, args.groups, args.ads)
+    facts.sync()
+    print(f"{facts.row_count():,} facts over {args.days} days loaded in {time.perf_counter() - start:.1f}s")
+    if args.dir:
+        start = time.perf_counter()
+        facts = FactStore(args.dir)
+        print(f"reopened {args.dir} in {time.perf_counter() - start:.2f}s")
+
+    cache = ReportCache()
+    facts.watch(cache.invalidate)
+    end = day_date(day_number(START) + args.days - 1).isoformat()
+    week = day_date(day_number(START) + 6).isoformat()
+    all_metrics = ["IMPRESSIONS", "CLICKS", "SPEND"]
+    shapes = {
+        "totals": dict(metrics=all_metrics),
+        "by campaign": dict(dimensions=["CAMPAIGN_ID"], metrics=all_metrics),
+        "by campaign per day": dict(dimensions=["DATE", "CAMPAIGN_ID"], metrics=all_metrics, timeGrain="DAY"),
+        "by ad": dict(dimensions=["AD_ID"], metrics=all_metrics),
+        "by ad per week": dict(dimensions=["DATE", "AD_ID"], metrics=all_metrics, timeGrain="WEEK"),
+        "by campaign x group x ad": dict(dimensions=["CAMPAIGN_ID", "ASSET_GROUP_ID", "AD_ID"], metrics=["IMPRESSIONS"]),
+        "one campaign by ad": dict(dimensions=["AD_ID"], metrics=all_metrics, filters={"campaignId": "campaign_3"}),
+        "7 days by ad": dict(dimensions=["AD_ID"], metrics=all_metrics, endDate=week),
+    }
+    print(f"{'':>26} {'source':>18} {'ms':>8} {'facts ms':>9} {'hit us':>7} {'groups':>7} {'days':>5}")
+    for label, shape in shapes.items():
+        q = ReportQuery(**{"startDate": START.isoformat(), "endDate": end, "limit": 1000, **shape})
+        result = run_report(facts, q)
+        assert result == {**run_report(facts, q, rollups=False), "debug": result["debug"]}
+        planned = timed(lambda: run_report(facts, q), args.repeat)
+        raw = timed(lambda: run_report(facts, q, rollups=False), args.repeat)
+        cached_report(cache, facts, q)
+        hit = timed(lambda: cached_report(cache, facts, q), args.repeat)
+        print(f"{label:>26} {result['debug']['source']:>18} {planned * 1e3:>8.1f} {raw * 1e3:>9.1f} {hit * 1e6:>7.0f}"
+              f" {len(result['rows']):>7} {result['debug']['partitions']:>5}")
+
+
+if __name__ == "__main__":
+    main()
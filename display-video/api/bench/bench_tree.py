@@ -0,0 +1,102 @@
+"""
+Loading an advertiser's campaign -> asset group -> ad hierarchy: per-level list calls (what the web app does) vs.
+one GET /v1/advertisers/{id}/tree.
+
+    cd api && python -m bench.bench_tree [--campaigns 20] [--groups 10] [--ads 20] [--rtt-ms 30] [--repeat 3]
+
+Times are in-process (TestClient); "at RTT" adds one network round trip per request to show what a browser
+waits for. The masked tree asks only for the columns the UI tables show.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from api.core.serving import recompute_all
+from api.core.store import STORE, MemoryStore
+from main import app
+
+TAG = "<ins class='dcmads' data-dcm-placement='N123.456/B789.012' data-dcm-rendering-mode='script'></ins>" * 4
+UI_FIELDS = "name,status,adType,servingStatus,servingReasons,archived"
+
+
+def populate(n_campaigns: int, n_groups: int, n_ads: int) -> None:
+    fresh = MemoryStore()
+    STORE.__dict__.update(fresh.__dict__)
+    now = datetime.now(timezone.utc)
+    base = {"archived": False, "createdAt": now, "updatedAt": now, "servingStatus": "NOT_SERVING", "servingReasons": []}
+    STORE.save("partner", {"id": "partner_1", "name": "P", **base})
+    STORE.save("advertiser", {"id": "advertiser_1", "partnerId": "partner_1", "name": "A", **base})
+    for c in range(n_campaigns):
+        STORE.save("campaign", {"id": f"campaign_{c}", "advertiserId": "advertiser_1", "name": f"C{c}", "status": "ACTIVE",
+                                "startDate": None, "endDate": None, "targeting": {}, **base})
+        for g in range(n_groups):
+            gid = f"asset_group_{c}_{g}"
+            STORE.save("asset_group", {"id": gid, "campaignId": f"campaign_{c}", "name": f"G{g}",
+                                       "defaultBid": {"amount": 0, "currency": "USD"}, "targeting": {}, "deliverySettings": {}, **base})
+            for i in range(n_ads):
+                STORE.save("ad", {
+                    "id": f"ad_{c}_{g}_{i}", "assetGroupId": gid, "name": f"Ad {i}", "adType": "DISPLAY",
+                    "inputType": "DISPLAY_THIRD_PARTY_TAG", "landingUrl": "https://example.com", "brandUrl": None,
+                    "sponsoredBy": None, "ctaText": None, "tagText": TAG, "filename": None, "metadata": {},
+                    "trackingTags": ["https://t.example.com/px"], "substitutedPreview": TAG, "generatedVastWrapper": None,
+                    **base,
+                })
+    recompute_all(STORE)
+
+
+def per_level(client: TestClient):
+    requests, size = 1, 0
+    resp = client.get("/v1/campaigns", params={"advertiserId": "advertiser_1"})
+    size += len(resp.content)
+    for camp in resp.json():
+        resp = client.get("/v1/asset-groups", params={"campaignId": camp["id"]})
+        requests, size = requests + 1, size + len(resp.content)
+        for group in resp.json():
+            resp = client.get("/v1/ads", params={"assetGroupId": group["id"]})
+            requests, size = requests + 1, size + len(resp.content)
+    return requests, size
+
+
+def tree(client: TestClient, fields=None):
+    resp = client.get("/v1/advertisers/advertiser_1/tree", params={"fields": fields} if fields else None)
+    assert resp.status_code == 200, resp.text
+    return 1, len(resp.content)
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--campaigns", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=10, help="asset groups per campaign")
+    parser.add_argument("--ads", type=int, default=20, help="ads per asset group")
+    parser.add_argument("--rtt-ms", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    populate(args.campaigns, args.groups, args.ads)
+    client = TestClient(app)
+    print(f"{args.campaigns} campaigns x {args.groups} asset groups x {args.ads} ads")
+    print(f"{'':>22} {'requests':>9} {'KiB':>9} {'local ms':>9} {'at RTT ms':>10}")
+    for label, fn in (
+        ("per-level lists", lambda: per_level(client)),
+        ("tree", lambda: tree(client)),
+        ("tree, UI fields", lambda: tree(client, UI_FIELDS)),
+    ):
+        elapsed, (requests, size) = timed(fn, args.repeat)
+        print(f"{label:>22} {requests:>9} {size / 1024:>9.0f} {elapsed * 1e3:>9.1f} {elapsed * 1e3 + requests * args.rtt_ms:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,46 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.core.bulk_jobs import BULK_JOBS
+from api.core.compression import CompressionMiddleware
 from api.core.errors import install_exception_handlers
+from api.core.persistence import DATA_DIR, DurableWritesMiddleware, close_persistence, open_persistence
+from api.core.report_jobs import REPORT_JOBS
+from api.core.store import STORE, MemoryStore
+from api.core.workers import shutdown_bulk_executor
 from api.routers import (
     ads,
     advertisers,
     asset_groups,
     campaigns,
+    changes,
     partners,
     reports,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DV_STORE picks the backend (core.store.open_store); the SQLite store is durable on its own.
+    if DATA_DIR and isinstance(STORE, MemoryStore):
+        open_persistence(STORE, DATA_DIR)
+    if STORE.shared:
+        # Other workers may serve the polls for jobs this one runs.
+        BULK_JOBS.share_via(STORE)
+    yield
+    BULK_JOBS.shutdown()
+    REPORT_JOBS.shutdown()
+    shutdown_bulk_executor()
+    close_persistence(STORE)
+    STORE.close()
+
+
 app = FastAPI(
     title="Display & Video Campaign Manager API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -23,8 +50,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+app.add_middleware(DurableWritesMiddleware, store=STORE)
+
+# DV_COMPRESSION / DV_COMPRESS_MIN_BYTES (core.compression)
+app.add_middleware(CompressionMiddleware)
+
 
 install_exception_handlers(app)
 
@@ -33,4 +66,5 @@ app.include_router(advertisers.router, prefix="/v1", tags=["advertisers"])
 app.include_router(campaigns.router, prefix="/v1", tags=["campaigns"])
 app.include_router(asset_groups.router, prefix="/v1", tags=["asset-groups"])
 app.include_router(ads.router, prefix="/v1", tags=["ads"])
+app.include_router(changes.router, prefix="/v1", tags=["changes"])
 app.include_router(reports.router, prefix="/v1", tags=["reports"])